@@ -0,0 +1,2 @@
+# lib/benchmarks/__init__.py
+# Run benchmarks from the lib directory, e.g. `python -m benchmarks.indexes`
@@ -0,0 +1,62 @@
+# lib/benchmarks/artists.py
+"""Database size and find_by_artist latency before and after the artists table migration.
+
+Usage: python -m benchmarks.artists [--sizes 100000 1000000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from models.painting import Painting
+from models.schema import migrate
+
+from .indexes import LEGACY_SELECT_SQL, populate, time_queries
+
+
+def size_of(conn, path):
+  """Return the size of the database file in MiB after a VACUUM"""
+  conn.execute("VACUUM")
+  return os.path.getsize(path) / 2**20
+
+
+def run(size, repeat):
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "bench.db")
+    conn = sqlite3.connect(path)
+    _, artist_count = populate(conn, size)
+    rng = random.Random(1)
+    artist = lambda: (f"Artist {rng.randrange(artist_count)}",)
+
+    migrate(conn, target=4)
+    conn.execute("ANALYZE")
+    before_size = size_of(conn, path)
+    before = time_queries(conn, [("find_by_artist", LEGACY_SELECT_SQL + " WHERE paintings.artist = ?", artist)], repeat)
+
+    start = time.perf_counter()
+    migrate(conn)
+    seconds = time.perf_counter() - start
+    conn.execute("ANALYZE")
+    after_size = size_of(conn, path)
+    after = time_queries(conn, [("find_by_artist", Painting.SELECT_SQL + " WHERE artists.name = ?", artist)], repeat)
+    conn.close()
+
+  print(f"\n{size:,} paintings, {artist_count:,} artists: migration took {seconds:.2f}s")
+  print(f"{'':<26}{'version 4':>12}{'version 5':>12}")
+  print(f"{'database MiB':<26}{before_size:>12.1f}{after_size:>12.1f}")
+  print(f"{'find_by_artist median ms':<26}{before['find_by_artist']:>12.3f}{after['find_by_artist']:>12.3f}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+  parser.add_argument("--repeat", type=int, default=50)
+  args = parser.parse_args()
+  for size in args.sizes:
+    run(size, args.repeat)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,69 @@
+# lib/benchmarks/generator.py
+"""Seeded synthetic catalogues of museums and paintings.
+
+Usage: python -m benchmarks.generator OUTPUT.jsonl [--museums 100] [--per-museum 500] [--seed 0]
+The output is a catalogue file for `python cli.py import`.
+"""
+import argparse
+import json
+import random
+from datetime import datetime
+
+from faker import Faker
+
+EARLIEST_YEAR = 1300
+# Average number of paintings per artist, so artist lookups return realistic result sizes
+PAINTINGS_PER_ARTIST = 20
+
+
+class CatalogueGenerator:
+  """Produce the same catalogue for the same seed: museums x paintings_per_museum paintings,
+  spread over a pool of artists, with years between EARLIEST_YEAR and the current year"""
+
+  def __init__(self, museums=100, paintings_per_museum=500, seed=0):
+    self.museums = museums
+    self.paintings_per_museum = paintings_per_museum
+    self.seed = seed
+    self.faker = Faker()
+    self.faker.seed_instance(seed)
+    self.random = random.Random(seed)
+    artist_count = max(1, museums * paintings_per_museum // PAINTINGS_PER_ARTIST)
+    self.artists = [self.faker.name() for _ in range(artist_count)]
+
+  def museum(self):
+    """Return a (name, location) pair"""
+    name = f"{self.faker.last_name()} Museum of {self.faker.word().title()}"
+    return name, f"{self.faker.city()}, {self.faker.country()}"
+
+  def painting(self):
+    """Return a (title, artist, year) triple"""
+    title = " ".join(word.title() for word in self.faker.words(self.random.randint(1, 4)))
+    year = self.random.randint(EARLIEST_YEAR, datetime.now().year)
+    return title, self.random.choice(self.artists), year
+
+  def records(self):
+    """Yield catalogue records: each museum followed by its paintings"""
+    for museum_id in range(1, self.museums + 1):
+      name, location = self.museum()
+      yield {"type": "museum", "id": museum_id, "name": name, "location": location}
+      for _ in range(self.paintings_per_museum):
+        title, artist, year = self.painting()
+        yield {"type": "painting", "title": title, "artist": artist, "year": year, "museum_id": museum_id}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("output")
+  parser.add_argument("--museums", type=int, default=100)
+  parser.add_argument("--per-museum", type=int, default=500)
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  generator = CatalogueGenerator(args.museums, args.per_museum, args.seed)
+  with open(args.output, "w") as file:
+    for record in generator.records():
+      file.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,131 @@
+# lib/benchmarks/hydration.py
+"""Time and memory to turn painting rows into objects: the old __dict__ model, the slotted model
+through its validating setters, the trusted row path, and the PaintingRow projection.
+
+Usage: python -m benchmarks.hydration [--rows 200000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+from models.museum import Museum
+from models.painting import Painting, PaintingRow
+
+
+class LegacyPainting:
+  """The Painting model as it was before __slots__: attributes in a per-instance __dict__,
+  every assignment validated by a property setter"""
+
+  def __init__(self, title, artist, year, museum, id=None):
+    self.id = id
+    self.title = title
+    self.artist = artist
+    self.year = year
+    self.museum = museum
+
+  @property
+  def title(self):
+    return self._title
+
+  @title.setter
+  def title(self, title):
+    if isinstance(title, str) and len(title):
+      self._title = title
+    else:
+      raise ValueError("title must be a non-empty string")
+
+  @property
+  def artist(self):
+    return self._artist
+
+  @artist.setter
+  def artist(self, artist):
+    if isinstance(artist, str) and len(artist):
+      self._artist = artist
+    else:
+      raise ValueError("artist must be a non-empty string")
+
+  @property
+  def year(self):
+    return self._year
+
+  @year.setter
+  def year(self, year):
+    current_year = datetime.now().year
+    if not isinstance(year, int):
+      raise ValueError("year must be an integer")
+    if year > current_year:
+      raise ValueError("year cannot be in the future")
+    if year < 1000:
+      raise ValueError("year must be a 4-digit number")
+    self._year = year
+
+  @property
+  def museum(self):
+    return self._museum
+
+  @museum.setter
+  def museum(self, museum):
+    if isinstance(museum, Museum) and museum.id:
+      self._museum = museum
+    else:
+      raise ValueError("museum must be a saved Museum instance")
+
+
+def make_rows(count):
+  """Return count rows shaped like Painting.SELECT_SQL results"""
+  return [
+    (i, f"Painting {i}", f"Artist {i % 1000}", 1500 + i % 500, 1, "Museum 1", "City 1")
+    for i in range(1, count + 1)
+  ]
+
+
+def measure(build):
+  """Return (seconds, retained bytes) for build(). Time and memory come from separate runs,
+  since tracing allocations slows the code down."""
+  gc.collect()
+  start = time.perf_counter()
+  result = build()
+  elapsed = time.perf_counter() - start
+  del result
+
+  gc.collect()
+  tracemalloc.start()
+  result = build()
+  retained = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del result
+  return elapsed, retained
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--rows", type=int, default=200_000)
+  args = parser.parse_args()
+
+  rows = make_rows(args.rows)
+  museum = Museum._from_row((1, "Museum 1", "City 1"))
+
+  def hydrate():
+    Painting.all.clear()
+    return Painting.instances_from_db(rows)
+
+  scenarios = [
+    ("legacy __dict__ + setters", lambda: [LegacyPainting(r[1], r[2], r[3], museum, r[0]) for r in rows]),
+    ("__slots__ + setters", lambda: [Painting(r[1], r[2], r[3], museum, r[0]) for r in rows]),
+    ("__slots__ trusted row", lambda: [Painting._from_row(r, museum) for r in rows]),
+    ("instances_from_db", hydrate),
+    ("PaintingRow projection", lambda: [PaintingRow._make(r) for r in rows]),
+  ]
+
+  print(f"{args.rows:,} rows")
+  print(f"{'path':<28}{'seconds':>10}{'rows/s':>14}{'bytes/row':>12}")
+  for name, build in scenarios:
+    elapsed, retained = measure(build)
+    print(f"{name:<28}{elapsed:>10.3f}{args.rows / elapsed:>14,.0f}{retained / args.rows:>12.0f}")
+
+
+if __name__ == "__main__":
+  main()
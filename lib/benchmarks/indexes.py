@@ -0,0 +1,113 @@
+# lib/benchmarks/indexes.py
+"""Finder latency before and after the secondary-index migration.
+
+Usage: python -m benchmarks.indexes [--sizes 10000 100000 1000000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from models.schema import MIGRATIONS, migrate
+
+PAINTINGS_PER_MUSEUM = 100
+PAINTINGS_PER_ARTIST = 50
+
+# Painting.SELECT_SQL as of schema version 4, before artists moved to their own table
+LEGACY_SELECT_SQL = """
+    SELECT paintings.id, paintings.title, paintings.artist, paintings.year,
+           paintings.museum_id, museums.name, museums.location
+    FROM paintings
+    JOIN museums ON museums.id = paintings.museum_id
+"""
+
+
+def populate(conn, size, seed=0):
+  """Fill the version 1 tables with size paintings spread over size / PAINTINGS_PER_MUSEUM museums"""
+  rng = random.Random(seed)
+  museum_count = max(1, size // PAINTINGS_PER_MUSEUM)
+  artist_count = max(1, size // PAINTINGS_PER_ARTIST)
+  for sql in MIGRATIONS[0]:
+    conn.execute(sql)
+  conn.execute("PRAGMA user_version = 1")
+  conn.executemany(
+    "INSERT INTO museums (id, name, location) VALUES (?, ?, ?)",
+    ((i, f"Museum {i}", f"City {i % 500}") for i in range(1, museum_count + 1)),
+  )
+  conn.executemany(
+    "INSERT INTO paintings (id, title, artist, year, museum_id) VALUES (?, ?, ?, ?, ?)",
+    (
+      (i, f"Painting {i}", f"Artist {rng.randrange(artist_count)}", rng.randint(1300, 2020),
+       rng.randint(1, museum_count))
+      for i in range(1, size + 1)
+    ),
+  )
+  conn.commit()
+  return museum_count, artist_count
+
+
+def finder_queries(size, museum_count, artist_count, rng):
+  """Return (finder name, sql, parameter factory) for each indexed finder, using the finders' own SQL"""
+  paintings_where = LEGACY_SELECT_SQL + " WHERE paintings.{} = ?"
+  return [
+    ("Museum.find_by_name", "SELECT * FROM museums WHERE name = ?",
+     lambda: (f"Museum {rng.randint(1, museum_count)}",)),
+    ("Museum.find_by_location", "SELECT * FROM museums WHERE location = ?",
+     lambda: (f"City {rng.randrange(500)}",)),
+    ("Painting.find_by_title", paintings_where.format("title"),
+     lambda: (f"Painting {rng.randint(1, size)}",)),
+    ("Painting.find_by_artist", paintings_where.format("artist"),
+     lambda: (f"Artist {rng.randrange(artist_count)}",)),
+    ("Painting.find_by_year", paintings_where.format("year"),
+     lambda: (rng.randint(1300, 2020),)),
+    ("Painting.find_by_museum", paintings_where.format("museum_id"),
+     lambda: (rng.randint(1, museum_count),)),
+  ]
+
+
+def time_queries(conn, queries, repeat):
+  """Return the median latency in milliseconds of each finder query"""
+  results = {}
+  for name, sql, params in queries:
+    samples = []
+    for _ in range(repeat):
+      args = params()
+      start = time.perf_counter()
+      conn.execute(sql, args).fetchall()
+      samples.append((time.perf_counter() - start) * 1000)
+    results[name] = statistics.median(samples)
+  return results
+
+
+def run(size, repeat):
+  with tempfile.TemporaryDirectory() as directory:
+    conn = sqlite3.connect(os.path.join(directory, "bench.db"))
+    museum_count, artist_count = populate(conn, size)
+    queries = finder_queries(size, museum_count, artist_count, random.Random(1))
+    before = time_queries(conn, queries, repeat)
+    migrate(conn, target=2)
+    conn.execute("ANALYZE")
+    after = time_queries(conn, queries, repeat)
+    conn.close()
+
+  print(f"\n{size:,} paintings, {museum_count:,} museums (median of {repeat} calls)")
+  print(f"{'finder':<26}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+  for name in before:
+    speedup = before[name] / after[name] if after[name] else float("inf")
+    print(f"{name:<26}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+  parser.add_argument("--repeat", type=int, default=50)
+  args = parser.parse_args()
+  for size in args.sizes:
+    run(size, args.repeat)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,183 @@
+# lib/benchmarks/load.py
+"""Load test of the HTTP service: requests per second and latency percentiles under concurrent clients.
+
+Usage: python -m benchmarks.load [--url http://127.0.0.1:8000] [--clients 8] [--duration 10] [--writes 0.05]
+Without --url, a generated catalogue is loaded into a scratch database and `cli.py serve` is started on it
+(--museums, --per-museum, --workers and --seed apply only then). Each client keeps one keep-alive connection
+and sends a mix of list, detail and search requests, plus painting updates for the --writes fraction.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .suite import Catalogue
+
+LIB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_json(connection, path):
+  connection.request("GET", path)
+  response = connection.getresponse()
+  body = response.read()
+  if response.status != 200:
+    raise RuntimeError(f"GET {path} returned {response.status}: {body[:200]!r}")
+  return json.loads(body)
+
+
+def discover(host, port):
+  """Return the museum and painting ids and a few artist words to send requests for"""
+  connection = http.client.HTTPConnection(host, port, timeout=30)
+  museum_ids = [museum["id"] for museum in get_json(connection, "/museums?stream=true")]
+  paintings = get_json(connection, "/paintings?limit=500")["items"]
+  connection.close()
+  if not museum_ids or not paintings:
+    raise SystemExit("the catalogue is empty; load one first")
+  last_id = paintings[-1]["id"]
+  words = sorted({painting["artist"].split()[-1] for painting in paintings})
+  return museum_ids, last_id, words
+
+
+def requests(random, museum_ids, last_id, words, writes):
+  """Yield (name, method, path, body) for an endless mix of requests"""
+  while True:
+    if random.random() < writes:
+      body = json.dumps({"year": random.randint(1300, 2000)})
+      yield "update_painting", "PATCH", f"/paintings/{random.randint(1, last_id)}", body
+      continue
+    pick = random.random()
+    if pick < 0.3:
+      yield "painting", "GET", f"/paintings/{random.randint(1, last_id)}", None
+    elif pick < 0.5:
+      yield "museum", "GET", f"/museums/{random.choice(museum_ids)}", None
+    elif pick < 0.7:
+      yield "museum_paintings", "GET", f"/museums/{random.choice(museum_ids)}/paintings?limit=50", None
+    elif pick < 0.85:
+      yield "paintings_page", "GET", f"/paintings?after_id={random.randint(0, last_id)}&limit=50", None
+    else:
+      yield "search", "GET", f"/search?q={random.choice(words)}&limit=20", None
+
+
+def client(host, port, seed, deadline, ids, writes, latencies, errors):
+  """Send requests on one keep-alive connection until deadline, recording each latency by request name"""
+  mix = requests(random.Random(seed), *ids, writes)
+  connection = http.client.HTTPConnection(host, port, timeout=30)
+  while time.perf_counter() < deadline:
+    name, method, path, body = next(mix)
+    headers = {"Content-Type": "application/json"} if body else {}
+    start = time.perf_counter()
+    try:
+      connection.request(method, path, body, headers)
+      response = connection.getresponse()
+      response.read()
+      failed = response.status >= 500
+    except (OSError, http.client.HTTPException):
+      connection.close()
+      failed = True
+    latencies.setdefault(name, []).append(time.perf_counter() - start)
+    if failed:
+      errors[name] = errors.get(name, 0) + 1
+  connection.close()
+
+
+def percentile(samples, fraction):
+  return sorted(samples)[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def wait_for(host, port, process, timeout=60):
+  deadline = time.perf_counter() + timeout
+  while time.perf_counter() < deadline:
+    if process.poll() is not None:
+      raise SystemExit(f"the server exited with status {process.returncode}")
+    try:
+      socket.create_connection((host, port), timeout=1).close()
+      return
+    except OSError:
+      time.sleep(0.1)
+  raise SystemExit("the server did not start listening in time")
+
+
+def free_port():
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def run(host, port, args):
+  ids = discover(host, port)
+  deadline = time.perf_counter() + args.duration
+  results = [({}, {}) for _ in range(args.clients)]
+  threads = [
+    threading.Thread(target=client, args=(host, port, args.seed + n, deadline, ids, args.writes, *results[n]))
+    for n in range(args.clients)
+  ]
+  start = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - start
+
+  latencies = {}
+  errors = {}
+  for client_latencies, client_errors in results:
+    for name, samples in client_latencies.items():
+      latencies.setdefault(name, []).extend(samples)
+    for name, count in client_errors.items():
+      errors[name] = errors.get(name, 0) + count
+  every = [sample for samples in latencies.values() for sample in samples]
+  print(f"{len(every):,} requests from {args.clients} clients in {elapsed:.1f}s: "
+        f"{len(every) / elapsed:,.0f} requests per second, {sum(errors.values())} errors")
+  print(f"{'request':<18}{'count':>9}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+  for name, samples in sorted(latencies.items()) + [("all", every)]:
+    failed = sum(errors.values()) if name == "all" else errors.get(name, 0)
+    print(f"{name:<18}{len(samples):>9,}{statistics.median(samples) * 1000:>10.2f}"
+          f"{percentile(samples, 0.99) * 1000:>10.2f}{failed:>8}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--url", help="a running server; by default one is started on a generated catalogue")
+  parser.add_argument("--clients", type=int, help="concurrent clients; defaults to --workers")
+  parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests for")
+  parser.add_argument("--writes", type=float, default=0.05, help="fraction of requests that update a painting")
+  parser.add_argument("--museums", type=int, default=200)
+  parser.add_argument("--per-museum", type=int, default=500)
+  parser.add_argument("--workers", type=int, default=8, help="server threads (the server's default)")
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+  args.clients = args.clients or args.workers
+
+  if args.url:
+    url = urlsplit(args.url)
+    run(url.hostname, url.port or 80, args)
+    return
+
+  with tempfile.TemporaryDirectory() as directory:
+    catalogue = Catalogue(args.museums, args.per_museum, args.seed, directory)
+    catalogue.load()
+    port = free_port()
+    env = {**os.environ, "MUSEUMS_DB": os.path.join(directory, f"catalogue-{catalogue.loads}.db")}
+    server = subprocess.Popen(
+      [sys.executable, "cli.py", "serve", "--port", str(port), "--workers", str(args.workers)],
+      cwd=LIB, env=env, stderr=subprocess.DEVNULL,
+    )
+    try:
+      wait_for("127.0.0.1", port, server)
+      run("127.0.0.1", port, args)
+    finally:
+      server.terminate()
+      server.wait()
+
+
+if __name__ == "__main__":
+  main()
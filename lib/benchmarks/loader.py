@@ -0,0 +1,75 @@
+# lib/benchmarks/loader.py
+"""Throughput of the parallel loader against the serial catalogue import, by number of worker processes.
+
+Usage: python -m benchmarks.loader [--museums 200] [--per-museum 1000] [--workers 1 2 4] [--chunk-size 5000] [--seed 0]
+Each run loads the same generated JSONL file into a new database and checks it holds the same rows as the serial import.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from models import DB
+from models.artist import Artist
+from models.catalogue import import_catalogue
+from models.loader import load_catalogue
+from models.schema import migrate
+
+from .generator import CatalogueGenerator
+
+# Compared between each run's database and the serial import's
+CHECKS = [
+  "SELECT id, title, artist_id, year, museum_id FROM paintings ORDER BY id",
+  "SELECT id, name FROM artists ORDER BY id",
+  "SELECT rowid, title, artist, museum FROM paintings_fts ORDER BY rowid",
+]
+
+
+def timed_load(path, database, load):
+  """Load path into a new database file with load; return the seconds taken and a fingerprint of the rows"""
+  DB.configure(path=database)
+  migrate()
+  Artist.reset()
+  start = time.perf_counter()
+  load()
+  seconds = time.perf_counter() - start
+  fingerprint = [hash(tuple(DB.execute(sql).fetchall())) for sql in CHECKS]
+  DB.close()
+  return seconds, fingerprint
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--museums", type=int, default=200)
+  parser.add_argument("--per-museum", type=int, default=1000)
+  parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+  parser.add_argument("--chunk-size", type=int, default=5000)
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "catalogue.jsonl")
+    rows = 0
+    with open(path, "w") as file:
+      for record in CatalogueGenerator(args.museums, args.per_museum, args.seed).records():
+        file.write(json.dumps(record) + "\n")
+        rows += 1
+
+    runs = [("serial import", lambda: import_catalogue(path, chunk_size=args.chunk_size))]
+    for workers in args.workers:
+      runs.append((f"{workers} workers", lambda workers=workers: load_catalogue(path, workers=workers,
+                                                                                block_size=args.chunk_size)))
+    print(f"{rows:,} records, {os.cpu_count()} CPUs")
+    print(f"{'loader':<16}{'seconds':>10}{'rows/s':>12}{'speedup':>10}  rows")
+    baseline = None
+    for number, (name, load) in enumerate(runs):
+      seconds, fingerprint = timed_load(path, os.path.join(directory, f"load-{number}.db"), load)
+      if baseline is None:
+        baseline = seconds, fingerprint
+      same = "same" if fingerprint == baseline[1] else "DIFFERENT"
+      print(f"{name:<16}{seconds:>10.2f}{rows / seconds:>12,.0f}{baseline[0] / seconds:>9.1f}x  {same}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+# lib/benchmarks/memory.py
+"""Finder and update latency with the database on disk and loaded into memory.
+
+Usage: python -m benchmarks.memory [--museums 200] [--per-museum 500] [--repeat 5] [--seed 0]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from models.memory import MemoryDatabase
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+
+from .suite import Catalogue, find_by_artist, find_by_museum, pick_paintings, reset_caches, timed, update_storm
+
+LOOKUPS = 500
+
+
+def find_by_id(catalogue):
+  pick_paintings(catalogue, LOOKUPS)
+  return LOOKUPS
+
+
+def search(catalogue):
+  for _ in range(LOOKUPS // 10):
+    Painting.search(catalogue.random.choice(catalogue.artists).split()[-1])
+  return LOOKUPS // 10
+
+
+# Scenarios timed in every mode; update_storm runs last, since it writes
+SCENARIOS = {
+  "find_by_id": find_by_id,
+  "find_by_museum": find_by_museum,
+  "find_by_artist": find_by_artist,
+  "search": search,
+  "update_storm": update_storm,
+}
+MODES = ("disk", "write-through", "write-back")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--museums", type=int, default=200)
+  parser.add_argument("--per-museum", type=int, default=500)
+  parser.add_argument("--repeat", type=int, default=5)
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  QUERY_CACHE.configure(maxsize=0)
+  results = {name: {} for name in SCENARIOS}
+  notes = []
+  with tempfile.TemporaryDirectory() as directory:
+    catalogue = Catalogue(args.museums, args.per_museum, args.seed, directory)
+    catalogue.load()
+    for mode in MODES:
+      memory = None if mode == "disk" else MemoryDatabase(mode, interval=3600).start()
+      if memory:
+        notes.append(f"{mode}: loaded in {memory.load_seconds * 1000:.0f}ms")
+      for name, scenario in SCENARIOS.items():
+        samples = []
+        for _ in range(args.repeat):
+          reset_caches()
+          seconds, operations = timed(scenario, catalogue)
+          samples.append(seconds / operations)
+        results[name][mode] = statistics.median(samples)
+      if memory:
+        start = time.perf_counter()
+        flushed = memory.flush()
+        if flushed:
+          notes.append(f"{mode}: wrote back {flushed:,} statements in {(time.perf_counter() - start) * 1000:.0f}ms")
+        memory.stop()
+
+  print(f"{len(catalogue.paintings):,} paintings, median ms per operation of {args.repeat} runs")
+  print(f"{'scenario':<18}" + "".join(f"{mode:>15}" for mode in MODES))
+  for name, by_mode in results.items():
+    print(f"{name:<18}" + "".join(f"{by_mode[mode] * 1000:>15.3f}" for mode in MODES))
+  for note in notes:
+    print(note)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+# lib/benchmarks/snapshot.py
+"""Cold start and finder latency of a columnar snapshot against the SQLite models.
+
+Usage: python -m benchmarks.snapshot [--museums 200] [--per-museum 500] [--seed 0]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from models import DB
+from models.museum import Museum
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+from models.snapshot import Snapshot, export_snapshot
+
+from .suite import Catalogue, reset_caches
+
+LOOKUPS = 50
+
+
+def timed(fn, *args):
+  start = time.perf_counter()
+  result = fn(*args)
+  return time.perf_counter() - start, result
+
+
+def open_snapshot(path):
+  snapshot = Snapshot(path)
+  snapshot.find_museum(1)
+  return snapshot
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--museums", type=int, default=200)
+  parser.add_argument("--per-museum", type=int, default=500)
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  QUERY_CACHE.configure(maxsize=0)
+  with tempfile.TemporaryDirectory() as directory:
+    catalogue = Catalogue(args.museums, args.per_museum, args.seed, directory)
+    catalogue.load()
+    path = os.path.join(directory, "catalogue.snapshot")
+    seconds, _ = timed(export_snapshot, path)
+    database = os.path.join(directory, "catalogue-1.db")
+    print(f"{len(catalogue.paintings):,} paintings: export {seconds:.2f}s, "
+          f"snapshot {os.path.getsize(path) / 2**20:.1f} MiB, database {os.path.getsize(database) / 2**20:.1f} MiB")
+
+    rng = random.Random(args.seed)
+    museum_ids = [rng.randint(1, args.museums) for _ in range(LOOKUPS)]
+    artists = [rng.choice(catalogue.artists) for _ in range(LOOKUPS)]
+    decades = [rng.randrange(1300, 2000, 10) for _ in range(LOOKUPS)]
+
+    DB.close()
+    reset_caches()
+    sqlite_open, _ = timed(lambda: Museum.find_by_id(1))
+    snapshot_open, snapshot = timed(open_snapshot, path)
+    print(f"\n{'open and first lookup':<28}{'sqlite':>12}{'snapshot':>12}")
+    print(f"{'':<28}{sqlite_open * 1000:>10.2f}ms{snapshot_open * 1000:>10.2f}ms")
+
+    print(f"\n{'per lookup':<28}{'sqlite':>12}{'snapshot':>12}")
+    cases = [
+      ("find_by_museum", museum_ids, Painting.find_by_museum, snapshot.find_by_museum),
+      ("find_by_artist", artists, Painting.find_by_artist, snapshot.find_by_artist),
+      ("decade (year range)", decades,
+       lambda start: Painting.instances_from_db(DB.execute(Painting.SELECT_SQL + " WHERE paintings.year BETWEEN ? AND ?",
+                                                           (start, start + 9)).fetchall()),
+       lambda start: snapshot.find_by_year_range(start, start + 9)),
+    ]
+    for name, keys, model_finder, snapshot_finder in cases:
+      reset_caches()
+      model_seconds, _ = timed(lambda: [model_finder(key) for key in keys])
+      snapshot_seconds, _ = timed(lambda: [snapshot_finder(key) for key in keys])
+      print(f"{name:<28}{model_seconds / LOOKUPS * 1000:>10.2f}ms{snapshot_seconds / LOOKUPS * 1000:>10.2f}ms")
+    snapshot.close()
+    DB.close()
+
+
+if __name__ == "__main__":
+  main()
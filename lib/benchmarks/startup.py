@@ -0,0 +1,81 @@
+# lib/benchmarks/startup.py
+"""Cold-start cost of the CLI: import time of cli.py and wall time of a non-interactive command.
+
+Usage: python -m benchmarks.startup [--repeat 10] [--top 10] [--output FILE]
+Each measurement runs in a fresh interpreter. Import times come from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+LIB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times():
+  """Import cli in a new interpreter and return {module: cumulative microseconds} from -X importtime"""
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", "import cli"],
+    cwd=LIB, capture_output=True, text=True, check=True,
+  )
+  times = {}
+  for line in result.stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+      continue
+    _, cumulative, name = line[len("import time:"):].split("|")
+    times[name.strip()] = int(cumulative)
+  return times
+
+
+def command_seconds(args, env):
+  """Run cli.py with args in a new interpreter and return the wall time in seconds"""
+  start = time.perf_counter()
+  subprocess.run([sys.executable, "cli.py", *args], cwd=LIB, env=env, capture_output=True, check=True)
+  return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--repeat", type=int, default=10)
+  parser.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+  parser.add_argument("--output", help="also write the results as JSON")
+  args = parser.parse_args()
+
+  runs = [import_times() for _ in range(args.repeat)]
+  import_ms = statistics.median(run["cli"] for run in runs) / 1000
+  # Every imported module by its median cumulative time
+  modules = {name: statistics.median(run.get(name, 0) for run in runs) / 1000 for name in runs[0]}
+  slowest = sorted(((ms, name) for name, ms in modules.items() if name != "cli"), reverse=True)[:args.top]
+
+  with tempfile.TemporaryDirectory() as directory:
+    env = {**os.environ, "MUSEUMS_DB": os.path.join(directory, "startup.db")}
+    command_seconds(["list-museums"], env)
+    list_ms = statistics.median(command_seconds(["list-museums"], env) for _ in range(args.repeat)) * 1000
+    help_ms = statistics.median(command_seconds(["--help"], env) for _ in range(args.repeat)) * 1000
+
+  print(f"import cli:              {import_ms:8.1f} ms")
+  print(f"cli.py --help:           {help_ms:8.1f} ms")
+  print(f"cli.py list-museums:     {list_ms:8.1f} ms")
+  print(f"\nSlowest imports (cumulative, median of {args.repeat}):")
+  for ms, name in slowest:
+    print(f"{ms:8.1f} ms  {name}")
+
+  if args.output:
+    with open(args.output, "w") as file:
+      json.dump({
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "import_ms": import_ms,
+        "help_ms": help_ms,
+        "list_museums_ms": list_ms,
+        "imports": {name: ms for ms, name in slowest},
+      }, file, indent=2)
+      file.write("\n")
+
+
+if __name__ == "__main__":
+  main()
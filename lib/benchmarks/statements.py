@@ -0,0 +1,73 @@
+# lib/benchmarks/statements.py
+"""Per-call overhead of Museum.find_by_id: a shared cursor without sqlite3's statement cache,
+with it, and through the model layer with the query cache off and on.
+
+Usage: python -m benchmarks.statements [--calls 20000] [--museums 1000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from models import DB
+from models.museum import Museum
+from models.query_cache import QUERY_CACHE
+from models.schema import migrate
+from models.statements import STATEMENTS
+
+# The statement as find_by_id wrote it before the registry: an indented triple-quoted literal
+FIND_BY_ID = """
+      SELECT *
+      FROM museums
+      WHERE id = ?
+    """
+
+
+def per_call(calls, fn, ids):
+  """Return the mean microseconds per call of fn(id) over calls random ids"""
+  start = time.perf_counter()
+  for i in range(calls):
+    fn(ids[i % len(ids)])
+  return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--calls", type=int, default=20_000)
+  parser.add_argument("--museums", type=int, default=1_000)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "bench.db")
+    DB.configure(path=path)
+    migrate()
+    Museum.bulk_create(Museum(f"Museum {i}", f"City {i}") for i in range(args.museums))
+    rng = random.Random(0)
+    ids = [rng.randint(1, args.museums) for _ in range(1000)]
+
+    results = []
+    for cached_statements in (0, 128):
+      conn = sqlite3.connect(path, cached_statements=cached_statements)
+      cursor = conn.cursor()
+      results.append((
+        f"shared cursor, cached_statements={cached_statements}",
+        per_call(args.calls, lambda id: cursor.execute(FIND_BY_ID, (id,)).fetchone(), ids),
+      ))
+      conn.close()
+
+    QUERY_CACHE.configure(maxsize=0)
+    results.append(("Museum.find_by_id, query cache off", per_call(args.calls, Museum.find_by_id, ids)))
+    QUERY_CACHE.configure(maxsize=256)
+    results.append(("Museum.find_by_id, query cache on", per_call(args.calls, Museum.find_by_id, ids)))
+    DB.close()
+
+  print(f"{args.calls:,} calls over {args.museums:,} museums, {len(STATEMENTS)} registered statements")
+  print(f"{'path':<44}{'us/call':>10}")
+  for name, micros in results:
+    print(f"{name:<44}{micros:>10.2f}")
+
+
+if __name__ == "__main__":
+  main()
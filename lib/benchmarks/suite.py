@@ -0,0 +1,243 @@
+# lib/benchmarks/suite.py
+"""Timed catalogue scenarios with JSON results, and a comparison of two result files.
+
+Usage:
+  python -m benchmarks.suite run [--museums 50] [--per-museum 200] [--repeat 5] [--seed 0]
+                                [--scenario NAME] [--query-cache] [--output FILE]
+  python -m benchmarks.suite compare BASE.json NEW.json [--threshold 0.10]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from models import DB
+from models.artist import Artist
+from models.museum import Museum
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+from models.schema import migrate
+from models.session import transaction
+
+from .generator import CatalogueGenerator
+
+LOOKUPS = 100
+UPDATES = 500
+
+
+class Catalogue:
+  """A generated catalogue and the scratch databases it is loaded into"""
+
+  def __init__(self, museums, paintings_per_museum, seed, directory):
+    generator = CatalogueGenerator(museums, paintings_per_museum, seed)
+    self.museums = []
+    self.paintings = []
+    for record in generator.records():
+      if record["type"] == "museum":
+        self.museums.append((record["name"], record["location"]))
+      else:
+        self.paintings.append((record["title"], record["artist"], record["year"], record["museum_id"] - 1))
+    self.artists = generator.artists
+    self.random = random.Random(seed)
+    self.directory = directory
+    self.loads = 0
+
+  def load(self):
+    """Load the catalogue into a new database file with bulk_create; return the number of rows inserted"""
+    self.loads += 1
+    DB.configure(path=os.path.join(self.directory, f"catalogue-{self.loads}.db"))
+    migrate()
+    reset_caches()
+    museums = Museum.bulk_create(Museum(name, location) for name, location in self.museums)
+    Painting.bulk_create(
+      Painting(title, artist, year, museums[index]) for title, artist, year, index in self.paintings
+    )
+    return len(self.museums) + len(self.paintings)
+
+  def museum_ids(self, count):
+    return [self.random.randint(1, len(self.museums)) for _ in range(count)]
+
+
+def reset_caches():
+  """Start a scenario run with empty identity maps and query cache, so it measures the database path"""
+  Museum.all.clear()
+  Painting.all.clear()
+  Artist.reset()
+  QUERY_CACHE.clear()
+
+
+def get_all(catalogue):
+  Painting.get_all()
+  return 1
+
+
+def find_by_museum(catalogue):
+  for museum_id in catalogue.museum_ids(LOOKUPS):
+    Painting.find_by_museum(museum_id)
+  return LOOKUPS
+
+
+def find_by_artist(catalogue):
+  for _ in range(LOOKUPS):
+    Painting.find_by_artist(catalogue.random.choice(catalogue.artists))
+  return LOOKUPS
+
+
+def pick_paintings(catalogue, count):
+  ids = [catalogue.random.randint(1, len(catalogue.paintings)) for _ in range(count)]
+  return [painting for painting in map(Painting.find_by_id, ids) if painting]
+
+
+def update_storm(catalogue):
+  """UPDATES single-painting updates, each committed on its own"""
+  paintings = pick_paintings(catalogue, UPDATES)
+  for painting in paintings:
+    painting.update(year=catalogue.random.randint(1300, 1999))
+  return len(paintings)
+
+
+def update_storm_transaction(catalogue):
+  """The same updates inside one transaction(), flushed as a batch"""
+  paintings = pick_paintings(catalogue, UPDATES)
+  with transaction():
+    for painting in paintings:
+      painting.update(year=catalogue.random.randint(1300, 1999))
+  return len(paintings)
+
+
+def cascade_delete(catalogue):
+  """Delete one museum and all its paintings"""
+  for museum_id in catalogue.museum_ids(len(catalogue.museums)):
+    museum = Museum.find_by_id(museum_id)
+    if museum:
+      count = len(Painting.find_by_museum(museum_id))
+      museum.delete(cascade=True)
+      return count + 1
+  return 0
+
+
+# Scenarios in the order they run; cascade_delete is last since it removes data
+SCENARIOS = {
+  "get_all": get_all,
+  "find_by_museum": find_by_museum,
+  "find_by_artist": find_by_artist,
+  "update_storm": update_storm,
+  "update_storm_transaction": update_storm_transaction,
+  "cascade_delete": cascade_delete,
+}
+
+
+def timed(fn, *args):
+  start = time.perf_counter()
+  operations = fn(*args)
+  return time.perf_counter() - start, operations
+
+
+def summarize(runs):
+  seconds = [run for run, _ in runs]
+  median = statistics.median(seconds)
+  operations = runs[0][1]
+  return {
+    "runs": seconds,
+    "median": median,
+    "min": min(seconds),
+    "operations": operations,
+    "ops_per_second": operations / median if median else None,
+  }
+
+
+def run(museums, paintings_per_museum, repeat, seed, names, query_cache=False):
+  """Run the bulk load and then each named scenario repeat times; return the results as a dictionary.
+  The query cache is disabled unless query_cache is true, so repeated lookups reach the database."""
+  if not query_cache:
+    QUERY_CACHE.configure(maxsize=0)
+  results = {}
+  with tempfile.TemporaryDirectory() as directory:
+    catalogue = Catalogue(museums, paintings_per_museum, seed, directory)
+    results["bulk_load"] = summarize([timed(catalogue.load) for _ in range(repeat)])
+    for name in names:
+      runs = []
+      for _ in range(repeat):
+        reset_caches()
+        runs.append(timed(SCENARIOS[name], catalogue))
+      results[name] = summarize(runs)
+    DB.close()
+
+  return {
+    "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    "python": platform.python_version(),
+    "sqlite": sqlite3.sqlite_version,
+    "config": {"museums": museums, "paintings_per_museum": paintings_per_museum, "repeat": repeat, "seed": seed,
+               "query_cache": query_cache},
+    "scenarios": results,
+  }
+
+
+def compare(base, new, threshold):
+  """Print each scenario's median in both runs and return the names of those slower by more than threshold"""
+  regressions = []
+  print(f"{'scenario':<28}{'base s':>12}{'new s':>12}{'change':>10}")
+  for name, result in new["scenarios"].items():
+    if name not in base["scenarios"]:
+      print(f"{name:<28}{'-':>12}{result['median']:>12.4f}{'new':>10}")
+      continue
+    before = base["scenarios"][name]["median"]
+    change = result["median"] / before - 1 if before else 0.0
+    flag = ""
+    if change > threshold:
+      regressions.append(name)
+      flag = "  REGRESSION"
+    print(f"{name:<28}{before:>12.4f}{result['median']:>12.4f}{change:>+10.1%}{flag}")
+  if base["config"] != new["config"]:
+    print("warning: the runs used different configurations")
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  commands = parser.add_subparsers(dest="command", required=True)
+  run_parser = commands.add_parser("run", help="run the scenarios and write JSON results")
+  run_parser.add_argument("--museums", type=int, default=50)
+  run_parser.add_argument("--per-museum", type=int, default=200)
+  run_parser.add_argument("--repeat", type=int, default=5)
+  run_parser.add_argument("--seed", type=int, default=0)
+  run_parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                          help="run only this scenario (repeatable); bulk_load always runs")
+  run_parser.add_argument("--query-cache", action="store_true", help="leave the query cache enabled")
+  run_parser.add_argument("--output", help="write results here instead of stdout")
+  compare_parser = commands.add_parser("compare", help="flag scenarios that got slower between two result files")
+  compare_parser.add_argument("base")
+  compare_parser.add_argument("new")
+  compare_parser.add_argument("--threshold", type=float, default=0.10,
+                              help="fractional slowdown of the median that counts as a regression")
+  args = parser.parse_args()
+
+  if args.command == "run":
+    names = [name for name in SCENARIOS if not args.scenario or name in args.scenario]
+    results = run(args.museums, args.per_museum, args.repeat, args.seed, names, args.query_cache)
+    output = json.dumps(results, indent=2)
+    if args.output:
+      with open(args.output, "w") as file:
+        file.write(output + "\n")
+    else:
+      print(output)
+  else:
+    with open(args.base) as file:
+      base = json.load(file)
+    with open(args.new) as file:
+      new = json.load(file)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+      print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,9 +1,11 @@
 # lib/cli.py
+import functools
+
 import click
-from models.museum import Museum
-from models.painting import Painting
+from models.schema import migrate
 
 from helpers import (
+    PAGE_SIZE,
     list_museums,
     create_museum,
     update_museum,
@@ -12,34 +14,182 @@ from helpers import (
     create_painting,
     update_painting,
     delete_painting,
+    search_paintings,
+    print_museums,
+    show_museum,
+    add_painting,
+    print_report,
+    apply_batch,
+    import_catalogue,
+    export_catalogue,
+    export_snapshot,
     exit_program,
 )
 
 
-@click.command()
-def cli():
-    main_menu()
+@click.group(invoke_without_command=True)
+@click.option("--profile", is_flag=True, help="Print a summary of the SQL statements run on exit.")
+@click.option("--slow-ms", type=float, help="Log statements taking at least this many milliseconds.")
+@click.option("--explain", is_flag=True, help="Include the query plan of each slow statement in the log.")
+@click.option("--memory", is_flag=True, help="Load the database into memory and write changes through to it.")
+@click.option("--write-back", type=click.FloatRange(min=0, min_open=True), metavar="SECONDS",
+              help="Load the database into memory and write changes back every SECONDS and on exit.")
+@click.pass_context
+def cli(ctx, profile, slow_ms, explain, memory, write_back):
+    if profile or slow_ms is not None:
+        from models.profiler import Profiler
+        profiler = Profiler(slow_ms, explain).start()
+        if profile:
+            ctx.call_on_close(lambda: click.echo(f"\n{profiler.report()}", err=True))
+
+    def open_database():
+        migrate()
+        if memory or write_back is not None:
+            from models.memory import MemoryDatabase
+            if write_back is None:
+                database = MemoryDatabase("write-through").start()
+            else:
+                database = MemoryDatabase("write-back", write_back).start()
+            ctx.call_on_close(database.stop)
+
+    # Subcommands call it once their own arguments are parsed, so `<command> --help` leaves the file alone
+    ctx.obj = open_database
+    if ctx.invoked_subcommand is None:
+        open_database()
+        main_menu()
+
+
+def command(name):
+    """Register a subcommand of cli that migrates (and loads, with --memory) the database before it runs"""
+    def decorator(f):
+        @functools.wraps(f)
+        def run(*args, **kwargs):
+            click.get_current_context().obj()
+            return f(*args, **kwargs)
+        return cli.command(name)(run)
+    return decorator
+
+
+@command("list-museums")
+def list_museums_command():
+    """List every museum with its id."""
+    print_museums()
+
+
+@command("show-museum")
+@click.argument("museum_id", type=int)
+@click.pass_context
+def show_museum_command(ctx, museum_id):
+    """Show a museum and list its paintings."""
+    if show_museum(museum_id) is None:
+        ctx.exit(1)
+
+
+@command("add-painting")
+@click.argument("museum_id", type=int)
+@click.option("--title", required=True)
+@click.option("--artist", required=True)
+@click.option("--year", type=int, required=True)
+@click.pass_context
+def add_painting_command(ctx, museum_id, title, artist, year):
+    """Add a painting to the museum with the given id."""
+    if add_painting(museum_id, title, artist, year) is None:
+        ctx.exit(1)
+
+
+@command("search")
+@click.argument("query", nargs=-1, required=True)
+@click.option("--limit", default=20, show_default=True, help="Maximum number of paintings to list.")
+def search_command(query, limit):
+    """Search paintings by title, artist or museum name, matching word prefixes."""
+    search_paintings(" ".join(query), limit)
+
+
+@command("report")
+@click.option("--top", default=10, show_default=True, help="Number of museums and artists to list.")
+@click.option("--bucket", type=click.Choice(["decade", "century"]), default="decade", show_default=True,
+              help="Width of the year histogram buckets.")
+def report_command(top, bucket):
+    """Print painting counts per museum, top artists and the spread of painting years."""
+    print_report(top, bucket)
+
+
+@command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--chunk-size", default=1000, show_default=True, help="Rows per executemany batch.")
+@click.option("--workers", type=click.IntRange(min=0),
+              help="Parse and validate in this many processes (0 for one per CPU) and write from another.")
+def import_command(path, format, chunk_size, workers):
+    """Import museums and paintings from a CSV or JSONL catalogue file."""
+    import_catalogue(path, format, chunk_size, workers)
+
+
+@command("export")
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--format", "format", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--chunk-size", default=1000, show_default=True, help="Rows fetched per batch.")
+def export_command(path, format, chunk_size):
+    """Export every museum and painting to a CSV or JSONL catalogue file."""
+    export_catalogue(path, format, chunk_size)
+
+
+@command("snapshot")
+@click.argument("path", type=click.Path(dir_okay=False))
+def snapshot_command(path):
+    """Write a read-only columnar snapshot of the catalogue for models.snapshot.Snapshot."""
+    export_snapshot(path)
+
+
+@command("batch")
+@click.argument("operations", type=click.File("r"), default="-")
+@click.option("--results", type=click.File("w"), default="-", help="Where to write one JSON result per operation.")
+@click.option("--batch-size", default=1000, show_default=True, help="Operations per transaction.")
+@click.pass_context
+def batch_command(ctx, operations, results, batch_size):
+    """Apply create/update/delete operations from a JSONL file (or stdin) and report each result."""
+    if apply_batch(operations, results, batch_size):
+        ctx.exit(1)
+
+
+@command("serve")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True)
+@click.option("--workers", default=8, show_default=True, type=click.IntRange(min=1),
+              help="Threads handling requests, each with its own database connection.")
+@click.option("--log", "log_requests", is_flag=True, help="Log every request to stderr.")
+def serve_command(host, port, workers, log_requests):
+    """Serve the catalogue as a JSON HTTP API until interrupted."""
+    from server import serve
+    serve(host, port, workers, log_requests)
 
 
 def main_menu():
     while True:
         click.echo("\nPlease select an option: \n")
         click.echo("Type M or m to see the museums")
+        click.echo("Type S or s to search the paintings")
         click.echo("Type E or e to exit\n")
         choice = input("> ")
 
         if choice.lower() == "m":
             museums_menu()
+        elif choice.lower() == "s":
+            search_paintings()
         elif choice.lower() == "e":
             exit_program()
         else: 
-            click.echo("Invalid choice. Type M/m or E/e.")
+            click.echo("Invalid choice. Type M/m, S/s or E/e.")
 
 
 def museums_menu():
+    # Keyset pagination: the id after which each page visited so far starts
+    pages = [0]
     while True:
         click.echo("\nMuseums: \n")
-        museums = list_museums()
+        museums = list_museums(pages[-1], PAGE_SIZE + 1)
+        has_next = len(museums) > PAGE_SIZE
+        museums = museums[:PAGE_SIZE]
 
         for i in range(len(museums)):
             museum = museums[i]
@@ -47,12 +197,20 @@ def museums_menu():
 
         click.echo(" \nPlease type the number corresponding to the museum from the list to see its details")
         click.echo("                or")
+        if has_next:
+            click.echo("Type N or n to see the next page")
+        if len(pages) > 1:
+            click.echo("Type P or p to see the previous page")
         click.echo("Type B or b to go back to the previous menu")
         click.echo("Type A or a to add a new museum")
         click.echo("Type E or e to exit\n")
         choice = input("> ")
 
-        if choice.lower() == "b":
+        if choice.lower() == "n" and has_next:
+            pages.append(museums[-1].id)
+        elif choice.lower() == "p" and len(pages) > 1:
+            pages.pop()
+        elif choice.lower() == "b":
             return main_menu()
         elif choice.lower() == "a":
             create_museum()
@@ -71,9 +229,13 @@ def museums_menu():
 
 
 def paintings_menu(museum):
+    # Keyset pagination: the id after which each page visited so far starts
+    pages = [0]
     while True:
         click.echo(f"\nPaintings at '{museum.name}': \n")
-        paintings = list_paintings(museum)
+        paintings = list_paintings(museum, pages[-1], PAGE_SIZE + 1)
+        has_next = len(paintings) > PAGE_SIZE
+        paintings = paintings[:PAGE_SIZE]
 
         if paintings:
             for i in range(len(paintings)):
@@ -82,6 +244,10 @@ def paintings_menu(museum):
 
         click.echo(" \nPlease type the number corresponding to the painting from the list to see its details")
         click.echo("                or")
+        if has_next:
+            click.echo("Type N or n to see the next page")
+        if len(pages) > 1:
+            click.echo("Type P or p to see the previous page")
         click.echo("Type B or b to go back to the previous menu")
         click.echo("Type A or a to add a new painting")
         click.echo("Type U or u to update this museum")
@@ -89,7 +255,11 @@ def paintings_menu(museum):
         click.echo("Type E or e to exit\n")
         choice = input("> ")
 
-        if choice.lower() == "b":
+        if choice.lower() == "n" and has_next:
+            pages.append(paintings[-1].id)
+        elif choice.lower() == "p" and len(pages) > 1:
+            pages.pop()
+        elif choice.lower() == "b":
             return museums_menu()
         elif choice.lower() == "a":
             create_painting(museum)
@@ -112,6 +282,7 @@ def paintings_menu(museum):
                 click.echo("Invalid choice. Type a number on the list, B/b, A/a, D/d, or E/e.")
 
 def painting_details_menu(painting, museum):
+    from models.painting import Painting
     while True:
         click.echo(f"\nDetails of '{painting.title}': ")
         click.echo(f"Artist: {painting.artist}")
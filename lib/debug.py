@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # lib/debug.py
 
-from models.__init__ import CONN, CURSOR
+from models import DB
 import ipdb
 
 
@@ -1,19 +1,23 @@
 # lib/helpers.py
+import json
 import sys
+import time
+from datetime import datetime
 import click
 from models.museum import Museum
 from models.painting import Painting
 
 
-def list_museums():
-    museums = Museum.get_all()
-    if not museums:
+# Number of museums or paintings listed per page in the menus
+PAGE_SIZE = 20
+
+
+def list_museums(after_id=0, limit=PAGE_SIZE):
+    museums = Museum.page(after_id, limit)
+    if not museums and not after_id:
         click.echo("No museums found.")
         return []
 
-    i = 1
-    for museum in museums:
-        i += 1
     return museums
 
 
@@ -60,22 +64,18 @@ def delete_museum(museum):
         click.echo("No museum selected.")
         return
 
-    paintings = Painting.find_by_museum(museum.id)
-    for painting in paintings:
-        painting.delete()
-
-    museum.delete()
+    museum.delete(cascade=True)
     click.echo(f"Museum '{museum.name}' has been deleted.")
 
 
-def list_paintings(museum):
+def list_paintings(museum, after_id=0, limit=PAGE_SIZE):
     if not museum:
         click.echo("No museum selected.")
         return []
 
-    paintings = Painting.find_by_museum(museum.id)
-    
-    if not paintings:
+    paintings = Painting.page(after_id, limit, museum_id=museum.id)
+
+    if not paintings and not after_id:
         click.echo("No paintings found.")
         return []
 
@@ -107,7 +107,6 @@ def create_painting(museum):
             click.echo("Year must be a valid number.")
             continue
         year = int(year_input)
-        from datetime import datetime
         current_year = datetime.now().year
         if year < 1000 or year > current_year:
             click.echo(f"Year must be between 1000 and {current_year}.")
@@ -144,7 +143,6 @@ def update_painting(painting):
         else:
             break
 
-    from datetime import datetime
     current_year = datetime.now().year
     while True:
         new_year_input = input(f"Enter a new year: ")
@@ -175,6 +173,135 @@ def delete_painting(painting):
     click.echo(f"Painting '{painting.title}' by {painting.artist} has been deleted.")
 
 
+def search_paintings(query=None, limit=20):
+    if query is None:
+        query = input("Search paintings by title, artist or museum: ")
+
+    paintings = Painting.search(query, limit)
+    if not paintings:
+        click.echo(f"No paintings match '{query}'.")
+        return []
+
+    for i in range(len(paintings)):
+        painting = paintings[i]
+        click.echo(f"{i + 1}. {painting.title} by {painting.artist} ({painting.year}) - {painting.museum.name}")
+    return paintings
+
+
+def print_museums():
+    count = 0
+    for museum in Museum.iter_all(as_rows=True):
+        click.echo(f"{museum.id}. {museum.name} ({museum.location})")
+        count += 1
+    if not count:
+        click.echo("No museums found.")
+
+
+def show_museum(museum_id):
+    museum = Museum.find_by_id(museum_id)
+    if not museum:
+        click.echo(f"No museum with id {museum_id}.")
+        return None
+
+    click.echo(f"{museum.name} ({museum.location})")
+    count = 0
+    for painting in Painting.iter_all(museum_id=museum.id, as_rows=True):
+        click.echo(f"{painting.id}. {painting.title} by {painting.artist} ({painting.year})")
+        count += 1
+    if not count:
+        click.echo("No paintings found.")
+    return museum
+
+
+def add_painting(museum_id, title, artist, year):
+    museum = Museum.find_by_id(museum_id)
+    if not museum:
+        click.echo(f"No museum with id {museum_id}.")
+        return None
+
+    try:
+        painting = Painting.create(title, artist, year, museum)
+    except ValueError as error:
+        click.echo(f"Painting not added: {error}.")
+        return None
+    click.echo(f"'{title}' by {artist} ({year}) has been added to '{museum.name}' with id {painting.id}.")
+    return painting
+
+
+def print_report(top=10, bucket="decade"):
+    from models import stats
+
+    click.echo("\nPaintings per museum:")
+    for museum in stats.paintings_per_museum(top):
+        click.echo(f"{museum.paintings:>8}  {museum.name} ({museum.location})")
+
+    click.echo("\nTop artists:")
+    for artist in stats.top_artists(top):
+        click.echo(f"{artist.paintings:>8}  {artist.artist}")
+
+    click.echo(f"\nPaintings per {bucket}:")
+    for year in stats.year_histogram(bucket):
+        click.echo(f"{year.paintings:>8}  {year.start}s")
+
+    click.echo("\nYears per museum (earliest / median / latest):")
+    for museum in stats.year_range_per_museum():
+        click.echo(f"{museum.earliest} / {museum.median:g} / {museum.latest}  {museum.name}")
+
+
+def import_catalogue(path, format=None, chunk_size=1000, workers=None):
+    from models import catalogue
+
+    try:
+        if workers is None:
+            museums, paintings = catalogue.import_catalogue(path, format, chunk_size)
+        else:
+            from models.loader import load_catalogue
+
+            start = time.perf_counter()
+
+            def progress(read, written):
+                rate = written / (time.perf_counter() - start)
+                click.echo(f"\rRead {read:,} records, wrote {written:,} rows ({rate:,.0f} per second)", err=True, nl=False)
+
+            museums, paintings = load_catalogue(path, format, workers or None, chunk_size, progress)
+            click.echo(err=True)
+    except (ValueError, KeyError, RuntimeError) as error:
+        click.echo(f"Import failed, nothing was saved: {error}")
+        return
+    click.echo(f"Imported {museums} museums and {paintings} paintings from '{path}'.")
+
+
+def export_catalogue(path, format=None, chunk_size=1000):
+    from models import catalogue
+
+    museums, paintings = catalogue.export_catalogue(path, format, chunk_size)
+    click.echo(f"Exported {museums} museums and {paintings} paintings to '{path}'.")
+
+
+def export_snapshot(path):
+    from models.snapshot import export_snapshot
+
+    museums, paintings = export_snapshot(path)
+    click.echo(f"Wrote a snapshot of {museums} museums and {paintings} paintings to '{path}'.")
+
+
+def apply_batch(file, results, batch_size=1000):
+    from models.batch import apply_operations
+
+    start = time.perf_counter()
+    applied = failed = 0
+    for result in apply_operations(file, batch_size):
+        if result.error:
+            failed += 1
+        else:
+            applied += 1
+        results.write(json.dumps(result._asdict()) + "\n")
+    elapsed = time.perf_counter() - start
+    rate = (applied + failed) / elapsed if elapsed else 0
+    click.echo(f"Applied {applied} operations, {failed} failed, in {elapsed:.2f}s ({rate:,.0f} per second).", err=True)
+    return failed
+
+
 def exit_program():
     print("Goodbye!")
     sys.exit()
@@ -1,4 +1,17 @@
-import sqlite3
+import os
+from itertools import islice
+from .connection import ConnectionManager
 
-CONN = sqlite3.connect('company.db')
-CURSOR = CONN.cursor()
+# Connections to the catalogue database, opened per thread on first use.
+# Set MUSEUMS_DB or call DB.configure(path=...) to use a file other than company.db.
+DB = ConnectionManager(os.environ.get("MUSEUMS_DB", "company.db"))
+
+
+def chunked(iterable, size):
+  """Yield lists of at most size items from iterable"""
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
@@ -0,0 +1,83 @@
+# lib/models/aio.py
+import functools
+import threading
+
+# asyncio and concurrent.futures are imported on first use: together they are most of the cost of
+# importing the models, and only async callers need them.
+
+# Reads run on a pool of threads, each with its own connection from models.DB, so concurrent
+# queries overlap their I/O under WAL. Writes run on a single thread, which serializes them the
+# way SQLite requires without blocking readers or the event loop.
+READERS = 4
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def _executor(kind):
+  with _lock:
+    executor = _executors.get(kind)
+    if executor is None:
+      from concurrent.futures import ThreadPoolExecutor
+      workers = READERS if kind == "reader" else 1
+      executor = _executors[kind] = ThreadPoolExecutor(workers, thread_name_prefix=f"catalogue-{kind}")
+    return executor
+
+
+def configure(readers=None):
+  """Set the number of reader threads; running executors are shut down and recreated on next use"""
+  global READERS
+  if readers is not None:
+    READERS = readers
+  shutdown()
+
+
+def shutdown(wait=True):
+  """Stop the reader and writer threads"""
+  with _lock:
+    executors = list(_executors.values())
+    _executors.clear()
+  for executor in executors:
+    executor.shutdown(wait=wait)
+
+
+async def read(fn, *args, **kwargs):
+  """Run fn(*args, **kwargs) on the reader pool and return its result"""
+  import asyncio
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(_executor("reader"), functools.partial(fn, *args, **kwargs))
+
+
+async def write(fn, *args, **kwargs):
+  """Run fn(*args, **kwargs) on the writer thread and return its result.
+  Pass a function that opens a transaction() to make several writes atomic."""
+  import asyncio
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(_executor("writer"), functools.partial(fn, *args, **kwargs))
+
+
+def reader(name):
+  """Return an async classmethod that runs the classmethod called name on the reader pool"""
+  async def method(cls, *args, **kwargs):
+    return await read(getattr(cls, name), *args, **kwargs)
+  method.__name__ = f"a{name}"
+  method.__doc__ = f"Async version of {name}, run on the reader pool"
+  return classmethod(method)
+
+
+def class_writer(name):
+  """Return an async classmethod that runs the classmethod called name on the writer thread"""
+  async def method(cls, *args, **kwargs):
+    return await write(getattr(cls, name), *args, **kwargs)
+  method.__name__ = f"a{name}"
+  method.__doc__ = f"Async version of {name}, run on the writer thread"
+  return classmethod(method)
+
+
+def writer(name):
+  """Return an async method that runs the instance method called name on the writer thread"""
+  async def method(self, *args, **kwargs):
+    return await write(getattr(self, name), *args, **kwargs)
+  method.__name__ = f"a{name}"
+  method.__doc__ = f"Async version of {name}, run on the writer thread"
+  return method
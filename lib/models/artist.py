@@ -0,0 +1,254 @@
+# lib/models/artist.py
+import json
+import sys
+import weakref
+from collections import namedtuple
+from . import DB
+from .schema import ARTISTS
+from .identity_map import IdentityMap
+from .query_cache import QUERY_CACHE
+from .session import current_session, autocommit, inserted, deleted
+
+# Read-only projection of an artists row
+ArtistRow = namedtuple("ArtistRow", ["id", "name"])
+
+
+class Artist:
+  # No per-instance __dict__; __weakref__ lets the identity maps hold weak references
+  __slots__ = ("id", "_name", "__weakref__")
+
+  # Identity map of objects saved to the database, see Museum.all
+  all = IdentityMap("lru", maxsize=10_000)
+  # Interning cache: one Artist per name, shared by every Painting with that artist, so a name is held
+  # in memory once however many paintings are loaded. Entries are weak references, so an artist is
+  # dropped once no painting and no entry of the bounded Artist.all map holds it. Interned artists may
+  # not have been saved yet (id is None); resolve() looks up or inserts their rows when a painting
+  # referencing them is written.
+  by_name = weakref.WeakValueDictionary()
+
+  TABLE = "artists"
+  # Attributes written by update(), snapshotted so a rolled back transaction() can restore them
+  FIELDS = ("name",)
+  UPDATE_SQL = """
+    UPDATE artists
+    SET name = ?
+    WHERE id = ?
+  """
+
+  def __init__(self, name, id=None):
+    self.id = id
+    self.name = name
+
+  @property
+  def name(self):
+    return self._name
+
+  @name.setter
+  def name(self, name):
+    if not (isinstance(name, str) and len(name)):
+      raise ValueError("name must be a non-empty string")
+    old = getattr(self, "_name", None)
+    self._name = sys.intern(name)
+    # Re-key the interning cache when an interned artist is renamed
+    by_name = type(self).by_name
+    if old is not None and old != name and by_name.get(old) is self:
+      del by_name[old]
+      by_name[self._name] = self
+
+  def __repr__(self):
+    return f"Artist({self._name!r}, id={self.id!r})"
+
+  @classmethod
+  def intern(cls, name):
+    """Return the Artist for name from the interning cache, adding an unsaved one if there is none"""
+    artist = cls.by_name.get(name)
+    if artist is None:
+      artist = cls.by_name.setdefault(sys.intern(name), cls(name))
+    return artist
+
+  @classmethod
+  def reset(cls):
+    """Forget the ids of every cached artist, so they are looked up again when next written.
+    Call after rolling back, outside transaction(), a write that may have inserted artists.
+    DB.configure() calls it when DB is pointed at another database file."""
+    cls.all.clear()
+    for artist in list(cls.by_name.values()):
+      artist.id = None
+    QUERY_CACHE.invalidate("artists")
+
+  @classmethod
+  def create_table(cls):
+    """Create a new table to persist the names of Artist instances"""
+    for sql in ARTISTS:
+      DB.execute(sql)
+    DB.commit()
+    QUERY_CACHE.clear()
+
+  @classmethod
+  def drop_table(cls):
+    """Drop the table that persists Artist instances"""
+    sql = """
+      DROP TABLE IF EXISTS artists
+    """
+    DB.execute(sql)
+    DB.commit()
+    cls.reset()
+    QUERY_CACHE.clear()
+
+  def resolve(self):
+    """Return the artist's id, looking up or inserting its row first if it has none"""
+    if self.id is None:
+      type(self).resolve_all([self])
+    return self.id
+
+  @classmethod
+  def resolve_all(cls, artists):
+    """Give every artist without an id the id of its row, with one query for the names already stored
+    and one insert for the rest, however many artists there are. Inserted rows are not committed:
+    they are part of the caller's write. Return the artists that were inserted."""
+    pending = {}
+    for artist in artists:
+      if artist.id is None:
+        pending.setdefault(artist.name, []).append(artist)
+    if not pending:
+      return []
+    select_sql = """
+      SELECT id, name
+      FROM artists
+      WHERE name IN (SELECT value FROM json_each(?))
+    """
+    insert_sql = """
+      INSERT INTO artists (name)
+      SELECT value FROM json_each(?) WHERE true
+      ON CONFLICT (name) DO NOTHING
+    """
+    rows = DB.execute(select_sql, (json.dumps(list(pending)),)).fetchall()
+    for id, name in rows:
+      for artist in pending.pop(name):
+        artist.id = id
+        cls.all[id] = artist
+    if not pending:
+      return []
+
+    missing = json.dumps(list(pending))
+    DB.execute(insert_sql, (missing,))
+    created = []
+    for id, name in DB.execute(select_sql, (missing,)).fetchall():
+      for artist in pending.pop(name):
+        artist.id = id
+        cls.all[id] = artist
+        created.append(artist)
+    session = current_session()
+    if session:
+      for artist in created:
+        session.added(artist)
+    QUERY_CACHE.invalidate("artists")
+    return created
+
+  def save(self):
+    """Insert a row for the artist unless one with the same name exists, and record its id"""
+    self.resolve()
+    autocommit()
+
+  @classmethod
+  def create(cls, name):
+    """Return the interned Artist for name, saved to the database"""
+    artist = cls.intern(name)
+    artist.save()
+    return artist
+
+  def update(self, name):
+    """Rename the artist; every painting by it shows the new name.
+    Inside a transaction() the UPDATE is queued and written in a batch."""
+    existing = type(self).by_name.get(name)
+    if existing is not None and existing is not self:
+      raise ValueError(f"an artist named {name!r} already exists")
+    session = current_session()
+    if session:
+      session.changing(self)
+    self.name = name
+
+    if session:
+      session.changed(self)
+    else:
+      DB.execute(self.UPDATE_SQL, self.update_values())
+      DB.commit()
+    QUERY_CACHE.invalidate("artists")
+
+  def update_values(self):
+    """Return the parameters for UPDATE_SQL"""
+    return (self.name, self.id)
+
+  def delete(self):
+    """Delete the table row of an artist that no painting references and reassign id attribute.
+    The artist stays interned, so it is inserted again if a painting is later saved with it."""
+    sql = """
+      SELECT 1
+      FROM paintings
+      WHERE artist_id = ?
+      LIMIT 1
+    """
+    if DB.execute(sql, (self.id,)).fetchone():
+      raise ValueError(f"artist {self.name!r} still has paintings")
+    DB.execute("DELETE FROM artists WHERE id = ?", (self.id,))
+    QUERY_CACHE.invalidate("artists")
+    type(self).all.pop(self.id, None)
+    deleted(self, self.id)
+    self.id = None
+
+  @classmethod
+  def instance_from_db(cls, row):
+    """Return the Artist object having the attribute values from the table row"""
+    artist = cls.all.get(row[0])
+    if artist is None:
+      artist = cls.intern(row[1])
+      artist.id = row[0]
+      artist = cls.all.setdefault(row[0], artist)
+    elif artist.name != row[1]:
+      artist.name = row[1]
+    return artist
+
+  @classmethod
+  def get_all(cls, as_rows=False):
+    """Return a list containing an Artist object per row in the table, in name order,
+    or an ArtistRow per row with as_rows=True"""
+    sql = """
+      SELECT id, name
+      FROM artists
+      ORDER BY name
+    """
+    rows = QUERY_CACHE.fetchall(sql, tables=("artists",))
+    if as_rows:
+      return [ArtistRow._make(row) for row in rows]
+    return [cls.instance_from_db(row) for row in rows]
+
+  @classmethod
+  def find_by_id(cls, id):
+    """Return an Artist object corresponding to the table row matching the specified primary key"""
+    sql = """
+      SELECT id, name
+      FROM artists
+      WHERE id = ?
+    """
+    row = QUERY_CACHE.fetchone(sql, (id,), tables=("artists",))
+    return cls.instance_from_db(row) if row else None
+
+  @classmethod
+  def find_by_name(cls, name):
+    """Return an Artist object corresponding to the table row matching the specified name"""
+    sql = """
+      SELECT id, name
+      FROM artists
+      WHERE name = ?
+    """
+    row = QUERY_CACHE.fetchone(sql, (name,), tables=("artists",))
+    return cls.instance_from_db(row) if row else None
+
+  def paintings(self):
+    """Returns list of paintings by the current artist"""
+    from models.painting import Painting
+    return Painting.find_by_artist(self.name)
+
+
+# An artist's id in one database file is not its id in another
+DB.resets.append(Artist.reset)
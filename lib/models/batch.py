@@ -0,0 +1,154 @@
+# lib/models/batch.py
+import json
+import sqlite3
+from collections import namedtuple
+from . import chunked
+from .museum import Museum
+from .painting import Painting
+from .session import transaction
+
+# The outcome of one operation: its line number, op, type and row id, and the error message if it failed
+OperationResult = namedtuple("OperationResult", ["line", "op", "type", "id", "error"])
+
+MODELS = {"museum": Museum, "painting": Painting}
+OPERATIONS = ("create", "update", "delete")
+
+
+def read_operations(file):
+  """Yield a (line number, operation dictionary) pair for each non-blank line of a JSONL stream.
+  A line that is not a JSON object is yielded as its error message instead."""
+  for number, line in enumerate(file, 1):
+    if not line.strip():
+      continue
+    try:
+      operation = json.loads(line)
+    except ValueError as error:
+      operation = f"invalid JSON: {error}"
+    if not isinstance(operation, (dict, str)):
+      operation = "operation must be a JSON object"
+    yield number, operation
+
+
+class Batch:
+  """Apply create, update and delete operations on museums and paintings.
+
+  An operation is a dictionary such as
+    {"op": "create", "type": "museum", "ref": "louvre", "name": "Louvre", "location": "Paris"}
+    {"op": "create", "type": "painting", "museum_id": "louvre", "title": "Mona Lisa", "artist": "Leonardo", "year": 1503}
+    {"op": "update", "type": "painting", "id": 42, "year": 1504}
+    {"op": "delete", "type": "museum", "id": 7}
+  Values are validated through the model setters before anything is written, so an invalid operation
+  is reported and skipped without affecting the others. A create may name itself with ref; a string
+  id or museum_id later in the stream refers to that object. Deleting a museum deletes its paintings
+  too; with "cascade": false a museum that still has paintings is an invalid operation."""
+
+  def __init__(self):
+    self.refs = {}
+
+  def apply(self, operations, batch_size=1000):
+    """Apply (line number, operation) pairs, batch_size per transaction, and yield an OperationResult for each.
+    If the database rejects a statement, the whole transaction is rolled back and every operation in it fails."""
+    for chunk in chunked(operations, batch_size):
+      results = []
+      try:
+        with transaction():
+          for number, operation in chunk:
+            results.append(self.apply_one(number, operation))
+      except sqlite3.Error as error:
+        results = [
+          result._replace(id=None, error=result.error or f"rolled back: {error}")
+          for result in results
+        ]
+        for number, operation in chunk[len(results):]:
+          op, kind = (operation.get("op"), operation.get("type")) if isinstance(operation, dict) else (None, None)
+          results.append(OperationResult(number, op, kind, None, f"rolled back: {error}"))
+      yield from results
+
+  def apply_one(self, number, operation):
+    """Validate and apply a single operation inside the open transaction and return its OperationResult"""
+    if isinstance(operation, str):
+      return OperationResult(number, None, None, None, operation)
+    op, kind = operation.get("op"), operation.get("type")
+    try:
+      if op not in OPERATIONS:
+        raise ValueError(f"op must be one of {', '.join(OPERATIONS)}")
+      if kind not in MODELS:
+        raise ValueError(f"type must be one of {', '.join(MODELS)}")
+      row_id = getattr(self, f"{op}_{kind}")(operation)
+    except (ValueError, TypeError, KeyError) as error:
+      message = f"missing field {error}" if isinstance(error, KeyError) else str(error)
+      return OperationResult(number, op, kind, None, message)
+    return OperationResult(number, op, kind, row_id, None)
+
+  def find(self, cls, key):
+    """Return the saved object for an id, or for the ref of an object created earlier in the stream"""
+    if isinstance(key, str):
+      obj = self.refs.get(key)
+      if obj is None or obj.id is None or not isinstance(obj, cls):
+        raise ValueError(f"unknown ref {key!r}")
+      return obj
+    obj = cls.find_by_id(key) if isinstance(key, int) else None
+    if obj is None:
+      raise ValueError(f"no {cls.__name__.lower()} with id {key!r}")
+    return obj
+
+  def check_ref(self, operation):
+    """Reject a ref that could not name the object, before anything is saved"""
+    if "ref" in operation and not isinstance(operation["ref"], str):
+      raise ValueError("ref must be a string")
+
+  def remember(self, operation, obj):
+    if "ref" in operation:
+      self.refs[operation["ref"]] = obj
+    return obj.id
+
+  def create_museum(self, operation):
+    museum = Museum(operation["name"], operation["location"])
+    self.check_ref(operation)
+    museum.save()
+    return self.remember(operation, museum)
+
+  def create_painting(self, operation):
+    museum = self.find(Museum, operation["museum_id"])
+    painting = Painting(operation["title"], operation["artist"], operation["year"], museum)
+    self.check_ref(operation)
+    painting.save()
+    return self.remember(operation, painting)
+
+  def update_museum(self, operation):
+    museum = self.find(Museum, operation["id"])
+    name = operation.get("name", museum.name)
+    location = operation.get("location", museum.location)
+    # Validate both values on a scratch object first, so a bad one leaves the museum untouched
+    Museum(name, location)
+    museum.update(name, location)
+    return museum.id
+
+  def update_painting(self, operation):
+    painting = self.find(Painting, operation["id"])
+    title = operation.get("title", painting.title)
+    artist = operation.get("artist", painting.artist)
+    year = operation.get("year", painting.year)
+    Painting(title, artist, year, painting.museum)
+    painting.update(title, artist, year)
+    return painting.id
+
+  def delete_museum(self, operation):
+    cascade = operation.get("cascade", True)
+    if not isinstance(cascade, bool):
+      raise ValueError("cascade must be true or false")
+    museum = self.find(Museum, operation["id"])
+    row_id = museum.id
+    museum.delete(cascade=cascade)
+    return row_id
+
+  def delete_painting(self, operation):
+    painting = self.find(Painting, operation["id"])
+    row_id = painting.id
+    painting.delete()
+    return row_id
+
+
+def apply_operations(file, batch_size=1000):
+  """Apply the JSONL operations read from file and yield an OperationResult for each"""
+  yield from Batch().apply(read_operations(file), batch_size)
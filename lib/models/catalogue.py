@@ -0,0 +1,124 @@
+# lib/models/catalogue.py
+import csv
+import json
+from . import DB
+from .museum import Museum
+from .painting import Painting
+from .artist import Artist
+from .query_cache import QUERY_CACHE
+from .session import autocommit, autorollback
+
+# Columns of a catalogue record; museums use name/location, paintings use title/artist/year/museum_id
+FIELDS = ["type", "id", "name", "location", "title", "artist", "year", "museum_id"]
+
+
+def _format(path, format=None):
+  """Return 'csv' or 'jsonl', taken from the file extension unless given explicitly"""
+  format = format or path.rsplit(".", 1)[-1].lower()
+  if format not in ("csv", "jsonl"):
+    raise ValueError("format must be 'csv' or 'jsonl'")
+  return format
+
+
+def read_records(path, format=None):
+  """Yield one dictionary per museum or painting record in a CSV or JSONL file"""
+  format = _format(path, format)
+  with open(path, newline="") as file:
+    if format == "csv":
+      yield from csv.DictReader(file)
+    else:
+      for line in file:
+        if line.strip():
+          yield json.loads(line)
+
+
+def import_catalogue(path, format=None, chunk_size=1000):
+  """Stream museums and paintings from a CSV or JSONL file into the database inside a single transaction.
+  Records are validated through the model constructors and inserted with executemany, chunk_size rows at a time.
+  A painting's museum_id refers to the id of a museum record earlier in the file, or else to an existing museum.
+  Return a (museum count, painting count) tuple."""
+  museums = {}
+  pending_museums = []
+  pending_paintings = []
+  counts = [0, 0]
+
+  def flush_museums():
+    Museum.bulk_create(pending_museums, chunk_size, commit=False)
+    counts[0] += len(pending_museums)
+    pending_museums.clear()
+
+  def flush_paintings():
+    Painting.bulk_create(pending_paintings, chunk_size, commit=False)
+    counts[1] += len(pending_paintings)
+    pending_paintings.clear()
+
+  def museum_for(museum_id):
+    museum = museums.get(museum_id)
+    if museum is None:
+      museum = museums[museum_id] = Museum.find_by_id(int(museum_id))
+      if museum is None:
+        raise ValueError(f"painting references unknown museum {museum_id}")
+    return museum
+
+  try:
+    for record in read_records(path, format):
+      if record["type"] == "museum":
+        museum = Museum(record["name"], record["location"])
+        if record.get("id") not in (None, ""):
+          museums[str(record["id"])] = museum
+        pending_museums.append(museum)
+        if len(pending_museums) >= chunk_size:
+          flush_museums()
+      elif record["type"] == "painting":
+        if pending_museums:
+          flush_museums()
+        museum = museum_for(str(record["museum_id"]))
+        pending_paintings.append(Painting(record["title"], record["artist"], int(record["year"]), museum))
+        if len(pending_paintings) >= chunk_size:
+          flush_paintings()
+      else:
+        raise ValueError(f"unknown record type {record['type']!r}")
+    flush_museums()
+    flush_paintings()
+    autocommit()
+  except Exception:
+    autorollback()
+    Artist.reset()
+    QUERY_CACHE.clear()
+    raise
+  return tuple(counts)
+
+
+def export_catalogue(path, format=None, chunk_size=1000):
+  """Stream every museum followed by every painting to a CSV or JSONL file, chunk_size rows at a time.
+  Rows are written straight from the database without building model objects.
+  Return a (museum count, painting count) tuple."""
+  format = _format(path, format)
+  queries = [
+    ("museum", ["id", "name", "location"], "SELECT id, name, location FROM museums ORDER BY id"),
+    ("painting", ["id", "title", "artist", "year", "museum_id"],
+     """
+       SELECT paintings.id, paintings.title, artists.name, paintings.year, paintings.museum_id
+       FROM paintings
+       JOIN artists ON artists.id = paintings.artist_id
+       ORDER BY paintings.id
+     """),
+  ]
+  counts = []
+  with open(path, "w", newline="") as file:
+    writer = csv.DictWriter(file, FIELDS) if format == "csv" else None
+    if writer:
+      writer.writeheader()
+    for record_type, columns, sql in queries:
+      count = 0
+      cursor = DB.execute(sql)
+      for rows in iter(lambda: cursor.fetchmany(chunk_size), []):
+        for row in rows:
+          record = {"type": record_type, **dict(zip(columns, row))}
+          if writer:
+            writer.writerow(record)
+          else:
+            file.write(json.dumps(record) + "\n")
+        count += len(rows)
+      counts.append(count)
+  return tuple(counts)
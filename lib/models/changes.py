@@ -0,0 +1,76 @@
+# lib/models/changes.py
+from collections import namedtuple
+from . import DB
+from .query_cache import QUERY_CACHE
+
+# One entry of the change feed. data holds the row's current column values, or None once the row is gone,
+# so a consumer can apply the change without another query.
+Change = namedtuple("Change", ["seq", "table", "row_id", "operation", "data"])
+
+COLUMNS = {
+  "museums": ("name", "location"),
+  "paintings": ("title", "artist", "year", "museum_id"),
+}
+
+
+def latest_seq():
+  """Return the sequence number of the newest change, or 0 if none has been recorded"""
+  return DB.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def changes_since(seq=0, batch_size=500):
+  """Yield a Change for every insert, update and delete recorded after seq, in order, reading batch_size per query.
+  Store the seq of the last change applied and pass it next time to sync incrementally.
+  After compact_changes, a row's earlier changes may be gone: treat inserts and updates as upserts."""
+  sql = """
+    SELECT changes.seq, changes.table_name, changes.row_id, changes.operation,
+           museums.id, museums.name, museums.location,
+           paintings.id, paintings.title, artists.name, paintings.year, paintings.museum_id
+    FROM changes
+    LEFT JOIN museums ON changes.table_name = 'museums' AND museums.id = changes.row_id
+    LEFT JOIN paintings ON changes.table_name = 'paintings' AND paintings.id = changes.row_id
+    LEFT JOIN artists ON artists.id = paintings.artist_id
+    WHERE changes.seq > ?
+    ORDER BY changes.seq
+    LIMIT ?
+  """
+  while True:
+    rows = QUERY_CACHE.fetchall(sql, (seq, batch_size), cache=False)
+    if not rows:
+      return
+    for row in rows:
+      if row[1] == "museums":
+        data = dict(zip(COLUMNS["museums"], row[5:7])) if row[4] is not None else None
+      else:
+        data = dict(zip(COLUMNS["paintings"], row[8:12])) if row[7] is not None else None
+      yield Change(row[0], row[1], row[2], row[3], data)
+    seq = rows[-1][0]
+
+
+def compact_changes(upto=None, forget_deletes=False):
+  """Drop each change up to seq upto (default: all) that a later change to the same row supersedes,
+  leaving at most one entry per row. With forget_deletes=True, deletes up to upto are dropped as well;
+  only do that once every consumer has synced past upto. Return the number of changes removed."""
+  upto = latest_seq() if upto is None else upto
+  superseded = """
+    DELETE FROM changes
+    WHERE seq <= ? AND EXISTS (
+      SELECT 1 FROM changes AS later
+      WHERE later.table_name = changes.table_name
+        AND later.row_id = changes.row_id
+        AND later.seq > changes.seq)
+  """
+  deletes = """
+    DELETE FROM changes
+    WHERE seq <= ? AND operation = 'delete'
+  """
+  try:
+    DB.begin()
+    removed = DB.execute(superseded, (upto,)).rowcount
+    if forget_deletes:
+      removed += DB.execute(deletes, (upto,)).rowcount
+    DB.commit()
+  except Exception:
+    DB.rollback()
+    raise
+  return removed
@@ -0,0 +1,237 @@
+# lib/models/connection.py
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from .statements import STATEMENTS
+
+# What a listener receives for every statement: the normalized SQL, its parameters (a list of tuples for
+# executemany), the seconds spent executing and fetching, the rows returned (or changed, for writes;
+# -1 when SQLite does not report it) and the qualified name of the model method that issued it.
+QueryEvent = namedtuple("QueryEvent", ["sql", "params", "elapsed", "rows", "caller", "many"])
+
+# Modules that only pass statements through; the caller of a statement is the first frame outside them
+PLUMBING = ("connection.py", "query_cache.py", "statements.py", "profiler.py")
+
+# Applied to every new connection. WAL lets readers run alongside the single writer,
+# synchronous=NORMAL drops the fsync on every commit while WAL keeps the file consistent,
+# and the larger page cache and memory-mapped reads cut the cost of repeated finder queries.
+DEFAULT_PRAGMAS = {
+  "journal_mode": "WAL",
+  "synchronous": "NORMAL",
+  "mmap_size": 256 * 1024 * 1024,
+  "cache_size": -64 * 1024,
+}
+
+
+class ConnectionManager:
+  """Open SQLite connections on first use, one per thread, with the configured path and pragmas.
+
+  Each thread gets its own connection, so reading threads do not share a cursor or wait on each other,
+  and with WAL they only wait on the writer while it commits. cached_statements is the size of each
+  connection's prepared statement cache; keep it above len(STATEMENTS) so no statement is re-prepared.
+
+  configure() and close() close every thread's connection, so call them only while no other thread
+  (an aio executor, a server worker) is running a statement; they are meant for startup, shutdown and
+  tests. A thread that has exited has its connection closed the next time another thread connects."""
+
+  def __init__(self, path="company.db", pragmas=None, timeout=30.0, cached_statements=128):
+    self.path = path
+    self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+    self.timeout = timeout
+    self.cached_statements = cached_statements
+    STATEMENTS.configure(cached_statements)
+    self._local = threading.local()
+    # (thread, connection) for every connection opened since the last close()
+    self._connections = []
+    self._lock = threading.Lock()
+    # Callables notified with a QueryEvent after each statement; see models.profiler
+    self.listeners = []
+    # When set, receives every write statement and takes over commit and rollback; see models.memory
+    self.journal = None
+    # Callables run when configure() points the manager at another database, each dropping state
+    # cached from the old one, such as the query cache and identity maps
+    self.resets = []
+
+  def configure(self, path=None, pragmas=None, timeout=None, cached_statements=None):
+    """Change the settings used for new connections and close the open ones, which must not be in use
+    by another thread. A new path also runs every callable in resets."""
+    self.close()
+    if path is not None and path != self.path:
+      self.path = path
+      for reset in list(self.resets):
+        reset()
+    if pragmas is not None:
+      self.pragmas = {**self.pragmas, **pragmas}
+    if timeout is not None:
+      self.timeout = timeout
+    if cached_statements is not None:
+      self.cached_statements = cached_statements
+      STATEMENTS.configure(cached_statements)
+
+  def connect(self):
+    """Return a new connection with the configured pragmas applied"""
+    conn = sqlite3.connect(
+      self.path,
+      timeout=self.timeout,
+      cached_statements=self.cached_statements,
+      check_same_thread=False,
+      uri=self.path.startswith("file:"),
+    )
+    for name, value in self.pragmas.items():
+      conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+  @property
+  def connection(self):
+    """The calling thread's connection, opened on first use"""
+    conn = getattr(self._local, "conn", None)
+    if conn is None:
+      conn = self._local.conn = self.connect()
+      with self._lock:
+        finished = [(thread, other) for thread, other in self._connections if not thread.is_alive()]
+        self._connections = [
+          (thread, other) for thread, other in self._connections if thread.is_alive()
+        ] + [(threading.current_thread(), conn)]
+      # Nothing else can reach a finished thread's connection, so it is closed rather than kept forever
+      for _, other in finished:
+        other.close()
+    return conn
+
+  def defer(self, run):
+    """Call run before the calling thread's next statement, so writes it queues are visible to it"""
+    self._local.deferred = run
+
+  def _run_deferred(self):
+    run = self._local.deferred
+    self._local.deferred = None
+    run()
+
+  def execute(self, sql, params=()):
+    """Execute sql on the calling thread's connection with a short-lived cursor and return it.
+    The SQL is normalized through the statement registry so it reuses the connection's prepared statement."""
+    if getattr(self._local, "deferred", None) is not None:
+      self._run_deferred()
+    if self.journal is not None:
+      return self._journaled(STATEMENTS.normalize(sql), params, False)
+    if self.listeners:
+      return self._instrumented(self.connection.execute, STATEMENTS.normalize(sql), params, False)
+    return self.connection.execute(STATEMENTS.normalize(sql), params)
+
+  def executemany(self, sql, rows):
+    """Execute sql once per parameter tuple on the calling thread's connection and return the cursor"""
+    if getattr(self._local, "deferred", None) is not None:
+      self._run_deferred()
+    if self.journal is not None:
+      return self._journaled(STATEMENTS.normalize(sql), list(rows), True)
+    if self.listeners:
+      return self._instrumented(self.connection.executemany, STATEMENTS.normalize(sql), list(rows), True)
+    return self.connection.executemany(STATEMENTS.normalize(sql), rows)
+
+  def _journaled(self, sql, params, many):
+    """Run the statement and pass it to the journal if it wrote (returned no result columns)"""
+    conn = self.connection
+    run = conn.executemany if many else conn.execute
+    if self.listeners:
+      cursor = self._instrumented(run, sql, params, many)
+    else:
+      cursor = run(sql, params)
+    if cursor.description is None:
+      self.journal.record(conn, sql, params, many)
+    return cursor
+
+  def _instrumented(self, run, sql, params, many):
+    """Run the statement, fetching any result rows up front so their count and fetch time are known,
+    and notify the listeners"""
+    start = time.perf_counter()
+    cursor = run(sql, params)
+    if cursor.description is not None:
+      cursor = FetchedCursor(cursor, cursor.fetchall())
+      rows = len(cursor.rows)
+    else:
+      rows = cursor.rowcount
+    event = QueryEvent(sql, params, time.perf_counter() - start, rows, caller(), many)
+    for listener in list(self.listeners):
+      listener(event)
+    return cursor
+
+  @property
+  def in_transaction(self):
+    return self.connection.in_transaction
+
+  def begin(self, mode="IMMEDIATE"):
+    """Start a transaction unless the calling thread's connection already has one open"""
+    if not self.connection.in_transaction:
+      self.connection.execute(f"BEGIN {mode}")
+
+  def commit(self):
+    if self.journal is not None:
+      self.journal.commit(self.connection)
+    else:
+      self.connection.commit()
+
+  def rollback(self):
+    if self.journal is not None:
+      self.journal.rollback(self.connection)
+    else:
+      self.connection.rollback()
+
+  def close(self):
+    """Close every connection opened by this manager, which must not be in use by another thread;
+    threads reconnect on next use"""
+    with self._lock:
+      connections, self._connections = self._connections, []
+    for _, conn in connections:
+      conn.close()
+    self._local = threading.local()
+
+
+class FetchedCursor:
+  """The already-fetched result of an instrumented statement, read like the cursor it came from"""
+
+  def __init__(self, cursor, rows):
+    self.rows = rows
+    self.description = cursor.description
+    self.lastrowid = cursor.lastrowid
+    self.rowcount = cursor.rowcount
+    self._position = 0
+
+  def fetchone(self):
+    if self._position < len(self.rows):
+      self._position += 1
+      return self.rows[self._position - 1]
+    return None
+
+  def fetchmany(self, size=1):
+    rows = self.rows[self._position:self._position + size]
+    self._position += len(rows)
+    return rows
+
+  def fetchall(self):
+    rows = self.rows[self._position:]
+    self._position = len(self.rows)
+    return rows
+
+  def __iter__(self):
+    return iter(self.fetchall())
+
+
+def caller():
+  """Return the qualified name of the innermost function outside the plumbing modules, e.g. Painting.find_by_artist"""
+  frame = sys._getframe(1)
+  while frame is not None and frame.f_code.co_filename.endswith(PLUMBING):
+    frame = frame.f_back
+  if frame is None:
+    return None
+  # co_qualname is only available from Python 3.11, so the class is taken from the method's first
+  # argument; any other local named cls or self, such as a loop variable, says nothing about the caller
+  code = frame.f_code
+  name = code.co_name
+  first = code.co_varnames[0] if code.co_argcount else None
+  if first not in ("self", "cls") or first not in frame.f_locals:
+    return name
+  owner = frame.f_locals[first]
+  if first == "self":
+    owner = type(owner)
+  return f"{owner.__name__}.{name}"
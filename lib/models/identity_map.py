@@ -0,0 +1,128 @@
+# lib/models/identity_map.py
+import threading
+import weakref
+from collections import OrderedDict
+
+MODES = ("strong", "weak", "lru")
+
+
+class IdentityMap:
+  """Map table row primary keys to model objects, so one row is represented by one object while it is alive.
+
+  Modes:
+    strong - keep every object ever stored (the behaviour of a plain dictionary)
+    weak   - hold objects through weak references only; an entry disappears once the program drops the object
+    lru    - hold weak references to every object plus strong references to the maxsize most recently used,
+             so a working set stays cached while older objects can be garbage collected
+  """
+
+  def __init__(self, mode="strong", maxsize=1024):
+    if mode not in MODES:
+      raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if mode == "lru" and (not isinstance(maxsize, int) or maxsize < 1):
+      raise ValueError("maxsize must be a positive integer")
+    self.mode = mode
+    self.maxsize = maxsize if mode == "lru" else None
+    self._strong = OrderedDict()
+    self._weak = weakref.WeakValueDictionary() if mode != "strong" else None
+    self._lock = threading.RLock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def _remember(self, id, obj):
+    """Keep a strong reference to obj, evicting the least recently used ones beyond maxsize"""
+    if self.mode == "weak":
+      return
+    self._strong[id] = obj
+    if self.maxsize is not None:
+      self._strong.move_to_end(id)
+      while len(self._strong) > self.maxsize:
+        self._strong.popitem(last=False)
+        self.evictions += 1
+
+  def get(self, id, default=None):
+    """Return the object stored for id, or default, counting the lookup as a hit or a miss"""
+    with self._lock:
+      obj = self._strong.get(id)
+      if obj is None and self._weak is not None:
+        obj = self._weak.get(id)
+      if obj is None:
+        self.misses += 1
+        return default
+      self.hits += 1
+      self._remember(id, obj)
+      return obj
+
+  def __getitem__(self, id):
+    obj = self.get(id)
+    if obj is None:
+      raise KeyError(id)
+    return obj
+
+  def __setitem__(self, id, obj):
+    with self._lock:
+      if self._weak is not None:
+        self._weak[id] = obj
+      self._remember(id, obj)
+
+  def setdefault(self, id, obj):
+    """Return the object stored for id, storing obj first if there is none.
+    Atomic, so threads hydrating the same row concurrently end up sharing one object."""
+    with self._lock:
+      existing = self._strong.get(id)
+      if existing is None and self._weak is not None:
+        existing = self._weak.get(id)
+      if existing is not None:
+        self._remember(id, existing)
+        return existing
+      self[id] = obj
+      return obj
+
+  def pop(self, id, default=None):
+    """Remove and return the object stored for id, or default"""
+    with self._lock:
+      obj = self._strong.pop(id, None)
+      if self._weak is not None:
+        obj = self._weak.pop(id, obj)
+      return default if obj is None else obj
+
+  def __contains__(self, id):
+    return id in self._strong or (self._weak is not None and id in self._weak)
+
+  def __len__(self):
+    return len(self._weak) if self._weak is not None else len(self._strong)
+
+  def __iter__(self):
+    return iter(list(self.keys()))
+
+  def keys(self):
+    with self._lock:
+      return list(self._weak.keys()) if self._weak is not None else list(self._strong.keys())
+
+  def values(self):
+    with self._lock:
+      return list(self._weak.values()) if self._weak is not None else list(self._strong.values())
+
+  def items(self):
+    with self._lock:
+      return list(self._weak.items()) if self._weak is not None else list(self._strong.items())
+
+  def clear(self):
+    """Forget every stored object; hit, miss and eviction counters are kept"""
+    with self._lock:
+      self._strong.clear()
+      if self._weak is not None:
+        self._weak.clear()
+
+  def stats(self):
+    """Return the map's size and lookup counters"""
+    return {
+      "mode": self.mode,
+      "size": len(self),
+      "strong": len(self._strong),
+      "maxsize": self.maxsize,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+    }
@@ -0,0 +1,337 @@
+# lib/models/loader.py
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sqlite3
+import time
+from datetime import datetime
+from . import DB
+from .artist import Artist
+from .catalogue import _format
+from .painting import check_year
+from .query_cache import QUERY_CACHE
+from .schema import SEARCH, CHANGES
+
+# Lines (or CSV records) per block handed to a worker
+BLOCK_SIZE = 5000
+# Blocks each worker may have read, queued or waiting to be written at once
+BLOCKS_PER_WORKER = 4
+
+MUSEUM_SQL = """
+  INSERT INTO museums (id, name, location)
+  VALUES (?, ?, ?)
+"""
+PAINTING_SQL = """
+  INSERT INTO paintings (id, title, artist_id, year, museum_id)
+  VALUES (?, ?, ?, ?, ?)
+"""
+# Per-row insert triggers on paintings that the writer drops for the load and replaces with one
+# set-based insert over the loaded id range, run before the triggers are created again
+DEFERRED_TRIGGERS = {
+  "paintings_fts_insert": """
+    INSERT INTO paintings_fts (rowid, title, artist, museum)
+    SELECT paintings.id, paintings.title, artists.name, museums.name
+    FROM paintings
+    JOIN artists ON artists.id = paintings.artist_id
+    JOIN museums ON museums.id = paintings.museum_id
+    WHERE paintings.id BETWEEN ? AND ?
+  """,
+  "paintings_changes_insert": """
+    INSERT INTO changes (table_name, row_id, operation)
+    SELECT 'paintings', id, 'insert'
+    FROM paintings
+    WHERE id BETWEEN ? AND ?
+    ORDER BY id
+  """,
+}
+
+
+def _trigger_sql(name):
+  """Return the schema's CREATE TRIGGER statement for name"""
+  return next(sql for sql in SEARCH["paintings"] + CHANGES["paintings"] if f"TRIGGER IF NOT EXISTS {name} " in sql)
+
+
+def read_blocks(path, format, block_size=BLOCK_SIZE):
+  """Yield (header, items) blocks of at most block_size records without parsing them: for JSONL the
+  items are (line number, line) pairs, for CSV (line number, field list) pairs under the file's header"""
+  with open(path, newline="") as file:
+    if format == "csv":
+      reader = csv.reader(file)
+      header = next(reader, None)
+      items = []
+      for row in reader:
+        items.append((reader.line_num, row))
+        if len(items) >= block_size:
+          yield header, items
+          items = []
+    else:
+      header = None
+      items = []
+      for item in enumerate(file, 1):
+        items.append(item)
+        if len(items) >= block_size:
+          yield header, items
+          items = []
+    if items:
+      yield header, items
+
+
+def _text(record, field):
+  value = record[field]
+  if not (isinstance(value, str) and len(value)):
+    raise ValueError(f"{field} must be a non-empty string")
+  return value
+
+
+def validate_block(header, items, current_year):
+  """Parse and validate a block the way the model setters would. Return a list of
+  (line, file id, name, location) museums and a list of (line, title, artist, year, museum reference) paintings."""
+  museums = []
+  paintings = []
+  for number, item in items:
+    try:
+      if header is None:
+        if not item.strip():
+          continue
+        record = json.loads(item)
+      else:
+        record = dict(zip(header, item))
+      kind = record["type"]
+      if kind == "museum":
+        file_id = record.get("id")
+        museums.append((
+          number, None if file_id in (None, "") else str(file_id), _text(record, "name"), _text(record, "location"),
+        ))
+      elif kind == "painting":
+        paintings.append((
+          number, _text(record, "title"), _text(record, "artist"),
+          check_year(int(record["year"]), current_year), str(record["museum_id"]),
+        ))
+      else:
+        raise ValueError(f"unknown record type {kind!r}")
+    except KeyError as error:
+      raise ValueError(f"line {number}: missing field {error}")
+    except (ValueError, TypeError) as error:
+      raise ValueError(f"line {number}: {error}")
+  return museums, paintings
+
+
+def _work(tasks, results):
+  """Worker process: validate blocks from tasks until a None arrives, then put a None on results"""
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  while True:
+    task = tasks.get()
+    if task is None:
+      break
+    seq, header, items = task
+    try:
+      results.put((seq, *validate_block(header, items, datetime.now().year), None))
+    except ValueError as error:
+      results.put((seq, None, None, str(error)))
+  results.put(None)
+
+
+class Writer:
+  """Write validated blocks, in file order, inside one transaction on the calling thread's connection.
+
+  Museums and paintings get ids in file order from the tables' current max primary keys, as
+  catalogue.import_catalogue would give them, however the blocks were split among workers."""
+
+  def __init__(self):
+    self.museums = {}
+    self.artist_ids = {}
+    self.museum_count = 0
+    self.painting_count = 0
+
+  def begin(self):
+    DB.begin()
+    for name in DEFERRED_TRIGGERS:
+      DB.execute(f"DROP TRIGGER IF EXISTS {name}")
+    self.next_museum_id = DB.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM museums").fetchone()[0]
+    self.first_painting_id = self.next_painting_id = DB.execute(
+      "SELECT COALESCE(MAX(id), 0) + 1 FROM paintings"
+    ).fetchone()[0]
+    self.existing_museum_ids = {row[0] for row in DB.execute("SELECT id FROM museums")}
+
+  def museum_id(self, number, reference):
+    """Return the id of the museum a painting on line number references: a museum record earlier
+    in the file with that id, or else a museum already in the database"""
+    defined = self.museums.get(reference)
+    if defined is not None and defined[1] < number:
+      return defined[0]
+    try:
+      if int(reference) in self.existing_museum_ids:
+        return int(reference)
+    except ValueError:
+      pass
+    raise ValueError(f"line {number}: painting references unknown museum {reference}")
+
+  def write(self, museums, paintings):
+    rows = []
+    for number, file_id, name, location in museums:
+      if file_id is not None:
+        self.museums[file_id] = (self.next_museum_id, number)
+      rows.append((self.next_museum_id, name, location))
+      self.next_museum_id += 1
+    if rows:
+      DB.executemany(MUSEUM_SQL, rows)
+      self.museum_count += len(rows)
+
+    artist_ids = self.artist_ids
+    # In order of first appearance, so new artists get the ids a serial import would give them
+    missing = dict.fromkeys(painting[2] for painting in paintings if painting[2] not in artist_ids)
+    if missing:
+      artists = [Artist.intern(name) for name in missing]
+      Artist.resolve_all(artists)
+      artist_ids.update((artist.name, artist.id) for artist in artists)
+    rows = []
+    for number, title, artist, year, reference in paintings:
+      rows.append((self.next_painting_id, title, artist_ids[artist], year, self.museum_id(number, reference)))
+      self.next_painting_id += 1
+    DB.executemany(PAINTING_SQL, rows)
+    self.painting_count += len(rows)
+
+  def commit(self):
+    """Index the loaded paintings for search and the change feed, restore the triggers and commit"""
+    if self.next_painting_id > self.first_painting_id:
+      for sql in DEFERRED_TRIGGERS.values():
+        DB.execute(sql, (self.first_painting_id, self.next_painting_id - 1))
+    for name in DEFERRED_TRIGGERS:
+      # Not through DB.execute, which would store the trigger with its whitespace collapsed
+      DB.connection.execute(_trigger_sql(name))
+    DB.commit()
+
+
+def _write(path, pragmas, results, workers, window, failed, written, outcome):
+  """Writer process: write the workers' blocks in sequence order and put the outcome on outcome.
+  Every block releases window once it is written or discarded."""
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  DB.configure(path=path, pragmas=pragmas)
+  writer = Writer()
+  error = None
+  pending = {}
+  next_seq = 0
+  try:
+    writer.begin()
+  except sqlite3.Error as exc:
+    error = str(exc)
+    failed.set()
+  done = 0
+  while done < workers:
+    result = results.get()
+    if result is None:
+      done += 1
+      continue
+    if error is not None:
+      window.release()
+      continue
+    pending[result[0]] = result[1:]
+    while next_seq in pending:
+      museums, paintings, message = pending.pop(next_seq)
+      next_seq += 1
+      window.release()
+      try:
+        if message is not None:
+          raise ValueError(message)
+        writer.write(museums, paintings)
+        written.value = writer.museum_count + writer.painting_count
+      except (ValueError, sqlite3.Error) as exc:
+        error = str(exc)
+        failed.set()
+        for _ in pending:
+          window.release()
+        pending.clear()
+        break
+  try:
+    if error is None and not failed.is_set():
+      writer.commit()
+      outcome.put(("ok", writer.museum_count, writer.painting_count))
+      return
+  except sqlite3.Error as exc:
+    error = str(exc)
+  DB.rollback()
+  outcome.put(("error", error))
+
+
+def load_catalogue(path, format=None, workers=None, block_size=BLOCK_SIZE, progress=None, interval=1.0):
+  """Load a CSV or JSONL catalogue file like catalogue.import_catalogue, with parsing and validation spread
+  over worker processes and every insert made by a single writer process, in one transaction.
+
+  The file is read in blocks of block_size records. Workers parse and validate blocks as they arrive,
+  and the writer inserts them in file order, so ids match a serial import's whatever the number of workers.
+  At most BLOCKS_PER_WORKER blocks per worker are in flight between the reader and the writer; the reader
+  waits when the writer falls behind. The writer drops the per-row search index and change feed triggers
+  on paintings for the load and fills both in one statement each before committing. progress, if given,
+  is called with (records read, rows written) every interval seconds.
+  workers defaults to the number of CPUs. Return a (museum count, painting count) tuple; an invalid record
+  raises ValueError naming its line, and nothing is saved."""
+  if DB.journal is not None:
+    raise RuntimeError("the loader writes to the database file, so it cannot run with an in-memory database")
+  format = _format(path, format)
+  workers = workers or os.cpu_count() or 1
+  # Fresh interpreters rather than forks, so no child inherits this process's open connections
+  context = multiprocessing.get_context("spawn")
+  tasks = context.Queue()
+  results = context.Queue()
+  outcome = context.Queue()
+  window = context.Semaphore(workers * BLOCKS_PER_WORKER)
+  failed = context.Event()
+  written = context.Value("q", 0, lock=False)
+  processes = [context.Process(target=_work, args=(tasks, results), daemon=True) for _ in range(workers)]
+  writer = context.Process(
+    target=_write, args=(DB.path, DB.pragmas, results, workers, window, failed, written, outcome), daemon=True,
+  )
+  for process in processes + [writer]:
+    process.start()
+
+  read = 0
+  last_report = time.perf_counter()
+
+  def report(force=False):
+    nonlocal last_report
+    if progress and (force or time.perf_counter() - last_report >= interval):
+      progress(read, written.value)
+      last_report = time.perf_counter()
+
+  aborted = None
+  try:
+    for seq, (header, items) in enumerate(read_blocks(path, format, block_size)):
+      while not window.acquire(timeout=interval):
+        if not all(process.is_alive() for process in processes + [writer]):
+          raise RuntimeError("a loader process exited unexpectedly")
+        report()
+      if failed.is_set():
+        break
+      tasks.put((seq, header, items))
+      read += len(items)
+      report()
+  except BaseException as error:
+    failed.set()
+    aborted = error
+  for _ in processes:
+    tasks.put(None)
+
+  try:
+    while True:
+      try:
+        status = outcome.get(timeout=interval)
+        break
+      except queue.Empty:
+        if not writer.is_alive():
+          raise RuntimeError(f"the writer process exited with status {writer.exitcode}")
+        report()
+  finally:
+    for process in processes + [writer]:
+      process.join(timeout=None if aborted is None else 5)
+      if process.is_alive():
+        process.terminate()
+    QUERY_CACHE.clear()
+  if aborted is not None:
+    raise aborted
+  report(force=True)
+  if status[0] == "error":
+    raise ValueError(status[1])
+  return status[1], status[2]
@@ -0,0 +1,185 @@
+# lib/models/memory.py
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from . import DB
+from .query_cache import QUERY_CACHE
+
+MODES = ("write-through", "write-back")
+
+logger = logging.getLogger("models.memory")
+
+
+class MemoryDatabase:
+  """Serve every query from an in-memory copy of the database file.
+
+  start() copies the file into memory with sqlite3's backup API and points DB at the copy, so finders
+  never touch the disk. The copy is a named shared-cache memory database that every thread's connection
+  opens, so the aio reader threads share it too. Shared-cache connections lock whole tables rather than
+  waiting on each other, so they read with read_uncommitted: a reader never waits for a writer, but may
+  see another thread's writes before they commit. Writes run against the copy and are recorded as they
+  commit, then replayed on the file in the same order:
+    write-through - inside each commit, so the file is never behind; a commit the file rejects is
+                    not committed in memory either
+    write-back    - in one transaction every interval seconds, on flush() and at stop() or exit,
+                    so a burst of commits costs one disk commit
+  Writes made to the file by other processes after start() are not seen. Run migrate() before start(),
+  since migrations write through their own connection."""
+
+  def __init__(self, mode="write-through", interval=5.0, db=DB):
+    if mode not in MODES:
+      raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if mode == "write-back" and not interval > 0:
+      raise ValueError("interval must be a positive number of seconds")
+    self.mode = mode
+    self.interval = interval
+    self.db = db
+    self.path = None
+    self.pragmas = None
+    self.uri = None
+    self.disk = None
+    self.memory = None
+    self.log = []
+    self.flushes = 0
+    self.flushed = 0
+    self.load_seconds = None
+    self._local = threading.local()
+    self._lock = threading.RLock()
+    self._stopping = threading.Event()
+    self._timer = None
+
+  def start(self):
+    """Load the database file into memory and route DB through the copy; return self"""
+    if self.db.journal is not None:
+      raise RuntimeError("an in-memory database is already in use")
+    started = time.perf_counter()
+    self.path = self.db.path
+    self.pragmas = dict(self.db.pragmas)
+    self.uri = f"file:museums-{os.getpid()}-{id(self)}?mode=memory&cache=shared"
+    self.disk = self.db.connect()
+    # Kept open so the in-memory database outlives the connections DB opens and closes
+    self.memory = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+    self.disk.backup(self.memory)
+    self.db.configure(path=self.uri, pragmas={"read_uncommitted": 1})
+    self.db.journal = self
+    QUERY_CACHE.clear()
+    self.load_seconds = time.perf_counter() - started
+    if self.mode == "write-back":
+      self._stopping.clear()
+      self._timer = threading.Thread(target=self._flush_periodically, name="memory-write-back", daemon=True)
+      self._timer.start()
+    atexit.register(self.stop)
+    return self
+
+  def stop(self):
+    """Write back any pending changes and point DB at the database file again"""
+    if self.db.journal is not self:
+      return
+    if self._timer is not None:
+      self._stopping.set()
+      self._timer.join()
+      self._timer = None
+    self.flush()
+    self.db.journal = None
+    self.db.pragmas = self.pragmas
+    self.db.configure(path=self.path)
+    self.memory.close()
+    self.disk.close()
+    QUERY_CACHE.clear()
+    atexit.unregister(self.stop)
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def _pending(self):
+    """The calling thread's writes since its last commit or rollback"""
+    pending = getattr(self._local, "pending", None)
+    if pending is None:
+      pending = self._local.pending = []
+    return pending
+
+  def record(self, conn, sql, params, many):
+    """Note a write run on conn. SQLite commits a write made outside a transaction (such as DDL)
+    at once, so it is published straight away."""
+    pending = self._pending()
+    pending.append((sql, params, many))
+    if not conn.in_transaction:
+      self.commit(conn)
+
+  def commit(self, conn):
+    """Commit conn and publish the calling thread's writes, in commit order"""
+    pending = self._pending()
+    if not pending:
+      conn.commit()
+      return
+    with self._lock:
+      if self.mode == "write-through":
+        try:
+          self._replay(pending)
+          conn.commit()
+        except Exception:
+          self.disk.rollback()
+          raise
+        self.disk.commit()
+        self.flushes += 1
+        self.flushed += len(pending)
+      else:
+        conn.commit()
+        self.log.extend(pending)
+    pending.clear()
+
+  def rollback(self, conn):
+    """Roll back conn and forget the calling thread's unpublished writes"""
+    self._pending().clear()
+    conn.rollback()
+
+  def _replay(self, statements):
+    self.disk.execute("BEGIN IMMEDIATE")
+    for sql, params, many in statements:
+      if many:
+        self.disk.executemany(sql, params)
+      else:
+        self.disk.execute(sql, params)
+
+  def flush(self):
+    """Replay every committed write not yet on disk in one transaction; return how many statements ran.
+    If the file cannot be written the writes stay queued for the next flush."""
+    with self._lock:
+      if not self.log:
+        return 0
+      statements = self.log
+      try:
+        self._replay(statements)
+        self.disk.commit()
+      except Exception:
+        self.disk.rollback()
+        raise
+      self.log = []
+      self.flushes += 1
+      self.flushed += len(statements)
+      return len(statements)
+
+  def _flush_periodically(self):
+    while not self._stopping.wait(self.interval):
+      try:
+        self.flush()
+      except sqlite3.Error:
+        logger.exception("write-back to %s failed; retrying in %ss", self.path, self.interval)
+
+  def stats(self):
+    """Return the mode, load time and write-back counters"""
+    with self._lock:
+      return {
+        "mode": self.mode,
+        "path": self.path,
+        "load_seconds": self.load_seconds,
+        "pending": len(self.log),
+        "flushes": self.flushes,
+        "statements_flushed": self.flushed,
+      }
@@ -1,10 +1,33 @@
 # lib/models/museum.py
-from . import CURSOR, CONN
+from collections import namedtuple
+from . import DB, chunked
+from .schema import migrate, INDEXES, SEARCH, CHANGES
+from .search import match_expression
+from .identity_map import IdentityMap
+from .query_cache import QUERY_CACHE
+from .session import current_session, autocommit, autorollback, inserted, deleted
+from .aio import reader, class_writer, writer
+
+# Read-only projection of a museums row, for listing and reporting without building Museum objects
+MuseumRow = namedtuple("MuseumRow", ["id", "name", "location"])
+
 
 class Museum:
+  # No per-instance __dict__; __weakref__ lets the identity map hold weak references
+  __slots__ = ("id", "_name", "_location", "__weakref__")
+
+  # Identity map of objects saved to the database. Recently used museums are kept in memory,
+  # older ones only for as long as something else references them.
+  all = IdentityMap("lru", maxsize=10_000)
 
-  # Dictionary of objects saved to the database
-  all = {}
+  TABLE = "museums"
+  # Attributes written by update(), snapshotted so a rolled back transaction() can restore them
+  FIELDS = ("name", "location")
+  UPDATE_SQL = """
+    UPDATE museums
+    SET name = ?, location = ?
+    WHERE id = ?
+  """
 
   def __init__(self, name, location, id=None):
     self.id = id
@@ -35,24 +58,31 @@ class Museum:
 
   @classmethod
   def create_table(cls):
-    """Create a new table to persist the attributes of Museum instances"""
+    """Create a new table, with its finder indexes, search index and change triggers, to persist the attributes of Museum instances"""
     sql = """
       CREATE TABLE IF NOT EXISTS museums (
       id INTEGER PRIMARY KEY,
       name TEXT NOT NULL,
       location TEXT NOT NULL)
     """
-    CURSOR.execute(sql)
-    CONN.commit()
+    # A new database is built by the migrations, so PRAGMA user_version records its schema
+    migrate()
+    DB.execute(sql)
+    for extra_sql in INDEXES["museums"] + SEARCH["museums"] + CHANGES["museums"]:
+      DB.execute(extra_sql)
+    DB.commit()
+    QUERY_CACHE.clear()
 
   @classmethod
   def drop_table(cls):
-    """Drop the table that persists Museum instances"""
+    """Drop the table that persists Museum instances, and its search index"""
     sql = """
       DROP TABLE IF EXISTS museums;
     """
-    CURSOR.execute(sql)
-    CONN.commit()
+    DB.execute(sql)
+    DB.execute("DROP TABLE IF EXISTS museums_fts")
+    DB.commit()
+    QUERY_CACHE.clear()
 
   def save(self):
     """Insert a new row with the name and location values of the current Museum instance.
@@ -62,11 +92,47 @@ class Museum:
       INSERT INTO museums (name, location)
       VALUES (?, ?)
     """
-    CURSOR.execute(sql, (self.name, self.location))
-    CONN.commit()
-
-    self.id = CURSOR.lastrowid
+    cursor = DB.execute(sql, (self.name, self.location))
+    self.id = cursor.lastrowid
     type(self).all[self.id] = self
+    inserted(self)
+    QUERY_CACHE.invalidate("museums", self.id)
+
+  @classmethod
+  def bulk_create(cls, museums, chunk_size=1000, commit=True):
+    """Insert unsaved Museum instances with one executemany per chunk inside a single transaction.
+    Ids are assigned from the table's current max primary key and each object is saved in the local dictionary.
+    Pass commit=False to leave the transaction open for the caller."""
+    sql = """
+      INSERT INTO museums (id, name, location)
+      VALUES (?, ?, ?)
+    """
+    created = []
+    try:
+      DB.begin()
+      next_id = DB.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM museums").fetchone()[0]
+      for chunk in chunked(museums, chunk_size):
+        for museum in chunk:
+          museum.id = next_id
+          next_id += 1
+        created.extend(chunk)
+        DB.executemany(sql, [(museum.id, museum.name, museum.location) for museum in chunk])
+      if commit:
+        autocommit()
+    except Exception:
+      autorollback()
+      for museum in created:
+        museum.id = None
+      raise
+    finally:
+      QUERY_CACHE.invalidate("museums")
+
+    session = current_session()
+    for museum in created:
+      cls.all[museum.id] = museum
+      if session:
+        session.added(museum)
+    return created
 
   @classmethod
   def create(cls, name, location):
@@ -76,32 +142,67 @@ class Museum:
     return museum
 
   def update(self, name=None, location=None):
-      """Update the table row corresponding to the current Museum instance"""
+      """Update the table row corresponding to the current Museum instance.
+      Inside a transaction() the UPDATE is queued and written in a batch."""
+      session = current_session()
+      if session:
+          session.changing(self)
       if name:
           self.name = name
       if location:
           self.location = location
 
-      sql = """
-        UPDATE museums
-        SET name = ?, location = ?
-        WHERE id = ?
-      """
-      CURSOR.execute(sql, (self.name, self.location, self.id))
-      CONN.commit()
+      if session:
+          session.changed(self)
+      else:
+          DB.execute(self.UPDATE_SQL, self.update_values())
+          DB.commit()
+      QUERY_CACHE.invalidate("museums", self.id)
+
+  def update_values(self):
+      """Return the parameters for UPDATE_SQL"""
+      return (self.name, self.location, self.id)
 
-  def delete(self):
+  def delete(self, cascade=True):
     """Delete the table row corresponding to the current Museum instance,
-    delete the dictionary entry, and reassign id attribute."""
+    delete the dictionary entry, and reassign id attribute.
+    The museum's paintings are deleted too, with one statement in the same transaction, and their
+    entries are dropped from Painting.all. With cascade=False a museum that still has paintings
+    raises ValueError instead."""
     sql = """
       DELETE FROM museums
       WHERE id = ?
     """
-    CURSOR.execute(sql, (self.id,))
-    CONN.commit()
+    try:
+      if cascade:
+        DB.execute("""
+          DELETE FROM paintings
+          WHERE museum_id = ?
+        """, (self.id,))
+      elif DB.execute("SELECT 1 FROM paintings WHERE museum_id = ? LIMIT 1", (self.id,)).fetchone():
+        raise ValueError(f"museum {self.name!r} still has paintings")
+      DB.execute(sql, (self.id,))
+    except Exception:
+      autorollback()
+      raise
+    session = current_session()
+
+    if cascade:
+      from models.painting import Painting
+      for painting in Painting.all.values():
+        if painting.museum.id == self.id:
+          if session:
+            session.removed(painting, painting.id)
+          Painting.all.pop(painting.id, None)
+          painting.id = None
 
     # Delete the dictionary entry using id as the key
     type(self).all.pop(self.id, None)
+    deleted(self, self.id)
+    # Invalidated after the commit, so a concurrent reader cannot cache the rows under the new generation
+    QUERY_CACHE.invalidate("museums", self.id)
+    if cascade:
+      QUERY_CACHE.invalidate("paintings", self.id)
     self.id = None
 
   @classmethod
@@ -111,24 +212,98 @@ class Museum:
     # Check the dictionary for an existing instance using the row's primary key
     museum = cls.all.get(row[0])
     if museum:
-      # Ensure attributes match row values in case local instance was modified
-      museum.name = row[1]
-      museum.location = row[2]
+      # Ensure attributes match row values in case local instance was modified.
+      # Row values were validated when they were written, so the setters are skipped.
+      museum._name = row[1]
+      museum._location = row[2]
     else:
-      # Not in dictionary, create new instance and add to dictionary. row[0] = id, row[1] = name, row[2] = location
-      museum = cls(row[1], row[2])
-      museum.id = row[0]
-      cls.all[museum.id] = museum
+      # Not in dictionary, create new instance and add to dictionary (unless another thread just did).
+      # row[0] = id, row[1] = name, row[2] = location
+      museum = cls.all.setdefault(row[0], cls._from_row(row))
+    return museum
+
+  @classmethod
+  def _from_row(cls, row):
+    """Build a Museum from a table row without running the validating setters"""
+    museum = cls.__new__(cls)
+    museum.id = row[0]
+    museum._name = row[1]
+    museum._location = row[2]
     return museum
 
   @classmethod
-  def get_all(cls):
-    """Return a list containing a Museum object per row in the table"""
+  def query(cls):
+    """Return a models.query.Query over every Museum row, to narrow down with where(), between(), prefix(),
+    order_by() and limit()"""
+    from models.query import Query
+    return Query(cls)
+
+  @classmethod
+  def get_all(cls, as_rows=False):
+    """Return a list containing a Museum object per row in the table, or a MuseumRow per row with as_rows=True"""
+    sql = """
+      SELECT *
+      FROM museums
+    """
+    rows = QUERY_CACHE.fetchall(sql, tables=("museums",))
+    if as_rows:
+      return [MuseumRow._make(row) for row in rows]
+    return [cls.instance_from_db(row) for row in rows]
+
+  @classmethod
+  def page(cls, after_id=0, limit=50, as_rows=False):
+    """Return up to limit Museum objects (or MuseumRows with as_rows=True) with ids greater than after_id,
+    in id order. Pass the id of the last museum on a page as after_id to get the next page."""
     sql = """
       SELECT *
       FROM museums
+      WHERE id > ?
+      ORDER BY id
+      LIMIT ?
     """
-    rows = CURSOR.execute(sql).fetchall()
+    rows = QUERY_CACHE.fetchall(sql, (after_id, limit), tables=("museums",))
+    if as_rows:
+      return [MuseumRow._make(row) for row in rows]
+    return [cls.instance_from_db(row) for row in rows]
+
+  @classmethod
+  def iter_all(cls, batch_size=500, as_rows=False):
+    """Yield every Museum object (or MuseumRow with as_rows=True) in id order, reading batch_size rows per query"""
+    sql = """
+      SELECT *
+      FROM museums
+      WHERE id > ?
+      ORDER BY id
+      LIMIT ?
+    """
+    after_id = 0
+    while True:
+      rows = QUERY_CACHE.fetchall(sql, (after_id, batch_size), cache=False)
+      if not rows:
+        return
+      if as_rows:
+        yield from map(MuseumRow._make, rows)
+      else:
+        for row in rows:
+          yield cls.instance_from_db(row)
+      after_id = rows[-1][0]
+
+  @classmethod
+  def search(cls, query, limit=20):
+    """Return up to limit Museum objects whose name or location contains words starting with
+    each word of query, best matches first"""
+    expression = match_expression(query)
+    if expression is None:
+      return []
+    sql = """
+      SELECT museums.*
+      FROM museums_fts
+      JOIN museums ON museums.id = museums_fts.rowid
+      WHERE museums_fts MATCH ?
+      ORDER BY bm25(museums_fts, 5.0, 1.0)
+      LIMIT ?
+    """
+    rows = QUERY_CACHE.fetchall(sql, (expression, limit), tables=("museums",))
     return [cls.instance_from_db(row) for row in rows]
 
   @classmethod
@@ -139,7 +314,7 @@ class Museum:
       FROM museums
       WHERE id = ?
     """
-    row = CURSOR.execute(sql, (id,)).fetchone()
+    row = QUERY_CACHE.fetchone(sql, (id,), tables=("museums",))
     return cls.instance_from_db(row) if row else None
     
   @classmethod
@@ -150,7 +325,7 @@ class Museum:
         FROM museums
         WHERE name = ?
     """
-    row = CURSOR.execute(sql, (name,)).fetchone()
+    row = QUERY_CACHE.fetchone(sql, (name,), tables=("museums",))
     return cls.instance_from_db(row) if row else None
 
   @classmethod
@@ -161,16 +336,27 @@ class Museum:
       FROM museums
       WHERE location = ?
     """
-    row = CURSOR.execute(sql, (location,)).fetchone()
+    row = QUERY_CACHE.fetchone(sql, (location,), tables=("museums",))
     return cls.instance_from_db(row) if row else None
 
   def paintings(self):
     """Returns list of paintings associated with current museum"""
     from models.painting import Painting
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE museum_id = ?
-    """
-    rows = CURSOR.execute(sql, (self.id,),).fetchall()
-    return [Painting.instance_from_db(row) for row in rows]
+    return Painting.find_by_museum(self.id)
+
+  # async API, e.g. `await Museum.aget_all()`; see models/aio.py
+  aget_all = reader("get_all")
+  afind_by_id = reader("find_by_id")
+  afind_by_name = reader("find_by_name")
+  afind_by_location = reader("find_by_location")
+  apage = reader("page")
+  asearch = reader("search")
+  acreate = class_writer("create")
+  abulk_create = class_writer("bulk_create")
+  asave = writer("save")
+  aupdate = writer("update")
+  adelete = writer("delete")
+
+
+# Objects loaded from one database file do not describe the rows of another
+DB.resets.append(Museum.all.clear)
@@ -1,10 +1,61 @@
 # lib/models/painting.py
-from . import CURSOR, CONN
+from . import DB, chunked
+from .schema import migrate, ARTISTS, INDEXES, SEARCH, CHANGES
+from .search import match_expression
+from .identity_map import IdentityMap
+from .query_cache import QUERY_CACHE
+from .session import current_session, autocommit, autorollback, inserted, deleted
+from .aio import reader, class_writer, writer
 from .museum import Museum
+from .artist import Artist
+from collections import namedtuple
 from datetime import datetime
 
+# Read-only projection of a painting row joined with its museum, for listing and reporting without building objects
+PaintingRow = namedtuple("PaintingRow", ["id", "title", "artist", "year", "museum_id", "museum_name", "museum_location"])
+
+
+def check_year(year, current_year=None):
+  """Return year if the year setter accepts it, else raise ValueError. Callers validating many rows
+  pass current_year, read once, instead of reading the clock for every row."""
+  if not isinstance(year, int):
+    raise ValueError("year must be an integer")
+  if year > (datetime.now().year if current_year is None else current_year):
+    raise ValueError("year cannot be in the future")
+  if year < 1000:
+    raise ValueError("year must be a 4-digit number")
+  return year
+
+
 class Painting:
-  all = {}
+  # No per-instance __dict__; __weakref__ lets the identity map hold weak references
+  __slots__ = ("id", "_title", "_artist", "_year", "_museum", "__weakref__")
+
+  # Identity map of objects saved to the database, see Museum.all
+  all = IdentityMap("lru", maxsize=10_000)
+
+  # Paintings are always read together with their museum and artist name so a single query
+  # hydrates all three, instead of one extra museum lookup per painting row
+  SELECT_SQL = """
+      SELECT paintings.id, paintings.title, artists.name, paintings.year,
+             paintings.museum_id, museums.name, museums.location
+      FROM paintings
+      JOIN artists ON artists.id = paintings.artist_id
+      JOIN museums ON museums.id = paintings.museum_id
+  """
+  # Tables read by SELECT_SQL, for query cache invalidation
+  TABLES = ("paintings", "museums", "artists")
+
+  TABLE = "paintings"
+  # Attributes written by update(), snapshotted so a rolled back transaction() can restore them
+  FIELDS = ("title", "artist", "year")
+  # The artist is written by name, so updating a painting hydrated from a row (whose Artist may not
+  # know its id yet) needs no extra lookup; update() inserts the artist's row first if it is new
+  UPDATE_SQL = """
+    UPDATE paintings
+    SET title = ?, artist_id = (SELECT id FROM artists WHERE name = ?), year = ?
+    WHERE id = ?
+  """
 
   def __init__(self, title, artist, year, museum, id=None):
     self.id = id
@@ -25,31 +76,32 @@ class Painting:
     else:
       raise ValueError("title must be a non-empty string")
 
+  # The artist is stored as an interned Artist, shared by all of its paintings; the artist property
+  # reads and writes its name, and artist_ref gives the Artist itself
   @property
   def artist(self):
-    return self._artist
+    return self._artist.name
 
   @artist.setter
   def artist(self, artist):
-    if isinstance(artist, str) and len(artist):
+    if isinstance(artist, Artist):
       self._artist = artist
+    elif isinstance(artist, str) and len(artist):
+      self._artist = Artist.intern(artist)
     else:
       raise ValueError("artist must be a non-empty string")
 
+  @property
+  def artist_ref(self):
+    return self._artist
+
   @property
   def year(self):
     return self._year
 
   @year.setter
   def year(self, year):
-    current_year = datetime.now().year
-    if not isinstance(year, int):
-      raise ValueError("year must be an integer")
-    if year > current_year:
-      raise ValueError("year cannot be in the future")
-    if year < 1000:
-      raise ValueError("year must be a 4-digit number")
-    self._year = year
+    self._year = check_year(year)
 
 
   @property 
@@ -66,59 +118,80 @@ class Painting:
   # db methods    
   @classmethod
   def create_table(cls):
-    """Create a new table to persist the attributes of Painting instances"""
+    """Create a new table, with its finder indexes, search index and change triggers, to persist the attributes of Painting instances.
+    The artists table the paintings reference is created too."""
     sql = """
       CREATE TABLE IF NOT EXISTS paintings (
       id INTEGER PRIMARY KEY,
       title TEXT NOT NULL,
-      artist TEXT NOT NULL,
+      artist_id INTEGER NOT NULL,
       year INTEGER NOT NULL,
       museum_id INTEGER NOT NULL,
+      FOREIGN KEY (artist_id) REFERENCES artists(id),
       FOREIGN KEY (museum_id) REFERENCES museums(id))
     """
-    CURSOR.execute(sql)
-    CONN.commit()
+    # A new database is built by the migrations, so PRAGMA user_version records its schema
+    migrate()
+    DB.execute(sql)
+    for extra_sql in ARTISTS + INDEXES["paintings"] + SEARCH["paintings"] + CHANGES["paintings"]:
+      DB.execute(extra_sql)
+    DB.commit()
+    QUERY_CACHE.clear()
 
   @classmethod
   def drop_table(cls):
-    """Drop the table that persists Painting instances"""
+    """Drop the table that persists Painting instances, and its search index"""
     sql = """
       DROP TABLE IF EXISTS paintings
     """
-    CURSOR.execute(sql)
-    CONN.commit()
+    DB.execute(sql)
+    DB.execute("DROP TABLE IF EXISTS paintings_fts")
+    DB.execute("DROP TRIGGER IF EXISTS paintings_fts_museum_update")
+    DB.execute("DROP TRIGGER IF EXISTS paintings_fts_artist_update")
+    DB.execute("DROP TRIGGER IF EXISTS paintings_changes_artist_update")
+    DB.commit()
+    QUERY_CACHE.clear()
 
   def save(self):
     """Insert a new row with the title, artist, year, and museum values of the current Painting object.
+    The artist's row is looked up, or inserted, by name.
     Update object id attribute using the primary key value of new row.
     Save the object in local dictionary using table row's PK as dictionary key."""
     sql = """
-      INSERT INTO paintings (title, artist, year, museum_id)
+      INSERT INTO paintings (title, artist_id, year, museum_id)
       VALUES (?, ?, ?, ?)
     """
 
-    CURSOR.execute(sql, (self.title, self.artist, self.year, self.museum.id))
-    CONN.commit()
-
-    self.id = CURSOR.lastrowid
+    cursor = DB.execute(sql, (self.title, self._artist.resolve(), self.year, self.museum.id))
+    self.id = cursor.lastrowid
     type(self).all[self.id] = self
+    inserted(self)
+    QUERY_CACHE.invalidate("paintings", self.museum.id)
 
   def update(self, title=None, artist=None, year=None):
-      """Update the table row corresponding to the current Painting instance"""
+      """Update the table row corresponding to the current Painting instance.
+      Inside a transaction() the UPDATE is queued and written in a batch."""
+      session = current_session()
+      if session:
+          session.changing(self)
       if title:
           self.title = title
       if artist:
           self.artist = artist
+          self._artist.resolve()
       if year:
           self.year = year
 
-      sql = """
-        UPDATE paintings
-        SET title = ?, artist = ?, year = ?
-        WHERE id = ?
-      """
-      CURSOR.execute(sql, (self.title, self.artist, self.year, self.id))
-      CONN.commit()
+      if session:
+          session.changed(self)
+      else:
+          DB.execute(self.UPDATE_SQL, self.update_values())
+          DB.commit()
+      QUERY_CACHE.invalidate("paintings", self.museum.id)
+
+  def update_values(self):
+      """Return the parameters for UPDATE_SQL"""
+      return (self.title, self.artist, self.year, self.id)
 
 
   def delete(self):
@@ -128,11 +201,13 @@ class Painting:
       DELETE FROM paintings
       WHERE id = ?
     """
-    CURSOR.execute(sql, (self.id,))
-    CONN.commit()
+    DB.execute(sql, (self.id,))
 
     # Delete the dictionary entry using id as the key
     type(self).all.pop(self.id, None)
+    deleted(self, self.id)
+    # Invalidated after the commit, so a concurrent reader cannot cache the row under the new generation
+    QUERY_CACHE.invalidate("paintings", self.museum.id)
     self.id = None
 
   #constructors
@@ -144,85 +219,252 @@ class Painting:
     return painting
 
   @classmethod
-  def instance_from_db(cls, row):
-    """Return an Painting object having the attribute values from the table row."""
+  def bulk_create(cls, paintings, chunk_size=1000, commit=True):
+    """Insert unsaved Painting instances with one executemany per chunk inside a single transaction.
+    Ids are assigned from the table's current max primary key and each object is saved in the local dictionary.
+    The artists of each chunk are resolved to ids with Artist.resolve_all, two queries per chunk.
+    Pass commit=False to leave the transaction open for the caller."""
+    sql = """
+      INSERT INTO paintings (id, title, artist_id, year, museum_id)
+      VALUES (?, ?, ?, ?, ?)
+    """
+    created = []
+    try:
+      DB.begin()
+      next_id = DB.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM paintings").fetchone()[0]
+      for chunk in chunked(paintings, chunk_size):
+        for painting in chunk:
+          painting.id = next_id
+          next_id += 1
+        created.extend(chunk)
+        Artist.resolve_all([painting._artist for painting in chunk])
+        DB.executemany(sql, [
+          (painting.id, painting.title, painting._artist.id, painting.year, painting.museum.id)
+          for painting in chunk
+        ])
+      if commit:
+        autocommit()
+    except Exception:
+      autorollback()
+      if current_session() is None:
+        # Artists inserted by resolve_all were rolled back with the paintings
+        Artist.reset()
+      for painting in created:
+        painting.id = None
+      raise
+    finally:
+      QUERY_CACHE.invalidate("paintings")
+
+    session = current_session()
+    for painting in created:
+      cls.all[painting.id] = painting
+      if session:
+        session.added(painting)
+    return created
+
+  @classmethod
+  def instance_from_db(cls, row, museum=None, artist=None):
+    """Return an Painting object having the attribute values from the table row.
+    Rows selected with SELECT_SQL carry the museum's name and location in row[5] and row[6],
+    so the museum is resolved through the Museum.all dictionary without another query.
+    The artist name in row[2] is resolved through the Artist.by_name interning cache."""
+    if museum is None:
+      if len(row) > 5:
+        museum = Museum.instance_from_db((row[4], row[5], row[6]))
+      else:
+        museum = Museum.find_by_id(row[4])
+    if artist is None:
+      artist = Artist.intern(row[2])
+
     # Check the dictionary for existing instance using the row's primary key
     painting = cls.all.get(row[0])
-    museum = Museum.find_by_id(row[4])
-
     if painting:
-      # Ensure attributes match row values in case local instance was modified
-      painting.title = row[1]
-      painting.artist = row[2]
-      painting.year = row[3]
-      painting.museum = museum
+      # Ensure attributes match row values in case local instance was modified.
+      # Row values were validated when they were written, so the setters are skipped.
+      painting._title = row[1]
+      painting._artist = artist
+      painting._year = row[3]
+      painting._museum = museum
     else:
-      # Not in dictionary, create a new instance and add it to the dictionary
-      painting = cls(row[1], row[2], row[3], museum, row[0])
-      cls.all[painting.id] = painting
+      # Not in dictionary, create a new instance and add it to the dictionary (unless another thread just did)
+      painting = cls.all.setdefault(row[0], cls._from_row(row, museum, artist))
     return painting
 
+  @classmethod
+  def _from_row(cls, row, museum, artist=None):
+    """Build a Painting from a table row and its museum without running the validating setters"""
+    painting = cls.__new__(cls)
+    painting.id = row[0]
+    painting._title = row[1]
+    painting._artist = artist or Artist.intern(row[2])
+    painting._year = row[3]
+    painting._museum = museum
+    return painting
+
+  @classmethod
+  def instances_from_db(cls, rows):
+    """Return a list of Painting objects for rows selected with SELECT_SQL.
+    Each museum and artist is hydrated once per batch, however many of its paintings are in the rows."""
+    museums = {}
+    artists = {}
+    paintings = []
+    for row in rows:
+      museum = museums.get(row[4])
+      if museum is None:
+        museum = museums[row[4]] = Museum.instance_from_db((row[4], row[5], row[6]))
+      artist = artists.get(row[2])
+      if artist is None:
+        artist = artists[row[2]] = Artist.intern(row[2])
+      paintings.append(cls.instance_from_db(row, museum, artist))
+    return paintings
+
 
   #finders
   @classmethod
-  def get_all(cls):
-    sql = """
-      SELECT *
-      FROM paintings
+  def query(cls):
+    """Return a models.query.Query over every Painting row, to narrow down with where(), between(), prefix(),
+    order_by() and limit()"""
+    from models.query import Query
+    return Query(cls)
+
+  @classmethod
+  def get_all(cls, as_rows=False):
+    """Return a list containing a Painting object per row in the table, or a PaintingRow per row with as_rows=True"""
+    sql = cls.SELECT_SQL
+    rows = QUERY_CACHE.fetchall(sql, tables=cls.TABLES)
+    if as_rows:
+      return [PaintingRow._make(row) for row in rows]
+    return cls.instances_from_db(rows)
+
+  @classmethod
+  def page(cls, after_id=0, limit=50, museum_id=None, as_rows=False):
+    """Return up to limit Painting objects (or PaintingRows with as_rows=True) with ids greater than after_id,
+    in id order, optionally only those belonging to the specified museum.
+    Pass the id of the last painting on a page as after_id to get the next page."""
+    if museum_id is None:
+      sql = cls.SELECT_SQL + """
+        WHERE paintings.id > ?
+        ORDER BY paintings.id
+        LIMIT ?
+      """
+      rows = QUERY_CACHE.fetchall(sql, (after_id, limit), tables=cls.TABLES)
+    else:
+      sql = cls.SELECT_SQL + """
+        WHERE paintings.museum_id = ? AND paintings.id > ?
+        ORDER BY paintings.id
+        LIMIT ?
+      """
+      rows = QUERY_CACHE.fetchall(sql, (museum_id, after_id, limit), tables=cls.TABLES, museum_id=museum_id)
+    if as_rows:
+      return [PaintingRow._make(row) for row in rows]
+    return cls.instances_from_db(rows)
+
+  @classmethod
+  def iter_all(cls, batch_size=500, museum_id=None, as_rows=False):
+    """Yield every Painting object (or PaintingRow with as_rows=True) in id order, optionally only those
+    belonging to the specified museum, reading batch_size rows per query so memory stays flat however large
+    the table is"""
+    if museum_id is None:
+      sql = cls.SELECT_SQL + """
+        WHERE paintings.id > ?
+        ORDER BY paintings.id
+        LIMIT ?
+      """
+      params = ()
+    else:
+      sql = cls.SELECT_SQL + """
+        WHERE paintings.museum_id = ? AND paintings.id > ?
+        ORDER BY paintings.id
+        LIMIT ?
+      """
+      params = (museum_id,)
+    after_id = 0
+    while True:
+      rows = QUERY_CACHE.fetchall(sql, params + (after_id, batch_size), cache=False)
+      if not rows:
+        return
+      if as_rows:
+        yield from map(PaintingRow._make, rows)
+      else:
+        yield from cls.instances_from_db(rows)
+      after_id = rows[-1][0]
+
+  @classmethod
+  def search(cls, query, limit=20):
+    """Return up to limit Painting objects whose title, artist or museum name contains words starting with
+    each word of query, ranked so title matches come before artist matches and museum matches last"""
+    expression = match_expression(query)
+    if expression is None:
+      return []
+    sql = cls.SELECT_SQL + """
+      JOIN paintings_fts ON paintings_fts.rowid = paintings.id
+      WHERE paintings_fts MATCH ?
+      ORDER BY bm25(paintings_fts, 10.0, 5.0, 1.0)
+      LIMIT ?
     """
-    rows = CURSOR.execute(sql).fetchall()
-    return [cls.instance_from_db(row) for row in rows]
+    rows = QUERY_CACHE.fetchall(sql, (expression, limit), tables=cls.TABLES)
+    return cls.instances_from_db(rows)
 
   @classmethod
   def find_by_id(cls, id):
     """Return Painting object corresponding to the table row matching the specified primary key"""
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE id = ?
+    sql = cls.SELECT_SQL + """
+      WHERE paintings.id = ?
     """
-    row = CURSOR.execute(sql, (id,)).fetchone()
+    row = QUERY_CACHE.fetchone(sql, (id,), tables=cls.TABLES)
     return cls.instance_from_db(row) if row else None
 
   @classmethod
   def find_by_title(cls, title):
     """Return Painting object corresponding to first table row matching specified title"""
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE title = ?
+    sql = cls.SELECT_SQL + """
+      WHERE paintings.title = ?
     """
-    row = CURSOR.execute(sql, (title,)).fetchone()
+    row = QUERY_CACHE.fetchone(sql, (title,), tables=cls.TABLES)
     return cls.instance_from_db(row) if row else None
 
   @classmethod
   def find_by_artist(cls, artist):
-    """Return a list of Painting objects matching the specified artist"""
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE artist = ?
+    """Return a list of Painting objects matching the specified artist name"""
+    sql = cls.SELECT_SQL + """
+      WHERE artists.name = ?
     """
-    rows = CURSOR.execute(sql, (artist,)).fetchall()
-    return [cls.instance_from_db(row) for row in rows]
+    rows = QUERY_CACHE.fetchall(sql, (artist,), tables=cls.TABLES)
+    return cls.instances_from_db(rows)
 
   @classmethod
   def find_by_year(cls, year):
     """Return a list of Painting objects matching the specified year"""
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE year = ?
+    sql = cls.SELECT_SQL + """
+      WHERE paintings.year = ?
     """
-    rows = CURSOR.execute(sql, (year,)).fetchall()
-    return [cls.instance_from_db(row) for row in rows]
+    rows = QUERY_CACHE.fetchall(sql, (year,), tables=cls.TABLES)
+    return cls.instances_from_db(rows)
 
   @classmethod
   def find_by_museum(cls, museum_id):
-    sql = """
-      SELECT *
-      FROM paintings
-      WHERE museum_id = ?
+    """Return a list of Painting objects belonging to the specified museum"""
+    sql = cls.SELECT_SQL + """
+      WHERE paintings.museum_id = ?
     """
-    rows = CURSOR.execute(sql, (museum_id,)).fetchall()
-    return [cls.instance_from_db(row) for row in rows]
\ No newline at end of file
+    rows = QUERY_CACHE.fetchall(sql, (museum_id,), tables=cls.TABLES, museum_id=museum_id)
+    return cls.instances_from_db(rows)
+
+  # async API, e.g. `await Painting.afind_by_museum(museum_id)`; see models/aio.py
+  aget_all = reader("get_all")
+  afind_by_id = reader("find_by_id")
+  afind_by_title = reader("find_by_title")
+  afind_by_artist = reader("find_by_artist")
+  afind_by_year = reader("find_by_year")
+  afind_by_museum = reader("find_by_museum")
+  apage = reader("page")
+  asearch = reader("search")
+  acreate = class_writer("create")
+  abulk_create = class_writer("bulk_create")
+  asave = writer("save")
+  aupdate = writer("update")
+  adelete = writer("delete")
+
+
+# Objects loaded from one database file do not describe the rows of another
+DB.resets.append(Painting.all.clear)
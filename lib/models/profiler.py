@@ -0,0 +1,122 @@
+# lib/models/profiler.py
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from . import DB
+
+log = logging.getLogger("models.slow_queries")
+
+StatementStats = namedtuple("StatementStats", ["sql", "callers", "calls", "total", "max", "rows"])
+SlowQuery = namedtuple("SlowQuery", ["sql", "params", "elapsed", "rows", "caller", "plan"])
+
+
+class Profiler:
+  """Counts every statement run through models.DB while started.
+
+  Statistics are kept per distinct SQL text: the calls, total and slowest time, rows returned and
+  the finders that issued it. Statements taking at least slow_ms milliseconds are also written to
+  the models.slow_queries logger and kept in slow, with their EXPLAIN QUERY PLAN when explain is set.
+  Several profilers can run at once, each with its own counters."""
+
+  def __init__(self, slow_ms=None, explain=False, max_slow=100):
+    self.slow_ms = slow_ms
+    self.explain = explain
+    self.max_slow = max_slow
+    self.slow = []
+    self._statements = {}
+    self._lock = threading.Lock()
+
+  def start(self):
+    if self.record not in DB.listeners:
+      DB.listeners.append(self.record)
+    return self
+
+  def stop(self):
+    if self.record in DB.listeners:
+      DB.listeners.remove(self.record)
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc):
+    self.stop()
+
+  def record(self, event):
+    with self._lock:
+      entry = self._statements.setdefault(event.sql, [set(), 0, 0.0, 0.0, 0])
+      entry[0].add(event.caller)
+      entry[1] += 1
+      entry[2] += event.elapsed
+      entry[3] = max(entry[3], event.elapsed)
+      entry[4] += max(event.rows, 0)
+    if self.slow_ms is not None and event.elapsed * 1000 >= self.slow_ms:
+      self._slow(event)
+
+  def _slow(self, event):
+    plan = self.query_plan(event) if self.explain else None
+    log.warning("%.1f ms, %d rows, %s: %s %r", event.elapsed * 1000, event.rows, event.caller, event.sql,
+                event.params[:3] if event.many else event.params)
+    if plan:
+      log.warning("query plan:\n%s", "\n".join(plan))
+    with self._lock:
+      if len(self.slow) < self.max_slow:
+        self.slow.append(SlowQuery(event.sql, event.params, event.elapsed, event.rows, event.caller, plan))
+
+  @staticmethod
+  def query_plan(event):
+    """Return the EXPLAIN QUERY PLAN lines for the event's statement, or None if it cannot be explained"""
+    params = (event.params[0] if event.params else ()) if event.many else event.params
+    try:
+      rows = DB.connection.execute(f"EXPLAIN QUERY PLAN {event.sql}", params).fetchall()
+    except Exception:
+      return None
+    return [detail for _, _, _, detail in rows]
+
+  def statements(self):
+    """Return a StatementStats per distinct statement, most total time first"""
+    with self._lock:
+      stats = [
+        StatementStats(sql, sorted(caller or "?" for caller in callers), calls, total, longest, rows)
+        for sql, (callers, calls, total, longest, rows) in self._statements.items()
+      ]
+    return sorted(stats, key=lambda stat: stat.total, reverse=True)
+
+  def stats(self):
+    """Return the totals: statements run, distinct statements, seconds spent, rows and slow statements"""
+    statements = self.statements()
+    return {
+      "calls": sum(stat.calls for stat in statements),
+      "statements": len(statements),
+      "seconds": sum(stat.total for stat in statements),
+      "rows": sum(stat.rows for stat in statements),
+      "slow": len(self.slow),
+    }
+
+  def reset(self):
+    with self._lock:
+      self._statements.clear()
+      self.slow.clear()
+
+  def report(self, limit=10):
+    """Return a printable summary of the totals and the limit most expensive statements"""
+    totals = self.stats()
+    lines = [
+      f"{totals['calls']} queries ({totals['statements']} distinct), {totals['seconds'] * 1000:.1f} ms, "
+      f"{totals['rows']} rows, {totals['slow']} slow",
+    ]
+    for stat in self.statements()[:limit]:
+      lines.append(
+        f"{stat.total * 1000:9.2f} ms {stat.calls:6} calls {stat.max * 1000:8.2f} ms max {stat.rows:8} rows  "
+        f"{', '.join(stat.callers)}"
+      )
+      lines.append(f"    {stat.sql[:120]}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile(slow_ms=None, explain=False):
+  """Profile the statements run inside the block and yield the Profiler"""
+  profiler = Profiler(slow_ms, explain)
+  with profiler:
+    yield profiler
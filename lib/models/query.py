@@ -0,0 +1,191 @@
+# lib/models/query.py
+import sys
+from . import DB
+from .museum import Museum, MuseumRow
+from .painting import Painting, PaintingRow
+from .query_cache import QUERY_CACHE
+
+# Filterable columns of each model, by the name used in where(), between(), prefix() and order_by().
+# Painting queries always join the painting's artist and museum, so they can filter on the artist's name and
+# the museum's name and location too.
+COLUMNS = {
+  "museums": {
+    "id": "museums.id",
+    "name": "museums.name",
+    "location": "museums.location",
+  },
+  "paintings": {
+    "id": "paintings.id",
+    "title": "paintings.title",
+    "artist": "artists.name",
+    "artist_id": "paintings.artist_id",
+    "year": "paintings.year",
+    "museum_id": "paintings.museum_id",
+    "museum_name": "museums.name",
+    "museum_location": "museums.location",
+  },
+}
+FROM = {
+  "museums": "museums",
+  "paintings": """paintings
+    JOIN artists ON artists.id = paintings.artist_id
+    JOIN museums ON museums.id = paintings.museum_id""",
+}
+# Tables each query reads, for query cache invalidation
+TABLES = {
+  "museums": ("museums",),
+  "paintings": Painting.TABLES,
+}
+
+
+class Query:
+  """A chainable query over Museum or Painting rows, compiled to a single parameterized statement.
+
+  Each method returns a new Query, so a partial query can be reused:
+    monet = Painting.query().where(artist="Claude Monet")
+    monet.between("year", 1870, 1890).prefix("museum_location", "Paris").order_by("year").all()
+  Conditions are ANDed together. Results go through the query cache and the identity map like the finders."""
+
+  def __init__(self, model):
+    self.model = model
+    self._columns = COLUMNS[model.TABLE]
+    self._tables = TABLES[model.TABLE]
+    self._conditions = []
+    self._params = []
+    self._order = []
+    self._limit = None
+    self._museum_id = None
+
+  def _copy(self):
+    query = Query(self.model)
+    query._conditions = list(self._conditions)
+    query._params = list(self._params)
+    query._order = list(self._order)
+    query._limit = self._limit
+    query._museum_id = self._museum_id
+    return query
+
+  def _column(self, field):
+    column = self._columns.get(field)
+    if column is None:
+      raise ValueError(f"{self.model.__name__} has no field {field!r}; use one of {', '.join(self._columns)}")
+    return column
+
+  def where(self, **fields):
+    """Keep rows whose fields equal the given values; a list, tuple or set of values matches any of them (IN)"""
+    query = self._copy()
+    for field, value in fields.items():
+      column = query._column(field)
+      if isinstance(value, (list, tuple, set, frozenset)):
+        values = list(value)
+        if values:
+          query._conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+          query._params.extend(values)
+        else:
+          query._conditions.append("0")
+      else:
+        query._conditions.append(f"{column} = ?")
+        query._params.append(value)
+        if column == "paintings.museum_id":
+          query._museum_id = value
+    return query
+
+  def between(self, field, start=None, end=None):
+    """Keep rows whose field is from start to end inclusive; either bound may be None"""
+    query = self._copy()
+    column = query._column(field)
+    if start is not None:
+      query._conditions.append(f"{column} >= ?")
+      query._params.append(start)
+    if end is not None:
+      query._conditions.append(f"{column} <= ?")
+      query._params.append(end)
+    return query
+
+  def prefix(self, field, text):
+    """Keep rows whose field starts with text (case-sensitive).
+    Compiled to a range comparison rather than LIKE, so the column's index can be used."""
+    query = self._copy()
+    column = query._column(field)
+    if not text:
+      return query
+    # The smallest string above every string starting with text: drop any trailing U+10FFFF, which has
+    # no successor, and bump the last character left. With none left there is no upper bound.
+    stem = text.rstrip(chr(sys.maxunicode))
+    if not stem:
+      query._conditions.append(f"{column} >= ?")
+      query._params.append(text)
+      return query
+    following = ord(stem[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+      # Surrogates cannot be stored, and no stored string contains one
+      following = 0xE000
+    query._conditions.append(f"{column} >= ? AND {column} < ?")
+    query._params.extend([text, stem[:-1] + chr(following)])
+    return query
+
+  def order_by(self, *fields):
+    """Sort by the given fields, each descending if prefixed with '-'; replaces any earlier ordering"""
+    query = self._copy()
+    query._order = [
+      f"{query._column(field[1:])} DESC" if field.startswith("-") else query._column(field)
+      for field in fields
+    ]
+    return query
+
+  def limit(self, count):
+    """Return at most count rows"""
+    if not isinstance(count, int) or count < 0:
+      raise ValueError("limit must be a non-negative integer")
+    query = self._copy()
+    query._limit = count
+    return query
+
+  def _where(self):
+    return f" WHERE {' AND '.join(self._conditions)}" if self._conditions else ""
+
+  def sql(self):
+    """Return the (sql, params) the query runs"""
+    if self.model.TABLE == "paintings":
+      sql = self.model.SELECT_SQL
+    else:
+      sql = f"SELECT {', '.join(self._columns.values())} FROM {FROM[self.model.TABLE]}"
+    sql += self._where()
+    if self._order:
+      sql += f" ORDER BY {', '.join(self._order)}"
+    params = list(self._params)
+    if self._limit is not None:
+      sql += " LIMIT ?"
+      params.append(self._limit)
+    return sql, tuple(params)
+
+  def all(self, as_rows=False, cache=True):
+    """Return the matching objects, or their MuseumRow / PaintingRow projections with as_rows=True.
+    cache=False always queries and keeps the rows out of the query cache, for scans."""
+    sql, params = self.sql()
+    rows = QUERY_CACHE.fetchall(sql, params, tables=self._tables, museum_id=self._museum_id, cache=cache)
+    if self.model is Painting:
+      return [PaintingRow._make(row) for row in rows] if as_rows else Painting.instances_from_db(rows)
+    return [MuseumRow._make(row) for row in rows] if as_rows else [Museum.instance_from_db(row) for row in rows]
+
+  def first(self, as_rows=False):
+    """Return the first matching object (or row), or None"""
+    results = self.limit(1).all(as_rows)
+    return results[0] if results else None
+
+  def count(self):
+    """Return the number of matching rows, counted by the database"""
+    sql = f"SELECT COUNT(*) FROM {FROM[self.model.TABLE]}{self._where()}"
+    params = tuple(self._params)
+    if self._limit is not None:
+      sql = f"SELECT MIN(COUNT(*), ?) FROM {FROM[self.model.TABLE]}{self._where()}"
+      params = (self._limit,) + params
+    return QUERY_CACHE.fetchone(sql, params, tables=self._tables, museum_id=self._museum_id)[0]
+
+  def explain(self):
+    """Return the lines of SQLite's EXPLAIN QUERY PLAN for the query, showing the indexes it uses"""
+    sql, params = self.sql()
+    return [row[3] for row in DB.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+  def __iter__(self):
+    return iter(self.all())
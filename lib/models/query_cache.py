@@ -0,0 +1,113 @@
+# lib/models/query_cache.py
+import threading
+import time
+from collections import OrderedDict
+from . import DB
+from .statements import STATEMENTS
+
+
+class QueryCache:
+  """Read-through cache of finder results keyed by SQL and parameters.
+
+  Each entry records the tables it reads and, for per-museum queries, the museum id,
+  so a write only invalidates the results it can have changed. maxsize bounds the
+  number of entries (least recently used are evicted first, 0 disables caching) and
+  ttl, in seconds, optionally expires entries that have not been invalidated."""
+
+  def __init__(self, maxsize=256, ttl=None):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    # Bumped by every invalidation, so a query that raced with a write is not cached
+    self._generation = 0
+    self._lock = threading.RLock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.invalidations = 0
+
+  def configure(self, maxsize=None, ttl=None):
+    """Change the size and/or time limits, dropping entries beyond the new maxsize"""
+    with self._lock:
+      if maxsize is not None:
+        self.maxsize = maxsize
+      if ttl is not None:
+        self.ttl = ttl or None
+      self._evict()
+
+  def _evict(self):
+    while len(self._entries) > self.maxsize:
+      self._entries.popitem(last=False)
+      self.evictions += 1
+
+  def _fetch(self, sql, params, tables, museum_id, one, cache=True):
+    sql = STATEMENTS.normalize(sql)
+    key = (sql, params, one)
+    if not cache:
+      cursor = DB.execute(sql, params)
+      return cursor.fetchone() if one else cursor.fetchall()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry and (entry[0] is None or entry[0] > time.monotonic()):
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+      self.misses += 1
+      generation = self._generation
+
+    cursor = DB.execute(sql, params)
+    result = cursor.fetchone() if one else tuple(cursor.fetchall())
+    # Rows read inside a transaction may be rolled back, so they are not cached
+    with self._lock:
+      if self.maxsize and generation == self._generation and not DB.in_transaction:
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (expires, result, frozenset(tables), museum_id)
+        self._entries.move_to_end(key)
+        self._evict()
+    return result
+
+  def fetchall(self, sql, params=(), tables=(), museum_id=None, cache=True):
+    """Return every row for the query, from the cache when possible.
+    cache=False always queries and keeps the result out of the cache, for one-off scans."""
+    return self._fetch(sql, params, tables, museum_id, False, cache)
+
+  def fetchone(self, sql, params=(), tables=(), museum_id=None):
+    """Return the first row for the query, or None, from the cache when possible"""
+    return self._fetch(sql, params, tables, museum_id, True)
+
+  def invalidate(self, table, museum_id=None):
+    """Drop cached results that read table. When museum_id is given, per-museum results
+    for other museums are kept."""
+    with self._lock:
+      self._generation += 1
+      stale = [
+        key for key, (_, _, tables, entry_museum_id) in self._entries.items()
+        if table in tables and (museum_id is None or entry_museum_id is None or entry_museum_id == museum_id)
+      ]
+      for key in stale:
+        del self._entries[key]
+      self.invalidations += len(stale)
+
+  def clear(self):
+    """Drop every cached result; counters are kept"""
+    with self._lock:
+      self._generation += 1
+      self._entries.clear()
+
+  def stats(self):
+    """Return the cache's size, limits and counters"""
+    return {
+      "size": len(self._entries),
+      "maxsize": self.maxsize,
+      "ttl": self.ttl,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "invalidations": self.invalidations,
+    }
+
+
+# Shared by the Museum and Painting finders
+QUERY_CACHE = QueryCache()
+# Results cached from one database file are not valid for another
+DB.resets.append(QUERY_CACHE.clear)
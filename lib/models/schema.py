@@ -0,0 +1,309 @@
+# lib/models/schema.py
+from . import DB
+
+# Secondary indexes backing the finders, by table
+INDEXES = {
+  "museums": [
+    "CREATE INDEX IF NOT EXISTS idx_museums_name ON museums (name)",
+    "CREATE INDEX IF NOT EXISTS idx_museums_location ON museums (location)",
+  ],
+  "paintings": [
+    "CREATE INDEX IF NOT EXISTS idx_paintings_museum_id ON paintings (museum_id)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_artist_id ON paintings (artist_id)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_year ON paintings (year)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_title ON paintings (title)",
+  ],
+}
+
+# Full-text search tables, kept in sync with their source tables by triggers so every write path,
+# including bulk inserts and cascading deletes, updates the index. The paintings index also carries
+# the museum's name, so a search for a museum finds its paintings.
+SEARCH = {
+  "museums": [
+    """
+      CREATE VIRTUAL TABLE IF NOT EXISTS museums_fts USING fts5 (
+      name, location,
+      tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')
+    """,
+    """
+      INSERT INTO museums_fts (rowid, name, location)
+      SELECT id, name, location
+      FROM museums
+      WHERE id NOT IN (SELECT rowid FROM museums_fts)
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_fts_insert AFTER INSERT ON museums BEGIN
+        INSERT INTO museums_fts (rowid, name, location) VALUES (new.id, new.name, new.location);
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_fts_update AFTER UPDATE OF name, location ON museums BEGIN
+        UPDATE museums_fts SET name = new.name, location = new.location WHERE rowid = new.id;
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_fts_delete AFTER DELETE ON museums BEGIN
+        DELETE FROM museums_fts WHERE rowid = old.id;
+      END
+    """,
+  ],
+  "paintings": [
+    """
+      CREATE VIRTUAL TABLE IF NOT EXISTS paintings_fts USING fts5 (
+      title, artist, museum,
+      tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')
+    """,
+    """
+      INSERT INTO paintings_fts (rowid, title, artist, museum)
+      SELECT paintings.id, paintings.title, artists.name, museums.name
+      FROM paintings
+      JOIN artists ON artists.id = paintings.artist_id
+      JOIN museums ON museums.id = paintings.museum_id
+      WHERE paintings.id NOT IN (SELECT rowid FROM paintings_fts)
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_insert AFTER INSERT ON paintings BEGIN
+        INSERT INTO paintings_fts (rowid, title, artist, museum)
+        VALUES (new.id, new.title, (SELECT name FROM artists WHERE id = new.artist_id),
+                (SELECT name FROM museums WHERE id = new.museum_id));
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_update AFTER UPDATE OF title, artist_id, museum_id ON paintings BEGIN
+        UPDATE paintings_fts
+        SET title = new.title, artist = (SELECT name FROM artists WHERE id = new.artist_id),
+            museum = (SELECT name FROM museums WHERE id = new.museum_id)
+        WHERE rowid = new.id;
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_delete AFTER DELETE ON paintings BEGIN
+        DELETE FROM paintings_fts WHERE rowid = old.id;
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_museum_update AFTER UPDATE OF name ON museums BEGIN
+        UPDATE paintings_fts SET museum = new.name
+        WHERE rowid IN (SELECT id FROM paintings WHERE museum_id = new.id);
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_artist_update AFTER UPDATE OF name ON artists BEGIN
+        UPDATE paintings_fts SET artist = new.name
+        WHERE rowid IN (SELECT id FROM paintings WHERE artist_id = new.id);
+      END
+    """,
+  ],
+}
+
+# Change feed: triggers append a row to changes for every insert, update and delete, whatever the write
+# path (save, bulk_create, batched updates, cascading deletes). AUTOINCREMENT keeps seq increasing even
+# after compaction removes the newest rows. Updates that leave every column unchanged are not recorded.
+CHANGES_TABLE = [
+  """
+    CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    operation TEXT NOT NULL)
+  """,
+  "CREATE INDEX IF NOT EXISTS idx_changes_row ON changes (table_name, row_id, seq)",
+]
+CHANGES = {
+  "museums": CHANGES_TABLE + [
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_changes_insert AFTER INSERT ON museums BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('museums', new.id, 'insert');
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_changes_update AFTER UPDATE ON museums
+      WHEN old.name IS NOT new.name OR old.location IS NOT new.location BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('museums', new.id, 'update');
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS museums_changes_delete AFTER DELETE ON museums BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('museums', old.id, 'delete');
+      END
+    """,
+  ],
+  "paintings": CHANGES_TABLE + [
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_changes_insert AFTER INSERT ON paintings BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('paintings', new.id, 'insert');
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_changes_update AFTER UPDATE ON paintings
+      WHEN old.title IS NOT new.title OR old.artist_id IS NOT new.artist_id OR old.year IS NOT new.year
+        OR old.museum_id IS NOT new.museum_id BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('paintings', new.id, 'update');
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_changes_delete AFTER DELETE ON paintings BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('paintings', old.id, 'delete');
+      END
+    """,
+    # Renaming an artist changes the artist of each of their paintings
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_changes_artist_update AFTER UPDATE OF name ON artists
+      WHEN old.name IS NOT new.name BEGIN
+        INSERT INTO changes (table_name, row_id, operation)
+        SELECT 'paintings', id, 'update' FROM paintings WHERE artist_id = new.id;
+      END
+    """,
+  ],
+}
+
+# The paintings table before artists were moved to their own table (schema version 4). Migrations 2 to 4
+# create these, and migration 5 replaces them with the definitions above.
+LEGACY_PAINTINGS = {
+  "indexes": [
+    "CREATE INDEX IF NOT EXISTS idx_paintings_museum_id ON paintings (museum_id)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_artist ON paintings (artist)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_year ON paintings (year)",
+    "CREATE INDEX IF NOT EXISTS idx_paintings_title ON paintings (title)",
+  ],
+  "search": [
+    SEARCH["paintings"][0],
+    """
+      INSERT INTO paintings_fts (rowid, title, artist, museum)
+      SELECT paintings.id, paintings.title, paintings.artist, museums.name
+      FROM paintings
+      JOIN museums ON museums.id = paintings.museum_id
+      WHERE paintings.id NOT IN (SELECT rowid FROM paintings_fts)
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_insert AFTER INSERT ON paintings BEGIN
+        INSERT INTO paintings_fts (rowid, title, artist, museum)
+        VALUES (new.id, new.title, new.artist, (SELECT name FROM museums WHERE id = new.museum_id));
+      END
+    """,
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_fts_update AFTER UPDATE OF title, artist, museum_id ON paintings BEGIN
+        UPDATE paintings_fts
+        SET title = new.title, artist = new.artist,
+            museum = (SELECT name FROM museums WHERE id = new.museum_id)
+        WHERE rowid = new.id;
+      END
+    """,
+    SEARCH["paintings"][4],
+    SEARCH["paintings"][5],
+  ],
+  "changes": [
+    CHANGES["paintings"][len(CHANGES_TABLE)],
+    """
+      CREATE TRIGGER IF NOT EXISTS paintings_changes_update AFTER UPDATE ON paintings
+      WHEN old.title IS NOT new.title OR old.artist IS NOT new.artist OR old.year IS NOT new.year
+        OR old.museum_id IS NOT new.museum_id BEGIN
+        INSERT INTO changes (table_name, row_id, operation) VALUES ('paintings', new.id, 'update');
+      END
+    """,
+    CHANGES["paintings"][len(CHANGES_TABLE) + 2],
+  ],
+}
+
+# Artist names, stored once and referenced from paintings.artist_id. The UNIQUE constraint's index
+# serves find_by_name and the name lookups made when paintings are saved.
+ARTISTS = [
+  """
+    CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE)
+  """,
+]
+
+# Schema migrations in order. The database's PRAGMA user_version records how many have been applied,
+# so MIGRATIONS[n] upgrades a database from version n to version n + 1.
+MIGRATIONS = [
+  # 1: the original tables, with the artist's name stored in each paintings row
+  [
+    """
+      CREATE TABLE IF NOT EXISTS museums (
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      location TEXT NOT NULL)
+    """,
+    """
+      CREATE TABLE IF NOT EXISTS paintings (
+      id INTEGER PRIMARY KEY,
+      title TEXT NOT NULL,
+      artist TEXT NOT NULL,
+      year INTEGER NOT NULL,
+      museum_id INTEGER NOT NULL,
+      FOREIGN KEY (museum_id) REFERENCES museums(id))
+    """,
+  ],
+  # 2: secondary indexes for find_by_name, find_by_location, find_by_museum, find_by_artist,
+  # find_by_year and find_by_title
+  INDEXES["museums"] + LEGACY_PAINTINGS["indexes"],
+  # 3: FTS5 search over painting titles, artists and museum names, for Painting.search and Museum.search
+  LEGACY_PAINTINGS["search"] + SEARCH["museums"],
+  # 4: the changes table and its triggers, for models.changes
+  CHANGES["museums"] + CHANGES_TABLE + LEGACY_PAINTINGS["changes"],
+  # 5: move artist names to the artists table. Each distinct name is inserted once, then paintings is
+  # rebuilt with an artist_id column in a single INSERT ... SELECT, keeping every painting's id, and
+  # its indexes and triggers are recreated. The optional stats summaries count by artist name, so they
+  # are dropped; call stats.enable_summaries() again to rebuild them.
+  ARTISTS + [
+    "INSERT OR IGNORE INTO artists (name) SELECT DISTINCT artist FROM paintings ORDER BY artist",
+    "DROP TRIGGER IF EXISTS paintings_fts_museum_update",
+    "DROP TRIGGER IF EXISTS stats_paintings_insert",
+    "DROP TRIGGER IF EXISTS stats_paintings_delete",
+    "DROP TRIGGER IF EXISTS stats_paintings_update",
+    "DROP TABLE IF EXISTS museum_painting_counts",
+    "DROP TABLE IF EXISTS artist_painting_counts",
+    "DROP TABLE IF EXISTS decade_painting_counts",
+    """
+      CREATE TABLE paintings_new (
+      id INTEGER PRIMARY KEY,
+      title TEXT NOT NULL,
+      artist_id INTEGER NOT NULL,
+      year INTEGER NOT NULL,
+      museum_id INTEGER NOT NULL,
+      FOREIGN KEY (artist_id) REFERENCES artists(id),
+      FOREIGN KEY (museum_id) REFERENCES museums(id))
+    """,
+    """
+      INSERT INTO paintings_new (id, title, artist_id, year, museum_id)
+      SELECT paintings.id, paintings.title, artists.id, paintings.year, paintings.museum_id
+      FROM paintings
+      JOIN artists ON artists.name = paintings.artist
+    """,
+    "DROP TABLE paintings",
+    "ALTER TABLE paintings_new RENAME TO paintings",
+  ] + INDEXES["paintings"] + SEARCH["paintings"] + CHANGES["paintings"],
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn=None):
+  """Return the number of migrations applied to the database"""
+  conn = conn or DB.connection
+  return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn=None, target=LATEST_VERSION):
+  """Apply each pending migration up to target in its own transaction, bumping PRAGMA user_version as it goes.
+  Return the resulting schema version."""
+  conn = conn or DB.connection
+  version = schema_version(conn)
+  if version == 0 and "artist_id" in {row[1] for row in conn.execute("PRAGMA table_info(paintings)")}:
+    # Created at the latest schema by Painting.create_table() without recording the version
+    conn.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+    version = LATEST_VERSION
+  while version < target:
+    try:
+      conn.execute("BEGIN")
+      for sql in MIGRATIONS[version]:
+        conn.execute(sql)
+      version += 1
+      conn.execute(f"PRAGMA user_version = {version}")
+      conn.commit()
+    except Exception:
+      conn.rollback()
+      raise
+  return version
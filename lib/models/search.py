@@ -0,0 +1,14 @@
+# lib/models/search.py
+import re
+
+# Words are runs of letters and digits; everything else, including FTS5 operators, is ignored
+WORD = re.compile(r"\w+")
+
+
+def match_expression(query):
+  """Turn free text typed by a user into an FTS5 MATCH expression where every word must match
+  as a prefix, so 'water lil' finds 'Water Lilies'. Return None if the query has no words."""
+  words = WORD.findall(query or "")
+  if not words:
+    return None
+  return " ".join(f'"{word}"*' for word in words)
@@ -0,0 +1,146 @@
+# lib/models/session.py
+import threading
+from contextlib import contextmanager
+from . import DB
+
+_local = threading.local()
+
+
+class Session:
+  """Work done by the model layer inside an open transaction().
+
+  Inserts and deletes run immediately but are not committed. Updates are deferred and
+  flushed as one executemany per model class, either before the thread's next statement or
+  when the transaction ends. Objects are snapshotted the first time they change so a rollback can
+  restore their attributes, ids and identity map entries."""
+
+  def __init__(self):
+    self.depth = 0
+    self.new = []
+    self.deleted = []
+    self.snapshots = {}
+    self.pending = {}
+    self.tables = set()
+
+  def added(self, obj):
+    """Record an object inserted during the transaction"""
+    self.new.append(obj)
+    self.tables.add(obj.TABLE)
+
+  def removed(self, obj, row_id):
+    """Record an object whose row, with primary key row_id, was deleted during the transaction"""
+    self.deleted.append((obj, row_id))
+    self.pending.pop(id(obj), None)
+    self.tables.add(obj.TABLE)
+
+  def changing(self, obj):
+    """Snapshot obj before its attributes are changed, the first time it changes in the transaction"""
+    key = id(obj)
+    if key not in self.snapshots:
+      self.snapshots[key] = (obj, {field: getattr(obj, field) for field in obj.FIELDS})
+
+  def changed(self, obj):
+    """Queue an UPDATE of obj's row for the next flush"""
+    if not self.pending:
+      DB.defer(self.flush)
+    self.pending[id(obj)] = obj
+    self.tables.add(obj.TABLE)
+
+  def flush(self):
+    """Write queued updates, one executemany per model class, without committing"""
+    if not self.pending:
+      return
+    batches = {}
+    for obj in self.pending.values():
+      batches.setdefault(type(obj), []).append(obj.update_values())
+    self.pending.clear()
+    for cls, rows in batches.items():
+      DB.executemany(cls.UPDATE_SQL, rows)
+
+  def rollback(self):
+    """Restore the objects touched in the transaction to their state before it began"""
+    self.pending.clear()
+    for obj, row_id in self.deleted:
+      obj.id = row_id
+      type(obj).all[row_id] = obj
+    for obj in self.new:
+      if obj.id is not None:
+        type(obj).all.pop(obj.id, None)
+        obj.id = None
+    for obj, snapshot in self.snapshots.values():
+      for field, value in snapshot.items():
+        setattr(obj, field, value)
+
+
+def current_session():
+  """Return the calling thread's open Session, or None outside a transaction()"""
+  return getattr(_local, "session", None)
+
+
+def autocommit():
+  """Commit the calling thread's connection, unless a transaction() will commit it later"""
+  if current_session() is None:
+    DB.commit()
+
+
+def inserted(obj):
+  """Called after obj's row is inserted: commit, or leave it to the open transaction()"""
+  session = current_session()
+  if session is None:
+    DB.commit()
+  else:
+    session.added(obj)
+
+
+def deleted(obj, row_id):
+  """Called after obj's row is deleted: commit, or leave it to the open transaction()"""
+  session = current_session()
+  if session is None:
+    DB.commit()
+  else:
+    session.removed(obj, row_id)
+
+
+def autorollback():
+  """Roll back the calling thread's connection, unless a transaction() will roll it back as a whole"""
+  if current_session() is None:
+    DB.rollback()
+
+
+@contextmanager
+def transaction():
+  """Group model writes into one database transaction, committed when the block exits.
+  Nested blocks join the outermost one. If the block raises, everything is rolled back,
+  objects get their previous attributes, ids and identity map entries back, and the
+  exception propagates."""
+  from .query_cache import QUERY_CACHE
+
+  outer = current_session()
+  if outer is not None:
+    outer.depth += 1
+    try:
+      yield outer
+    finally:
+      outer.depth -= 1
+    return
+
+  work = _local.session = Session()
+  try:
+    DB.begin()
+    yield work
+    work.flush()
+    DB.commit()
+  except BaseException:
+    DB.rollback()
+    work.rollback()
+    QUERY_CACHE.clear()
+    raise
+  finally:
+    _local.session = None
+  # Other threads may have cached rows from before the commit
+  for table in work.tables:
+    QUERY_CACHE.invalidate(table)
+
+
+# `with session():` reads better in code that thinks in terms of a unit of work
+session = transaction
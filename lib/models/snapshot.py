@@ -0,0 +1,266 @@
+# lib/models/snapshot.py
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from . import DB
+from .museum import MuseumRow
+from .painting import PaintingRow
+
+# A snapshot file is MAGIC, a little header giving the length of a JSON directory, the directory, and
+# then one section per column, each aligned to 8 bytes. The directory maps a section name to its offset,
+# array typecode and item count, so the loader can map every column in place without reading it.
+#
+# Paintings are stored sorted by museum, so a museum's paintings are one contiguous slice. Strings live
+# in tables of UTF-8 text with an offsets array; the columns hold indexes into them, so an artist's
+# name is stored once however many paintings it has. The artist table is sorted, which lets the loader
+# find an artist by binary search, and two permutations (by artist, by year) index the paintings.
+MAGIC = b"MUSEUMS-SNAPSHOT"
+VERSION = 1
+HEADER = struct.Struct("<16sII")
+ALIGNMENT = 8
+
+ID = "q"
+INDEX = "I"
+YEAR = "i"
+
+
+def _string_table(values):
+  """Return (offsets, blob) for a list of strings; string i is blob[offsets[i]:offsets[i + 1]]"""
+  offsets = array(INDEX, [0])
+  parts = []
+  size = 0
+  for value in values:
+    encoded = value.encode()
+    parts.append(encoded)
+    size += len(encoded)
+    offsets.append(size)
+  return offsets, b"".join(parts)
+
+
+def _interned(values):
+  """Return (table, indexes) where table lists each distinct value once and indexes[i] is values[i]'s position"""
+  positions = {}
+  indexes = array(INDEX, (positions.setdefault(value, len(positions)) for value in values))
+  return list(positions), indexes
+
+
+def export_snapshot(path):
+  """Write every museum and painting to a columnar snapshot file at path.
+  Return a (museum count, painting count) tuple."""
+  # Both reads see the same committed state, so no painting can name a museum missing from the first
+  started = not DB.in_transaction
+  DB.begin("DEFERRED")
+  try:
+    museums = DB.execute("SELECT id, name, location FROM museums ORDER BY id").fetchall()
+    # A painting whose museum row was deleted outside the models has nowhere to go in a snapshot
+    paintings = DB.execute("""
+      SELECT paintings.id, paintings.title, artists.name, paintings.year, paintings.museum_id
+      FROM paintings
+      JOIN artists ON artists.id = paintings.artist_id
+      JOIN museums ON museums.id = paintings.museum_id
+      ORDER BY paintings.museum_id, paintings.id
+    """).fetchall()
+  finally:
+    if started:
+      DB.commit()
+
+  museum_ids = array(ID, (row[0] for row in museums))
+  names, name_index = _interned([row[1] for row in museums])
+  locations, location_index = _interned([row[2] for row in museums])
+
+  position = {museum_id: i for i, museum_id in enumerate(museum_ids)}
+  # paintings_start[i]:paintings_start[i + 1] is the slice of paintings belonging to museum i
+  paintings_start = array(INDEX, [0] * (len(museums) + 1))
+  for row in paintings:
+    paintings_start[position[row[4]] + 1] += 1
+  for i in range(len(museums)):
+    paintings_start[i + 1] += paintings_start[i]
+
+  titles, title_index = _interned([row[1] for row in paintings])
+  artists = sorted({row[2] for row in paintings})
+  artist_position = {artist: i for i, artist in enumerate(artists)}
+  artist_index = array(INDEX, (artist_position[row[2]] for row in paintings))
+  years = array(YEAR, (row[3] for row in paintings))
+  painting_museum = array(INDEX, (position[row[4]] for row in paintings))
+
+  by_artist = array(INDEX, sorted(range(len(paintings)), key=artist_index.__getitem__))
+  # artist_start[a]:artist_start[a + 1] is the slice of by_artist holding artist a's paintings
+  artist_start = array(INDEX, [0] * (len(artists) + 1))
+  for index in artist_index:
+    artist_start[index + 1] += 1
+  for i in range(len(artists)):
+    artist_start[i + 1] += artist_start[i]
+  by_year = array(INDEX, sorted(range(len(paintings)), key=years.__getitem__))
+  sorted_years = array(YEAR, (years[i] for i in by_year))
+
+  sections = {
+    "museum_ids": museum_ids,
+    "museum_name": name_index,
+    "museum_location": location_index,
+    "paintings_start": paintings_start,
+    "painting_ids": array(ID, (row[0] for row in paintings)),
+    "painting_title": title_index,
+    "painting_artist": artist_index,
+    "painting_year": years,
+    "painting_museum": painting_museum,
+    "by_artist": by_artist,
+    "artist_start": artist_start,
+    "by_year": by_year,
+    "sorted_years": sorted_years,
+  }
+  for name, values in (("names", names), ("locations", locations), ("titles", titles), ("artists", artists)):
+    offsets, blob = _string_table(values)
+    sections[f"{name}_offsets"] = offsets
+    sections[f"{name}_text"] = blob
+
+  # Section offsets are relative to the first aligned byte after the directory
+  directory = {"version": VERSION, "byteorder": sys.byteorder, "sections": {}}
+  offset = 0
+  for name, data in sections.items():
+    typecode = data.typecode if isinstance(data, array) else "B"
+    directory["sections"][name] = [offset, typecode, len(data)]
+    offset += -(-_nbytes(data) // ALIGNMENT) * ALIGNMENT
+  encoded = json.dumps(directory).encode()
+  start = -(-(HEADER.size + len(encoded)) // ALIGNMENT) * ALIGNMENT
+
+  with open(path, "wb") as file:
+    file.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+    file.write(encoded)
+    file.write(b"\0" * (start - HEADER.size - len(encoded)))
+    for data in sections.values():
+      raw = data.tobytes() if isinstance(data, array) else data
+      file.write(raw)
+      file.write(b"\0" * (-len(raw) % ALIGNMENT))
+  return len(museums), len(paintings)
+
+
+def _nbytes(data):
+  return len(data) * data.itemsize if isinstance(data, array) else len(data)
+
+
+class Snapshot:
+  """A read-only, memory-mapped view of a snapshot written by export_snapshot.
+
+  Opening a snapshot maps the file and reads only its directory; each finder touches just the pages
+  it needs, so answering a query does not deserialize the file. Results are MuseumRow and PaintingRow
+  named tuples, the same projections the models return with as_rows=True."""
+
+  def __init__(self, path):
+    with open(path, "rb") as file:
+      self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, length = HEADER.unpack_from(self._mmap)
+    if magic != MAGIC or version != VERSION:
+      self._mmap.close()
+      raise ValueError(f"{path} is not a version {VERSION} catalogue snapshot")
+    directory = json.loads(self._mmap[HEADER.size:HEADER.size + length])
+    if directory["byteorder"] != sys.byteorder:
+      self._mmap.close()
+      raise ValueError(f"{path} was written on a {directory['byteorder']}-endian machine")
+    start = -(-(HEADER.size + length) // ALIGNMENT) * ALIGNMENT
+    self._view = memoryview(self._mmap)
+    for name, (offset, typecode, count) in directory["sections"].items():
+      size = count * array(typecode).itemsize
+      section = self._view[start + offset:start + offset + size]
+      setattr(self, f"_{name}", section.cast(typecode) if typecode != "B" else section)
+    # Decoded strings by table and index, so each distinct value is decoded once
+    self._tables = {
+      name: (getattr(self, f"_{name}_offsets"), getattr(self, f"_{name}_text"), {})
+      for name in ("names", "locations", "titles", "artists")
+    }
+
+  def close(self):
+    """Release the memory map; rows already returned stay valid"""
+    for value in list(vars(self).values()):
+      if isinstance(value, memoryview) and value is not self._view:
+        value.release()
+    self._view.release()
+    self._mmap.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  @property
+  def museum_count(self):
+    return len(self._museum_ids)
+
+  @property
+  def painting_count(self):
+    return len(self._painting_ids)
+
+  def _string(self, table, index):
+    offsets, text, decoded = self._tables[table]
+    value = decoded.get(index)
+    if value is None:
+      value = decoded[index] = sys.intern(str(text[offsets[index]:offsets[index + 1]], "utf-8"))
+    return value
+
+  def _museum_row(self, position):
+    return MuseumRow(
+      self._museum_ids[position],
+      self._string("names", self._museum_name[position]),
+      self._string("locations", self._museum_location[position]),
+    )
+
+  def _painting_rows(self, positions):
+    ids, titles, artists = self._painting_ids, self._painting_title, self._painting_artist
+    years, museums = self._painting_year, self._painting_museum
+    string = self._string
+    museum_rows = {}
+    rows = []
+    for i in positions:
+      museum = museum_rows.get(museums[i])
+      if museum is None:
+        museum = museum_rows[museums[i]] = self._museum_row(museums[i])
+      rows.append(PaintingRow(
+        ids[i], string("titles", titles[i]), string("artists", artists[i]), years[i], *museum,
+      ))
+    return rows
+
+  def _museum_position(self, museum_id):
+    position = bisect_left(self._museum_ids, museum_id)
+    if position < len(self._museum_ids) and self._museum_ids[position] == museum_id:
+      return position
+    return None
+
+  def museums(self):
+    """Return a MuseumRow for every museum, in id order"""
+    return [self._museum_row(position) for position in range(self.museum_count)]
+
+  def find_museum(self, museum_id):
+    """Return the MuseumRow with the given id, or None"""
+    position = self._museum_position(museum_id)
+    return None if position is None else self._museum_row(position)
+
+  def find_by_museum(self, museum_id):
+    """Return a PaintingRow for each painting of the museum, in id order"""
+    position = self._museum_position(museum_id)
+    if position is None:
+      return []
+    start, end = self._paintings_start[position], self._paintings_start[position + 1]
+    return self._painting_rows(range(start, end))
+
+  def find_by_artist(self, artist):
+    """Return a PaintingRow for each painting by the artist, in museum then id order"""
+    low, high = 0, len(self._artists_offsets) - 1
+    while low < high:
+      middle = (low + high) // 2
+      if self._string("artists", middle) < artist:
+        low = middle + 1
+      else:
+        high = middle
+    if low == len(self._artists_offsets) - 1 or self._string("artists", low) != artist:
+      return []
+    start, end = self._artist_start[low], self._artist_start[low + 1]
+    return self._painting_rows(self._by_artist[start:end])
+
+  def find_by_year_range(self, start, end):
+    """Return a PaintingRow for each painting made from year start to year end inclusive, in year order"""
+    low = bisect_left(self._sorted_years, start)
+    high = bisect_right(self._sorted_years, end)
+    return self._painting_rows(self._by_year[low:high])
@@ -0,0 +1,64 @@
+# lib/models/statements.py
+import re
+import threading
+from collections import OrderedDict
+
+# A run of whitespace outside single-quoted string literals
+WHITESPACE = re.compile(r"('(?:[^']|'')*')|\s+")
+
+
+class StatementRegistry:
+  """Canonical SQL text for every statement the model layer runs.
+
+  sqlite3 caches prepared statements per connection, keyed by the exact SQL string. The models
+  write their SQL as indented triple-quoted literals and build some of it by concatenation, so
+  the same statement can reach the connection with different whitespace and take up several
+  cache slots. The registry collapses whitespace once per distinct text, so every caller of a
+  statement shares one cache entry, and it counts the distinct statements so the connection's
+  cached_statements can be sized to hold them all.
+
+  Like the connection's cache, the registry keeps only the maxsize most recently used texts, so
+  SQL built with literal values cannot grow it without bound. DB.configure() keeps maxsize equal
+  to cached_statements."""
+
+  def __init__(self, maxsize=128):
+    self.maxsize = maxsize
+    self._canonical = OrderedDict()
+    self._lock = threading.Lock()
+
+  def normalize(self, sql):
+    """Return the canonical form of sql, registering it the first time it is seen"""
+    canonical = self._canonical.get(sql)
+    if canonical is not None:
+      try:
+        self._canonical.move_to_end(sql)
+      except KeyError:
+        # Evicted by another thread since the lookup; the canonical text is still right
+        pass
+      return canonical
+    canonical = WHITESPACE.sub(lambda match: match.group(1) or " ", sql).strip()
+    with self._lock:
+      canonical = self._canonical.setdefault(sql, canonical)
+      self._evict()
+    return canonical
+
+  def configure(self, maxsize):
+    """Change how many texts are kept, forgetting the least recently used beyond it"""
+    with self._lock:
+      self.maxsize = maxsize
+      self._evict()
+
+  def _evict(self):
+    while len(self._canonical) > self.maxsize:
+      self._canonical.popitem(last=False)
+
+  def statements(self):
+    """Return the distinct canonical statements seen so far"""
+    with self._lock:
+      return sorted(set(self._canonical.values()))
+
+  def __len__(self):
+    return len(self.statements())
+
+
+STATEMENTS = StatementRegistry()
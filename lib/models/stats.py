@@ -0,0 +1,208 @@
+# lib/models/stats.py
+from collections import namedtuple
+from . import DB
+from .query_cache import QUERY_CACHE
+
+MuseumCount = namedtuple("MuseumCount", ["museum_id", "name", "location", "paintings"])
+ArtistCount = namedtuple("ArtistCount", ["artist", "paintings"])
+YearBucket = namedtuple("YearBucket", ["start", "paintings"])
+YearRange = namedtuple("YearRange", ["museum_id", "name", "earliest", "latest", "median"])
+
+BUCKETS = {"decade": 10, "century": 100}
+TABLES = ("paintings", "museums", "artists")
+
+# Optional summary tables holding painting counts per museum, artist and decade. Triggers keep them
+# up to date on every insert, update and delete, so the counting functions read a few rows instead
+# of grouping the whole paintings table.
+SUMMARY_TABLES = ["museum_painting_counts", "artist_painting_counts", "decade_painting_counts"]
+SUMMARY_TRIGGERS = ["stats_paintings_insert", "stats_paintings_delete", "stats_paintings_update"]
+SUMMARY_SQL = [
+  """
+    CREATE TABLE IF NOT EXISTS museum_painting_counts (
+    museum_id INTEGER PRIMARY KEY,
+    paintings INTEGER NOT NULL)
+  """,
+  """
+    CREATE TABLE IF NOT EXISTS artist_painting_counts (
+    artist_id INTEGER PRIMARY KEY,
+    paintings INTEGER NOT NULL)
+  """,
+  """
+    CREATE TABLE IF NOT EXISTS decade_painting_counts (
+    decade INTEGER PRIMARY KEY,
+    paintings INTEGER NOT NULL)
+  """,
+  "DELETE FROM museum_painting_counts",
+  "DELETE FROM artist_painting_counts",
+  "DELETE FROM decade_painting_counts",
+  """
+    INSERT INTO museum_painting_counts (museum_id, paintings)
+    SELECT museum_id, COUNT(*) FROM paintings GROUP BY museum_id
+  """,
+  """
+    INSERT INTO artist_painting_counts (artist_id, paintings)
+    SELECT artist_id, COUNT(*) FROM paintings GROUP BY artist_id
+  """,
+  """
+    INSERT INTO decade_painting_counts (decade, paintings)
+    SELECT year / 10 * 10, COUNT(*) FROM paintings GROUP BY year / 10 * 10
+  """,
+  """
+    CREATE TRIGGER IF NOT EXISTS stats_paintings_insert AFTER INSERT ON paintings BEGIN
+      INSERT INTO museum_painting_counts (museum_id, paintings) VALUES (new.museum_id, 1)
+        ON CONFLICT (museum_id) DO UPDATE SET paintings = paintings + 1;
+      INSERT INTO artist_painting_counts (artist_id, paintings) VALUES (new.artist_id, 1)
+        ON CONFLICT (artist_id) DO UPDATE SET paintings = paintings + 1;
+      INSERT INTO decade_painting_counts (decade, paintings) VALUES (new.year / 10 * 10, 1)
+        ON CONFLICT (decade) DO UPDATE SET paintings = paintings + 1;
+    END
+  """,
+  """
+    CREATE TRIGGER IF NOT EXISTS stats_paintings_delete AFTER DELETE ON paintings BEGIN
+      UPDATE museum_painting_counts SET paintings = paintings - 1 WHERE museum_id = old.museum_id;
+      UPDATE artist_painting_counts SET paintings = paintings - 1 WHERE artist_id = old.artist_id;
+      UPDATE decade_painting_counts SET paintings = paintings - 1 WHERE decade = old.year / 10 * 10;
+    END
+  """,
+  """
+    CREATE TRIGGER IF NOT EXISTS stats_paintings_update AFTER UPDATE OF artist_id, year, museum_id ON paintings BEGIN
+      UPDATE museum_painting_counts SET paintings = paintings - 1 WHERE museum_id = old.museum_id;
+      UPDATE artist_painting_counts SET paintings = paintings - 1 WHERE artist_id = old.artist_id;
+      UPDATE decade_painting_counts SET paintings = paintings - 1 WHERE decade = old.year / 10 * 10;
+      INSERT INTO museum_painting_counts (museum_id, paintings) VALUES (new.museum_id, 1)
+        ON CONFLICT (museum_id) DO UPDATE SET paintings = paintings + 1;
+      INSERT INTO artist_painting_counts (artist_id, paintings) VALUES (new.artist_id, 1)
+        ON CONFLICT (artist_id) DO UPDATE SET paintings = paintings + 1;
+      INSERT INTO decade_painting_counts (decade, paintings) VALUES (new.year / 10 * 10, 1)
+        ON CONFLICT (decade) DO UPDATE SET paintings = paintings + 1;
+    END
+  """,
+]
+
+
+def enable_summaries():
+  """Create (or rebuild) the summary tables and the triggers that maintain them"""
+  try:
+    DB.begin()
+    for sql in SUMMARY_SQL:
+      DB.execute(sql)
+    DB.commit()
+  except Exception:
+    DB.rollback()
+    raise
+  QUERY_CACHE.clear()
+
+
+def disable_summaries():
+  """Drop the summary tables and their triggers; the counting functions go back to grouping paintings"""
+  for trigger in SUMMARY_TRIGGERS:
+    DB.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+  for table in SUMMARY_TABLES:
+    DB.execute(f"DROP TABLE IF EXISTS {table}")
+  DB.commit()
+  QUERY_CACHE.clear()
+
+
+def summaries_enabled():
+  """Return True if the summary tables and triggers are installed"""
+  sql = """
+    SELECT COUNT(*)
+    FROM sqlite_master
+    WHERE type = 'trigger' AND name = ?
+  """
+  return DB.execute(sql, ("stats_paintings_insert",)).fetchone()[0] == 1
+
+
+def _bucket_size(bucket):
+  size = BUCKETS.get(bucket, bucket)
+  if not isinstance(size, int) or size < 1:
+    raise ValueError("bucket must be 'decade', 'century' or a positive number of years")
+  return size
+
+
+def paintings_per_museum(limit=None):
+  """Return a MuseumCount per museum, most paintings first, including museums with none"""
+  if summaries_enabled():
+    sql = """
+      SELECT museums.id, museums.name, museums.location, COALESCE(counts.paintings, 0) AS paintings
+      FROM museums
+      LEFT JOIN museum_painting_counts AS counts ON counts.museum_id = museums.id
+      ORDER BY paintings DESC, museums.id
+      LIMIT ?
+    """
+  else:
+    sql = """
+      SELECT museums.id, museums.name, museums.location, COUNT(paintings.id) AS paintings
+      FROM museums
+      LEFT JOIN paintings ON paintings.museum_id = museums.id
+      GROUP BY museums.id
+      ORDER BY paintings DESC, museums.id
+      LIMIT ?
+    """
+  rows = QUERY_CACHE.fetchall(sql, (-1 if limit is None else limit,), tables=TABLES)
+  return [MuseumCount._make(row) for row in rows]
+
+
+def top_artists(limit=10):
+  """Return an ArtistCount for the limit artists with the most paintings"""
+  if summaries_enabled():
+    sql = """
+      SELECT artists.name, counts.paintings
+      FROM artist_painting_counts AS counts
+      JOIN artists ON artists.id = counts.artist_id
+      WHERE counts.paintings > 0
+      ORDER BY counts.paintings DESC, artists.name
+      LIMIT ?
+    """
+  else:
+    sql = """
+      SELECT artists.name, COUNT(*) AS paintings
+      FROM paintings
+      JOIN artists ON artists.id = paintings.artist_id
+      GROUP BY paintings.artist_id
+      ORDER BY paintings DESC, artists.name
+      LIMIT ?
+    """
+  rows = QUERY_CACHE.fetchall(sql, (limit,), tables=TABLES)
+  return [ArtistCount._make(row) for row in rows]
+
+
+def year_histogram(bucket="decade"):
+  """Return a YearBucket per decade, century or other number of years that has paintings, in year order"""
+  size = _bucket_size(bucket)
+  if size % 10 == 0 and summaries_enabled():
+    sql = """
+      SELECT decade / ? * ? AS start, SUM(paintings)
+      FROM decade_painting_counts
+      WHERE paintings > 0
+      GROUP BY start
+      ORDER BY start
+    """
+  else:
+    sql = """
+      SELECT year / ? * ? AS start, COUNT(*)
+      FROM paintings
+      GROUP BY start
+      ORDER BY start
+    """
+  rows = QUERY_CACHE.fetchall(sql, (size, size), tables=TABLES)
+  return [YearBucket._make(row) for row in rows]
+
+
+def year_range_per_museum():
+  """Return a YearRange with the earliest, latest and median painting year of each museum that has paintings"""
+  sql = """
+    WITH ranked AS (
+      SELECT museum_id, year,
+             ROW_NUMBER() OVER (PARTITION BY museum_id ORDER BY year) AS position,
+             COUNT(*) OVER (PARTITION BY museum_id) AS total
+      FROM paintings)
+    SELECT museums.id, museums.name, MIN(ranked.year), MAX(ranked.year),
+           AVG(CASE WHEN ranked.position IN ((ranked.total + 1) / 2, (ranked.total + 2) / 2) THEN ranked.year END)
+    FROM ranked
+    JOIN museums ON museums.id = ranked.museum_id
+    GROUP BY museums.id
+    ORDER BY museums.id
+  """
+  rows = QUERY_CACHE.fetchall(sql, tables=TABLES)
+  return [YearRange._make(row) for row in rows]
@@ -0,0 +1,413 @@
+# lib/server.py
+"""A JSON HTTP service over the catalogue, built on the standard library's http.server.
+
+Requests are handled on a fixed pool of threads. Each pool thread keeps its own connection from
+models.DB, so concurrent reads run side by side under WAL. Writes take WRITE_LOCK and go through
+models.batch, so they are validated the same way as `cli.py batch` and run one at a time.
+"""
+import json
+import re
+import selectors
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from models.batch import Batch
+from models.museum import Museum
+from models.painting import Painting
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Rows read per query while streaming a whole list
+STREAM_BATCH = 500
+WORKERS = 8
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE = 30
+
+WRITE_LOCK = threading.Lock()
+
+# Query parameters that filter the paintings list, by the Query field they compare
+PAINTING_FILTERS = {"museum_id": "museum_id", "artist": "artist", "title": "title", "location": "museum_location"}
+MUSEUM_FILTERS = {"name": "name", "location": "location"}
+
+
+class HTTPError(Exception):
+    """An error answered with the given status and a {"error": message} body"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def museum_json(museum):
+    """Return the JSON object for a Museum or MuseumRow"""
+    return {"id": museum.id, "name": museum.name, "location": museum.location}
+
+
+def painting_json(painting):
+    """Return the JSON object for a Painting or PaintingRow"""
+    if isinstance(painting, Painting):
+        museum = painting.museum
+        return {
+            "id": painting.id, "title": painting.title, "artist": painting.artist, "year": painting.year,
+            "museum_id": museum.id, "museum_name": museum.name, "museum_location": museum.location,
+        }
+    return painting._asdict()
+
+
+def int_param(params, name, default=None, minimum=0):
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if value < minimum:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be at least {minimum}")
+    return value
+
+
+class CatalogueHandler(BaseHTTPRequestHandler):
+    """Route requests to the catalogue endpoints:
+      GET    /museums, /museums/{id}, /museums/{id}/paintings
+      GET    /paintings, /paintings/{id}
+      GET    /search?q=...&limit=20
+      POST   /museums, /paintings
+      PATCH  /museums/{id}, /paintings/{id}
+      DELETE /museums/{id}[?cascade=false], /paintings/{id}
+    Lists take after_id and limit and return {"items": [...], "next_after_id": id or null};
+    with stream=true the whole list is sent as one JSON array, read and written in batches."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "Catalogue/1.0"
+    # Seconds a client may take to send a request once it has started; idle keep-alive connections
+    # wait in the server's selector instead, see CatalogueServer
+    timeout = 10
+    # Headers and body go out in separate writes; with Nagle's algorithm on, the body waits for the client's
+    # delayed ACK of the headers, adding ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("GET", re.compile(r"/museums"), "list_museums"),
+        ("GET", re.compile(r"/museums/(\d+)"), "get_museum"),
+        ("GET", re.compile(r"/museums/(\d+)/paintings"), "list_museum_paintings"),
+        ("GET", re.compile(r"/paintings"), "list_paintings"),
+        ("GET", re.compile(r"/paintings/(\d+)"), "get_painting"),
+        ("GET", re.compile(r"/search"), "search"),
+        ("POST", re.compile(r"/museums"), "create_museum"),
+        ("POST", re.compile(r"/paintings"), "create_painting"),
+        ("PATCH", re.compile(r"/museums/(\d+)"), "update_museum"),
+        ("PATCH", re.compile(r"/paintings/(\d+)"), "update_painting"),
+        ("DELETE", re.compile(r"/museums/(\d+)"), "delete_museum"),
+        ("DELETE", re.compile(r"/paintings/(\d+)"), "delete_painting"),
+    ]
+
+    def handle(self):
+        """Handle the requests the client has already sent, then return, so the connection goes back to the
+        server's selector rather than holding a pool thread while it is idle"""
+        self.handle_one_request()
+        while not self.close_connection and self.pending():
+            self.handle_one_request()
+
+    def pending(self):
+        """Whether another request has already arrived, without waiting for one"""
+        self.request.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.request.settimeout(self.timeout)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            allowed = False
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(url.path.rstrip("/") or "/")
+                if match and route_method == method:
+                    getattr(self, name)(*map(int, match.groups()))
+                    return
+                allowed = allowed or bool(match)
+            if allowed:
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} is not allowed on {url.path}")
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no endpoint {url.path}")
+        except HTTPError as error:
+            self.send_json({"error": error.message}, error.status)
+        except ValueError as error:
+            self.send_json({"error": str(error)}, HTTPStatus.BAD_REQUEST)
+        except Exception as error:
+            self.log_error("%s %s failed: %r", method, self.path, error)
+            self.send_json({"error": "internal server error"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    # responses
+
+    def send_json(self, body, status=HTTPStatus.OK):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_empty(self, status=HTTPStatus.NO_CONTENT):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_stream(self, batches):
+        """Send a JSON array with chunked transfer encoding, one chunk per batch of JSON objects"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        separator = "["
+        for batch in batches:
+            if batch:
+                self.write_chunk(separator + ",".join(map(json.dumps, batch)))
+                separator = ","
+        self.write_chunk("[]" if separator == "[" else "]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {error}")
+        if not isinstance(body, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        return body
+
+    # lists
+
+    def send_list(self, query, to_json):
+        """Send one keyset page of query's rows, or all of them with stream=true"""
+        after_id = int_param(self.params, "after_id", 0)
+        if self.params.get("stream") in ("1", "true"):
+            self.send_stream(self.batches(query, after_id, to_json))
+            return
+        limit = int_param(self.params, "limit", DEFAULT_LIMIT, minimum=1)
+        rows = query.between("id", after_id + 1).order_by("id").limit(min(limit, MAX_LIMIT)).all(as_rows=True)
+        self.send_json({
+            "items": [to_json(row) for row in rows],
+            "next_after_id": rows[-1].id if len(rows) == min(limit, MAX_LIMIT) else None,
+        })
+
+    def batches(self, query, after_id, to_json):
+        query = query.order_by("id").limit(STREAM_BATCH)
+        while True:
+            # A full scan would only push the finders' entries out of the query cache
+            rows = query.between("id", after_id + 1).all(as_rows=True, cache=False)
+            yield [to_json(row) for row in rows]
+            if len(rows) < STREAM_BATCH:
+                return
+            after_id = rows[-1].id
+
+    def filtered(self, query, filters):
+        for param, field in filters.items():
+            if param in self.params:
+                value = self.params[param]
+                query = query.where(**{field: int_param(self.params, param) if field.endswith("_id") else value})
+        return query
+
+    def list_museums(self):
+        self.send_list(self.filtered(Museum.query(), MUSEUM_FILTERS), museum_json)
+
+    def list_paintings(self, museum_id=None):
+        query = self.filtered(Painting.query(), PAINTING_FILTERS)
+        if museum_id is not None:
+            query = query.where(museum_id=museum_id)
+        if "year_from" in self.params or "year_to" in self.params:
+            start = int_param(self.params, "year_from") if "year_from" in self.params else None
+            end = int_param(self.params, "year_to") if "year_to" in self.params else None
+            query = query.between("year", start, end)
+        self.send_list(query, painting_json)
+
+    def list_museum_paintings(self, museum_id):
+        self.find(Museum, museum_id)
+        self.list_paintings(museum_id)
+
+    # details
+
+    def find(self, cls, id):
+        obj = cls.find_by_id(id)
+        if obj is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no {cls.__name__.lower()} with id {id}")
+        return obj
+
+    def get_museum(self, museum_id):
+        self.send_json(museum_json(self.find(Museum, museum_id)))
+
+    def get_painting(self, painting_id):
+        self.send_json(painting_json(self.find(Painting, painting_id)))
+
+    def search(self):
+        query = self.params.get("q", "")
+        limit = min(int_param(self.params, "limit", 20, minimum=1), MAX_LIMIT)
+        self.send_json({"items": [painting_json(painting) for painting in Painting.search(query, limit)]})
+
+    # writes
+
+    def write(self, operation):
+        """Apply a models.batch operation under WRITE_LOCK and return the row id"""
+        with WRITE_LOCK:
+            result = next(Batch().apply([(1, operation)], batch_size=1))
+        if result.error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, result.error)
+        return result.id
+
+    def create_museum(self):
+        body = self.read_json()
+        museum_id = self.write({**body, "op": "create", "type": "museum"})
+        self.send_json(museum_json(self.find(Museum, museum_id)), HTTPStatus.CREATED)
+
+    def create_painting(self):
+        body = self.read_json()
+        if not isinstance(body.get("museum_id"), int):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "museum_id must be an integer")
+        painting_id = self.write({**body, "op": "create", "type": "painting"})
+        self.send_json(painting_json(self.find(Painting, painting_id)), HTTPStatus.CREATED)
+
+    def update_museum(self, museum_id):
+        body = self.read_json()
+        self.find(Museum, museum_id)
+        self.write({**body, "op": "update", "type": "museum", "id": museum_id})
+        self.send_json(museum_json(self.find(Museum, museum_id)))
+
+    def update_painting(self, painting_id):
+        body = self.read_json()
+        self.find(Painting, painting_id)
+        self.write({**body, "op": "update", "type": "painting", "id": painting_id})
+        self.send_json(painting_json(self.find(Painting, painting_id)))
+
+    def delete_museum(self, museum_id):
+        self.find(Museum, museum_id)
+        cascade = self.params.get("cascade", "true") not in ("0", "false")
+        self.write({"op": "delete", "type": "museum", "id": museum_id, "cascade": cascade})
+        self.send_empty()
+
+    def delete_painting(self, painting_id):
+        self.find(Painting, painting_id)
+        self.write({"op": "delete", "type": "painting", "id": painting_id})
+        self.send_empty()
+
+
+class CatalogueServer(HTTPServer):
+    """An HTTPServer that runs requests on a fixed pool of workers threads, so each thread's database
+    connection is reused across requests. Between requests a keep-alive connection is parked in a
+    selector watched by one thread, which hands it back to the pool when its next request arrives,
+    so idle clients never hold a worker. Connections idle for KEEP_ALIVE seconds are closed."""
+
+    def __init__(self, address, workers=WORKERS, log_requests=False):
+        super().__init__(address, CatalogueHandler)
+        self.log_requests = log_requests
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="catalogue-http")
+        self.futures = set()
+        self.idle = selectors.DefaultSelector()
+        # Parked connections are registered by the watcher thread itself; park() queues them and wakes it
+        self.parking = []
+        self.parking_lock = threading.Lock()
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.idle.register(self.wake_reader, selectors.EVENT_READ)
+        self.closing = threading.Event()
+        self.watcher = threading.Thread(target=self.watch_idle, name="catalogue-http-idle", daemon=True)
+        self.watcher.start()
+
+    def process_request(self, request, client_address):
+        future = self.pool.submit(self.run_request, request, client_address)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+
+    def run_request(self, request, client_address):
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        if handler.close_connection or self.closing.is_set():
+            self.shutdown_request(request)
+        else:
+            self.park(request, client_address)
+
+    def park(self, request, client_address):
+        with self.parking_lock:
+            self.parking.append((request, client_address))
+        self.wake_writer.send(b"\0")
+
+    def watch_idle(self):
+        while not self.closing.is_set():
+            events = self.idle.select(timeout=1.0)
+            now = time.monotonic()
+            for key, _ in events:
+                if key.fileobj is self.wake_reader:
+                    try:
+                        self.wake_reader.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    with self.parking_lock:
+                        parking, self.parking = self.parking, []
+                    for request, client_address in parking:
+                        self.idle.register(request, selectors.EVENT_READ, (client_address, now))
+                else:
+                    self.idle.unregister(key.fileobj)
+                    self.process_request(key.fileobj, key.data[0])
+            for key in list(self.idle.get_map().values()):
+                if key.fileobj is not self.wake_reader and now - key.data[1] > KEEP_ALIVE:
+                    self.idle.unregister(key.fileobj)
+                    self.shutdown_request(key.fileobj)
+
+    def server_close(self):
+        super().server_close()
+        self.closing.set()
+        self.watcher.join()
+        for key in list(self.idle.get_map().values()):
+            if key.fileobj is not self.wake_reader:
+                self.shutdown_request(key.fileobj)
+        self.idle.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+        # Shutdown's cancel_futures argument needs Python 3.9
+        for future in list(self.futures):
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+
+def serve(host="127.0.0.1", port=8000, workers=WORKERS, log_requests=False):
+    """Serve the catalogue until interrupted"""
+    server = CatalogueServer((host, port), workers, log_requests)
+    print(f"Serving the catalogue on http://{host}:{server.server_port} with {workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
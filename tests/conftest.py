@@ -0,0 +1,32 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+from models import DB
+from models.artist import Artist
+from models.museum import Museum
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+
+
+def reset_caches():
+  Museum.all.clear()
+  Painting.all.clear()
+  Artist.reset()
+  QUERY_CACHE.clear()
+
+
+@pytest.fixture
+def db(tmp_path):
+  """Point DB at an empty database file for the test, and back at the previous one afterwards"""
+  previous = DB.path
+  path = str(tmp_path / "test.db")
+  DB.configure(path=path)
+  reset_caches()
+  yield path
+  DB.configure(path=previous)
+  reset_caches()
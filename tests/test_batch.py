@@ -0,0 +1,35 @@
+# tests/test_batch.py
+from models import DB
+from models.batch import Batch
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def test_delete_museum_rejects_a_cascade_that_is_not_a_bool(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  operations = [
+    (1, {"op": "delete", "type": "museum", "id": louvre.id, "cascade": "false"}),
+    (2, {"op": "delete", "type": "museum", "id": louvre.id, "cascade": False}),
+  ]
+  results = list(Batch().apply(operations))
+  assert results[0].error == "cascade must be true or false"
+  assert results[1].error == "museum 'Louvre' still has paintings"
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 1
+  assert Museum.find_by_id(louvre.id) is louvre
+
+
+def test_create_with_a_ref_that_is_not_a_string_writes_nothing(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  operations = [
+    (1, {"op": "create", "type": "museum", "name": "Orsay", "location": "Paris", "ref": [1]}),
+    (2, {"op": "create", "type": "painting", "museum_id": louvre.id, "title": "Mona Lisa",
+         "artist": "Leonardo da Vinci", "year": 1503, "ref": {"a": 1}}),
+  ]
+  results = list(Batch().apply(operations))
+  assert [result.error for result in results] == ["ref must be a string"] * 2
+  assert DB.execute("SELECT COUNT(*) FROM museums").fetchone()[0] == 1
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 0
@@ -0,0 +1,69 @@
+# tests/test_catalogue.py
+import sqlite3
+
+import pytest
+
+from models import DB
+from models.catalogue import export_catalogue, import_catalogue
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def test_bulk_create_assigns_ids_after_the_current_maximum(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  first = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  created = Painting.bulk_create(
+    [Painting(f"Study {i}", "Leonardo da Vinci", 1500 + i, louvre) for i in range(5)], chunk_size=2
+  )
+  assert [painting.id for painting in created] == list(range(first.id + 1, first.id + 6))
+  assert all(Painting.all[painting.id] is painting for painting in created)
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 6
+
+
+def test_bulk_create_rolls_back_every_chunk_and_clears_ids(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  paintings = [Painting(f"Study {i}", "Leonardo da Vinci", 1500, louvre) for i in range(3)]
+  paintings.append(Painting("The Lion Hunt", "Eugène Delacroix", 1855, orsay))
+  # The last chunk fails on NOT NULL museum_id after the first has been inserted
+  orsay.id = None
+  with pytest.raises(sqlite3.IntegrityError):
+    Painting.bulk_create(paintings, chunk_size=2)
+  assert [painting.id for painting in paintings] == [None] * 4
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 0
+  assert len(Painting.all) == 0
+
+
+@pytest.mark.parametrize("format", ["csv", "jsonl"])
+def test_export_then_import_reproduces_the_catalogue(db, tmp_path, format):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Painting.create("The Lion Hunt", "Eugène Delacroix", 1855, orsay)
+  path = str(tmp_path / f"catalogue.{format}")
+  assert export_catalogue(path, chunk_size=1) == (2, 2)
+
+  DB.configure(path=str(tmp_path / "copy.db"))
+  migrate()
+  assert import_catalogue(path, chunk_size=1) == (2, 2)
+  assert [(painting.title, painting.museum.name) for painting in Painting.get_all()] == [
+    ("Mona Lisa", "Louvre"), ("The Lion Hunt", "Orsay")
+  ]
+
+
+def test_import_saves_nothing_when_a_record_is_invalid(db, tmp_path):
+  migrate()
+  path = tmp_path / "catalogue.jsonl"
+  path.write_text(
+    '{"type": "museum", "id": 1, "name": "Louvre", "location": "Paris"}\n'
+    '{"type": "painting", "museum_id": 1, "title": "Mona Lisa", "artist": "Leonardo da Vinci", "year": 1503}\n'
+    '{"type": "painting", "museum_id": 2, "title": "Orphan", "artist": "Nobody", "year": 1900}\n'
+  )
+  with pytest.raises(ValueError):
+    import_catalogue(str(path))
+  assert DB.execute("SELECT COUNT(*) FROM museums").fetchone()[0] == 0
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 0
@@ -0,0 +1,20 @@
+# tests/test_cli.py
+import os
+
+from click.testing import CliRunner
+
+from cli import cli
+from models import DB
+from models.schema import LATEST_VERSION
+
+
+def test_help_does_not_open_the_database(db):
+  result = CliRunner().invoke(cli, ["report", "--help"])
+  assert result.exit_code == 0
+  assert not os.path.exists(db)
+
+
+def test_commands_migrate_the_database_first(db):
+  result = CliRunner().invoke(cli, ["list-museums"])
+  assert result.exit_code == 0
+  assert DB.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
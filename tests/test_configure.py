@@ -0,0 +1,65 @@
+# tests/test_configure.py
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from models import DB
+from models.artist import Artist
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def test_switching_databases_drops_cached_results(db, tmp_path):
+  migrate()
+  Museum.create("Louvre", "Paris")
+  assert [museum.name for museum in Museum.get_all()] == ["Louvre"]
+  assert Museum.find_by_id(1).name == "Louvre"
+
+  DB.configure(path=str(tmp_path / "other.db"))
+  migrate()
+  assert Museum.get_all() == []
+  assert Museum.find_by_id(1) is None
+  assert len(Museum.all) == 0 and len(Painting.all) == 0
+
+
+def test_artists_are_resolved_again_in_a_new_database(db, tmp_path):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Painting.create("Liberty Leading the People", "Eugène Delacroix", 1830, louvre)
+  artist = Artist.by_name["Eugène Delacroix"]
+  assert artist.id == 2
+
+  DB.configure(path=str(tmp_path / "other.db"))
+  migrate()
+  orsay = Museum.create("Orsay", "Paris")
+  painting = Painting.create("The Lion Hunt", "Eugène Delacroix", 1855, orsay)
+  assert artist.id == 1
+  assert Painting.find_by_id(painting.id).artist == "Eugène Delacroix"
+
+
+def test_interned_artists_are_dropped_when_unused(db):
+  Artist.intern("Nobody In Particular")
+  gc.collect()
+  assert "Nobody In Particular" not in Artist.by_name
+
+
+def test_connections_of_finished_threads_are_closed(db):
+  migrate()
+  opened = []
+
+  def query():
+    DB.execute("SELECT COUNT(*) FROM museums").fetchone()
+    opened.append(DB.connection)
+
+  for _ in range(2):
+    thread = threading.Thread(target=query)
+    thread.start()
+    thread.join()
+  # The second thread's connection closed the first's; its own goes when the next thread connects
+  assert [conn for _, conn in DB._connections] == [DB.connection, opened[1]]
+  with pytest.raises(sqlite3.ProgrammingError):
+    opened[0].execute("SELECT 1")
@@ -0,0 +1,60 @@
+# tests/test_identity_map.py
+import gc
+
+import pytest
+
+from models.identity_map import IdentityMap
+
+
+class Row:
+  pass
+
+
+def test_lru_keeps_the_most_recently_used_objects_alive():
+  identity_map = IdentityMap("lru", maxsize=2)
+  identity_map[1] = Row()
+  identity_map[2] = Row()
+  identity_map.get(1)
+  identity_map[3] = Row()
+  gc.collect()
+  assert sorted(identity_map.keys()) == [1, 3]
+  assert identity_map.stats()["evictions"] == 1
+
+
+def test_lru_still_finds_evicted_objects_the_program_holds():
+  identity_map = IdentityMap("lru", maxsize=1)
+  held = Row()
+  identity_map[1] = held
+  identity_map[2] = Row()
+  assert identity_map.get(1) is held
+  assert identity_map.setdefault(1, Row()) is held
+
+
+def test_weak_entries_disappear_with_their_objects():
+  identity_map = IdentityMap("weak")
+  held = Row()
+  identity_map[1] = held
+  identity_map[2] = Row()
+  gc.collect()
+  assert identity_map.keys() == [1]
+  del held
+  gc.collect()
+  assert len(identity_map) == 0
+  assert identity_map.get(1) is None
+
+
+def test_strong_keeps_everything_and_counts_lookups():
+  identity_map = IdentityMap()
+  identity_map[1] = Row()
+  gc.collect()
+  assert 1 in identity_map
+  identity_map.get(1)
+  identity_map.get(2)
+  assert (identity_map.stats()["hits"], identity_map.stats()["misses"]) == (1, 1)
+
+
+def test_invalid_settings_are_rejected():
+  with pytest.raises(ValueError):
+    IdentityMap("soft")
+  with pytest.raises(ValueError):
+    IdentityMap("lru", maxsize=0)
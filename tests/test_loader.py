@@ -0,0 +1,29 @@
+# tests/test_loader.py
+import json
+
+from benchmarks.generator import CatalogueGenerator
+from benchmarks.loader import CHECKS
+from models import DB
+from models.catalogue import import_catalogue
+from models.loader import load_catalogue
+from models.schema import migrate
+
+
+def rows(path, load):
+  DB.configure(path=path)
+  migrate()
+  counts = load()
+  return counts, [DB.execute(sql).fetchall() for sql in CHECKS]
+
+
+def test_parallel_load_matches_a_serial_import(db, tmp_path):
+  path = tmp_path / "catalogue.jsonl"
+  with open(path, "w") as file:
+    for record in CatalogueGenerator(museums=6, paintings_per_museum=25, seed=3).records():
+      file.write(json.dumps(record) + "\n")
+
+  serial = rows(db, lambda: import_catalogue(str(path), chunk_size=10))
+  # Small blocks, so museums and their paintings are split across workers
+  parallel = rows(str(tmp_path / "parallel.db"), lambda: load_catalogue(str(path), workers=2, block_size=7))
+  assert serial[0] == parallel[0] == (6, 150)
+  assert serial[1] == parallel[1]
@@ -0,0 +1,50 @@
+# tests/test_memory.py
+import sqlite3
+
+import pytest
+
+from models.memory import MemoryDatabase
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+from models.session import transaction
+
+
+def on_disk(path, sql):
+  conn = sqlite3.connect(path)
+  try:
+    return conn.execute(sql).fetchall()
+  finally:
+    conn.close()
+
+
+def test_write_through_commits_reach_the_file_at_once(db):
+  migrate()
+  with MemoryDatabase("write-through"):
+    louvre = Museum.create("Louvre", "Paris")
+    assert on_disk(db, "SELECT name FROM museums") == [("Louvre",)]
+    with pytest.raises(RuntimeError):
+      with transaction():
+        Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+        raise RuntimeError("abandon the transaction")
+    assert on_disk(db, "SELECT COUNT(*) FROM paintings") == [(0,)]
+
+
+def test_write_back_replays_committed_writes_in_order(db):
+  migrate()
+  database = MemoryDatabase("write-back", interval=3600).start()
+  try:
+    louvre = Museum.create("Louvre", "Paris")
+    painting = Painting.create("Mona Lisa", "Leonardo", 1503, louvre)
+    with transaction():
+      painting.update(artist="Leonardo da Vinci", year=1504)
+    assert on_disk(db, "SELECT COUNT(*) FROM museums") == [(0,)]
+    assert database.flush() > 0
+    assert database.stats()["pending"] == 0
+  finally:
+    database.stop()
+  assert on_disk(db, "SELECT name FROM museums") == [("Louvre",)]
+  assert on_disk(db, """
+    SELECT paintings.title, artists.name, paintings.year
+    FROM paintings JOIN artists ON artists.id = paintings.artist_id
+  """) == [("Mona Lisa", "Leonardo da Vinci", 1504)]
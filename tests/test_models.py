@@ -0,0 +1,45 @@
+# tests/test_models.py
+import pytest
+
+from models.museum import Museum, MuseumRow
+from models.painting import Painting, PaintingRow
+from models.schema import migrate
+
+
+def test_instances_have_no_attribute_dictionary(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  for obj in (louvre, painting):
+    assert not hasattr(obj, "__dict__")
+    with pytest.raises(AttributeError):
+      obj.nickname = "anything"
+
+
+def test_rows_are_tuples_outside_the_identity_maps(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Museum.all.clear()
+  Painting.all.clear()
+
+  assert Painting.get_all(as_rows=True) == [
+    PaintingRow(painting.id, "Mona Lisa", "Leonardo da Vinci", 1503, louvre.id, "Louvre", "Paris")
+  ]
+  assert Museum.get_all(as_rows=True) == [MuseumRow(louvre.id, "Louvre", "Paris")]
+  assert len(Museum.all) == 0 and len(Painting.all) == 0
+
+
+def test_hydrated_objects_are_shared_and_validated_on_write(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Painting.create("Saint John the Baptist", "Leonardo da Vinci", 1513, louvre)
+  Museum.all.clear()
+  Painting.all.clear()
+
+  first, second = Painting.get_all()
+  assert first.museum is second.museum is Museum.find_by_id(louvre.id)
+  assert Painting.find_by_id(first.id) is first
+  with pytest.raises(ValueError):
+    first.year = "soon"
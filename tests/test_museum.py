@@ -0,0 +1,29 @@
+# tests/test_museum.py
+import pytest
+
+from models import DB
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def test_delete_removes_the_museums_paintings_by_default(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  louvre.delete()
+  assert painting.id is None
+  assert DB.execute("SELECT COUNT(*) FROM paintings").fetchone()[0] == 0
+
+
+def test_delete_without_cascade_refuses_a_museum_with_paintings(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  with pytest.raises(ValueError):
+    louvre.delete(cascade=False)
+  assert Museum.find_by_id(louvre.id) is louvre
+
+  empty = Museum.create("Orsay", "Paris")
+  empty.delete(cascade=False)
+  assert empty.id is None
@@ -0,0 +1,43 @@
+# tests/test_pagination.py
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def catalogue():
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  for i in range(5):
+    Painting.create(f"Louvre {i}", "Leonardo da Vinci", 1500 + i, louvre)
+    Painting.create(f"Orsay {i}", "Eugène Delacroix", 1850 + i, orsay)
+  return louvre, orsay
+
+
+def test_pages_follow_on_from_the_last_id_without_gaps_or_repeats(db):
+  louvre, _ = catalogue()
+  ids = []
+  after_id = 0
+  while True:
+    page = Painting.page(after_id, limit=3, museum_id=louvre.id)
+    if not page:
+      break
+    assert len(page) <= 3
+    ids.extend(painting.id for painting in page)
+    after_id = page[-1].id
+  assert ids == [painting.id for painting in Painting.find_by_museum(louvre.id)]
+  assert Painting.page(ids[-1], museum_id=louvre.id) == []
+  assert [row.id for row in Painting.page(ids[1], limit=1, as_rows=True)] == [ids[1] + 1]
+
+
+def test_iter_all_reads_every_row_once_whatever_the_batch_size(db):
+  _, orsay = catalogue()
+  every = [painting.id for painting in Painting.iter_all()]
+  assert every == list(range(1, 11))
+  for batch_size in (1, 3, 10, 11):
+    assert [painting.id for painting in Painting.iter_all(batch_size)] == every
+  assert [row.title for row in Painting.iter_all(2, museum_id=orsay.id, as_rows=True)] == [
+    f"Orsay {i}" for i in range(5)
+  ]
+  assert [museum.name for museum in Museum.iter_all(batch_size=1)] == ["Louvre", "Orsay"]
+  assert [row.name for row in Museum.page(1, as_rows=True)] == ["Orsay"]
@@ -0,0 +1,32 @@
+# tests/test_profiler.py
+from models.museum import Museum
+from models.painting import Painting
+from models.profiler import profile
+from models.schema import migrate
+from models.session import transaction
+
+
+def callers(profiler):
+  return {caller for stat in profiler.statements() for caller in stat.callers}
+
+
+def test_statements_are_attributed_to_the_calling_method(db):
+  migrate()
+  museum = Museum.create("Louvre", "Paris")
+  with profile() as profiler:
+    Museum.find_by_id(museum.id)
+    museum.update("Louvre Museum", "Paris")
+  assert {"Museum.find_by_id", "Museum.update"} <= callers(profiler)
+
+
+def test_queued_updates_are_attributed_to_the_session(db):
+  migrate()
+  museum = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, museum)
+  with profile() as profiler:
+    with transaction():
+      museum.update("Louvre Museum", "Paris")
+      painting.update(year=1504)
+  names = callers(profiler)
+  assert "Session.flush" in names
+  assert not {"Museum.flush", "Painting.flush"} & names
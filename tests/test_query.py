@@ -0,0 +1,36 @@
+# tests/test_query.py
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+
+
+def names(query):
+  return [museum.name for museum in query.order_by("name").all()]
+
+
+def test_prefix_matches_only_names_starting_with_the_text(db):
+  migrate()
+  for name in ["Orsay", "Orangerie", "Orb", "Ors\U0010ffff", "Ors\U0010ffffx", "Ort", "\U0010ffff"]:
+    Museum.create(name, "Paris")
+  assert names(Museum.query().prefix("name", "Or")) == [
+    "Orangerie", "Orb", "Orsay", "Ors\U0010ffff", "Ors\U0010ffffx", "Ort"
+  ]
+  assert names(Museum.query().prefix("name", "Ors\U0010ffff")) == ["Ors\U0010ffff", "Ors\U0010ffffx"]
+  assert names(Museum.query().prefix("name", "\U0010ffff")) == ["\U0010ffff"]
+  assert names(Museum.query().prefix("name", "\ud7ff")) == []
+
+
+def test_count_and_limit_are_compiled_into_the_statement(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  for year in (1503, 1819, 1830):
+    Painting.create(f"Painting of {year}", "Eugène Delacroix", year, louvre)
+  Painting.create("The Lion Hunt", "Eugène Delacroix", 1855, orsay)
+
+  delacroix = Painting.query().where(artist="Eugène Delacroix")
+  assert delacroix.count() == 4
+  assert delacroix.limit(2).count() == 2
+  assert delacroix.where(museum_id=louvre.id).between("year", 1800).count() == 2
+  assert [painting.year for painting in delacroix.order_by("-year").limit(2).all()] == [1855, 1830]
+  assert delacroix.prefix("museum_name", "Ors").first().title == "The Lion Hunt"
@@ -0,0 +1,38 @@
+# tests/test_query_cache.py
+from models import DB
+from models.museum import Museum
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+from models.schema import migrate
+
+
+def test_a_write_keeps_other_museums_results(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  mona_lisa = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Painting.create("The Lion Hunt", "Eugène Delacroix", 1855, orsay)
+  Painting.find_by_museum(louvre.id)
+  Painting.find_by_museum(orsay.id)
+
+  mona_lisa.delete()
+  hits = QUERY_CACHE.hits
+  assert [painting.title for painting in Painting.find_by_museum(orsay.id)] == ["The Lion Hunt"]
+  assert QUERY_CACHE.hits == hits + 1
+  assert Painting.find_by_museum(louvre.id) == []
+  assert QUERY_CACHE.hits == hits + 1
+
+
+def test_deletes_invalidate_after_committing(db, monkeypatch):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  generations = []
+  commit = DB.commit
+  monkeypatch.setattr(DB, "commit", lambda: (commit(), generations.append(QUERY_CACHE._generation)))
+
+  painting.delete()
+  louvre.delete()
+  # A reader that saw the old rows before a commit has an older generation, so it cannot cache them
+  assert generations == [generations[0], generations[0] + 1]
+  assert QUERY_CACHE._generation == generations[0] + 3
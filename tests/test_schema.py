@@ -0,0 +1,43 @@
+# tests/test_schema.py
+from models import DB
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import LATEST_VERSION, MIGRATIONS, migrate, schema_version
+
+
+def test_create_table_records_the_latest_version(db):
+  Museum.create_table()
+  Painting.create_table()
+  assert schema_version() == LATEST_VERSION
+  assert migrate() == LATEST_VERSION
+
+  museum = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, museum)
+  assert Painting.find_by_id(painting.id).artist == "Leonardo da Vinci"
+
+
+def test_migrate_accepts_tables_created_without_a_version(db):
+  Museum.create_table()
+  Painting.create_table()
+  DB.connection.execute("PRAGMA user_version = 0")
+  assert migrate() == LATEST_VERSION
+  assert Painting.search("mona") == []
+
+
+def test_migrate_upgrades_a_baseline_database(db):
+  conn = DB.connection
+  for sql in MIGRATIONS[0]:
+    conn.execute(sql)
+  conn.execute("INSERT INTO museums (id, name, location) VALUES (1, 'Louvre', 'Paris')")
+  conn.executemany(
+    "INSERT INTO paintings (id, title, artist, year, museum_id) VALUES (?, ?, ?, ?, 1)",
+    [(3, "Mona Lisa", "Leonardo da Vinci", 1503), (7, "The Raft of the Medusa", "Théodore Géricault", 1819),
+     (9, "Lady with an Ermine", "Leonardo da Vinci", 1490)],
+  )
+  conn.commit()
+
+  assert migrate() == LATEST_VERSION
+  assert conn.execute("SELECT COUNT(*) FROM artists").fetchone()[0] == 2
+  assert [painting.id for painting in Painting.find_by_artist("Leonardo da Vinci")] == [3, 9]
+  assert [painting.id for painting in Painting.search("raft")] == [7]
+  assert Painting.find_by_id(7).museum.name == "Louvre"
@@ -0,0 +1,43 @@
+# tests/test_search.py
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+from models.search import match_expression
+
+
+def test_match_expression_quotes_words_as_prefixes():
+  assert match_expression('water lil"ies OR') == '"water"* "lil"* "ies"* "OR"*'
+  assert match_expression(" -*() ") is None
+
+
+def test_every_word_matches_as_a_prefix(db):
+  migrate()
+  orangerie = Museum.create("Orangerie", "Paris")
+  Painting.create("Water Lilies", "Claude Monet", 1915, orangerie)
+  Painting.create("Water Carrier", "Francisco Goya", 1810, orangerie)
+  assert [painting.title for painting in Painting.search("water lil")] == ["Water Lilies"]
+  assert sorted(painting.title for painting in Painting.search("wat")) == ["Water Carrier", "Water Lilies"]
+  assert Painting.search("lilies carrier") == []
+  assert Painting.search("") == []
+
+
+def test_title_matches_rank_above_artist_and_museum_matches(db):
+  migrate()
+  rose = Museum.create("Rose Gallery", "London")
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.create("Evening", "Someone", 1900, rose)
+  Painting.create("Morning", "Rose Painter", 1900, louvre)
+  Painting.create("The Rose", "Someone Else", 1900, louvre)
+  assert [painting.title for painting in Painting.search("rose")] == ["The Rose", "Morning", "Evening"]
+  assert [museum.name for museum in Museum.search("rose")] == ["Rose Gallery"]
+
+
+def test_the_index_follows_updates_and_deletes(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  painting.update(title="La Joconde")
+  assert Painting.search("mona") == []
+  assert [found.id for found in Painting.search("joconde")] == [painting.id]
+  painting.delete()
+  assert Painting.search("joconde") == []
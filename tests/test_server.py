@@ -0,0 +1,66 @@
+# tests/test_server.py
+import http.client
+import json
+import threading
+
+import pytest
+
+from models.museum import Museum
+from models.painting import Painting
+from models.query_cache import QUERY_CACHE
+from models.schema import migrate
+from server import CatalogueServer
+
+
+@pytest.fixture
+def client(db):
+  migrate()
+  server = CatalogueServer(("127.0.0.1", 0), workers=2)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+
+  def request(method, path, body=None):
+    connection.request(method, path, json.dumps(body) if body is not None else None,
+                       {"Content-Type": "application/json"} if body is not None else {})
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, json.loads(data) if data else None
+
+  yield request
+  connection.close()
+  server.shutdown()
+  server.server_close()
+
+
+def test_routes_and_status_codes(client):
+  status, museum = client("POST", "/museums", {"name": "Louvre", "location": "Paris"})
+  assert status == 201 and museum["name"] == "Louvre"
+  status, painting = client("POST", "/paintings", {"museum_id": museum["id"], "title": "Mona Lisa",
+                                                   "artist": "Leonardo da Vinci", "year": 1503})
+  assert status == 201 and painting["artist"] == "Leonardo da Vinci"
+
+  assert client("GET", f"/museums/{museum['id']}")[0] == 200
+  status, page = client("GET", f"/museums/{museum['id']}/paintings")
+  assert status == 200 and [item["title"] for item in page["items"]] == ["Mona Lisa"]
+  assert page["next_after_id"] is None
+  status, page = client("PATCH", f"/paintings/{painting['id']}", {"year": 1504})
+  assert status == 200 and page["year"] == 1504
+  assert [item["title"] for item in client("GET", "/search?q=leon")[1]["items"]] == ["Mona Lisa"]
+
+  assert client("GET", "/paintings/999")[0] == 404
+  assert client("GET", "/nowhere")[0] == 404
+  assert client("GET", "/paintings?limit=x")[0] == 400
+  assert client("POST", "/museums", {"name": "", "location": "Paris"})[0] == 400
+  assert client("DELETE", f"/museums/{museum['id']}?cascade=false")[0] == 400
+  assert client("DELETE", f"/museums/{museum['id']}")[0] == 204
+  assert client("GET", f"/paintings/{painting['id']}")[0] == 404
+
+
+def test_streamed_lists_stay_out_of_the_query_cache(client):
+  louvre = Museum.create("Louvre", "Paris")
+  Painting.bulk_create(Painting(f"Study {i}", "Leonardo da Vinci", 1500, louvre) for i in range(3))
+  QUERY_CACHE.clear()
+  status, items = client("GET", "/paintings?stream=true")
+  assert status == 200 and [item["title"] for item in items] == ["Study 0", "Study 1", "Study 2"]
+  assert QUERY_CACHE.stats()["size"] == 0
@@ -0,0 +1,41 @@
+# tests/test_session.py
+import pytest
+
+from models import DB
+from models.artist import Artist
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+from models.session import transaction
+
+
+def test_queued_updates_are_flushed_before_any_statement(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo", 1503, louvre)
+  with transaction():
+    painting.update(artist="Leonardo da Vinci", year=1504)
+    assert DB.execute("SELECT year FROM paintings WHERE id = ?", (painting.id,)).fetchone() == (1504,)
+    Artist.by_name["Leonardo"].delete()
+  assert DB.execute("SELECT name FROM artists").fetchall() == [("Leonardo da Vinci",)]
+
+
+def test_rollback_restores_attributes_and_identity_maps(db):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  painting = Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  painting_id = painting.id
+  with pytest.raises(RuntimeError):
+    with transaction():
+      louvre.update("Musée du Louvre", "Paris")
+      painting.update(year=1519)
+      orsay = Museum.create("Orsay", "Paris")
+      painting.delete()
+      raise RuntimeError("abandon the transaction")
+
+  assert (louvre.name, painting.year, painting.id, orsay.id) == ("Louvre", 1503, painting_id, None)
+  assert Painting.all[painting_id] is painting
+  assert len(Museum.all) == 1
+  assert Museum.find_by_id(louvre.id).name == "Louvre"
+  assert Painting.find_by_id(painting_id).year == 1503
+  assert DB.execute("SELECT COUNT(*) FROM museums").fetchone()[0] == 1
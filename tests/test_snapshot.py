@@ -0,0 +1,22 @@
+# tests/test_snapshot.py
+from models import DB
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+from models.snapshot import Snapshot, export_snapshot
+
+
+def test_export_skips_paintings_without_a_museum(db, tmp_path):
+  migrate()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  Painting.create("Mona Lisa", "Leonardo da Vinci", 1503, louvre)
+  Painting.create("The Lion Hunt", "Eugène Delacroix", 1855, orsay)
+  DB.execute("DELETE FROM museums WHERE id = ?", (orsay.id,))
+  DB.commit()
+
+  path = str(tmp_path / "catalogue.snapshot")
+  assert export_snapshot(path) == (1, 1)
+  with Snapshot(path) as snapshot:
+    assert [painting.title for painting in snapshot.find_by_museum(louvre.id)] == ["Mona Lisa"]
+  assert not DB.in_transaction
@@ -0,0 +1,42 @@
+# tests/test_statements.py
+from models import DB
+from models.museum import Museum
+from models.schema import migrate
+from models.statements import STATEMENTS, StatementRegistry
+
+
+def test_whitespace_is_collapsed_outside_string_literals():
+  registry = StatementRegistry()
+  first = registry.normalize("""
+      SELECT *
+      FROM museums
+      WHERE name = 'Two  Spaces\n'
+    """)
+  second = registry.normalize("SELECT * FROM museums\n  WHERE name = 'Two  Spaces\n'")
+  assert first == second == "SELECT * FROM museums WHERE name = 'Two  Spaces\n'"
+  assert registry.statements() == [first]
+
+
+def test_model_statements_reach_the_connection_normalized(db):
+  migrate()
+  museum = Museum.create("Louvre", "Paris")
+  Museum.find_by_id(museum.id)
+  assert all("\n" not in sql and "  " not in sql for sql in STATEMENTS.statements())
+
+
+def test_registry_keeps_the_most_recently_used_texts():
+  registry = StatementRegistry(maxsize=2)
+  assert registry.normalize("SELECT  1\n") == "SELECT 1"
+  registry.normalize("SELECT 2")
+  registry.normalize("SELECT  1\n")
+  registry.normalize("SELECT 3")
+  assert registry.statements() == ["SELECT 1", "SELECT 3"]
+
+
+def test_registry_size_follows_cached_statements():
+  previous = DB.cached_statements
+  try:
+    DB.configure(cached_statements=16)
+    assert STATEMENTS.maxsize == 16
+  finally:
+    DB.configure(cached_statements=previous)
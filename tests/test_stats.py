@@ -0,0 +1,50 @@
+# tests/test_stats.py
+import pytest
+
+from models import stats
+from models.museum import Museum
+from models.painting import Painting
+from models.schema import migrate
+from models.stats import ArtistCount, MuseumCount, YearBucket, YearRange
+
+
+@pytest.fixture(params=[False, True], ids=["grouped", "summaries"])
+def catalogue(db, request):
+  migrate()
+  if request.param:
+    stats.enable_summaries()
+  louvre = Museum.create("Louvre", "Paris")
+  orsay = Museum.create("Orsay", "Paris")
+  Museum.create("Empty", "Nowhere")
+  for title, artist, year in [("A", "Leonardo", 1503), ("B", "Leonardo", 1519), ("C", "Raphael", 1511)]:
+    Painting.create(title, artist, year, louvre)
+  for title, artist, year in [("D", "Monet", 1872), ("E", "Monet", 1899), ("F", "Manet", 1863), ("G", "Manet", 1882)]:
+    Painting.create(title, artist, year, orsay)
+  return louvre, orsay
+
+
+def test_counts_per_museum_and_artist(catalogue):
+  louvre, orsay = catalogue
+  assert stats.paintings_per_museum() == [
+    MuseumCount(orsay.id, "Orsay", "Paris", 4), MuseumCount(louvre.id, "Louvre", "Paris", 3),
+    MuseumCount(3, "Empty", "Nowhere", 0),
+  ]
+  assert stats.top_artists(2) == [ArtistCount("Leonardo", 2), ArtistCount("Manet", 2)]
+
+
+def test_histogram_buckets_follow_updates(catalogue):
+  assert stats.year_histogram() == [
+    YearBucket(1500, 1), YearBucket(1510, 2), YearBucket(1860, 1), YearBucket(1870, 1),
+    YearBucket(1880, 1), YearBucket(1890, 1),
+  ]
+  Painting.find_by_title("E").update(year=1505)
+  assert stats.year_histogram("century") == [YearBucket(1500, 4), YearBucket(1800, 3)]
+  assert stats.year_histogram(50) == [YearBucket(1500, 4), YearBucket(1850, 3)]
+
+
+def test_median_of_odd_and_even_counts(catalogue):
+  louvre, orsay = catalogue
+  assert stats.year_range_per_museum() == [
+    YearRange(louvre.id, "Louvre", 1503, 1519, 1511.0),
+    YearRange(orsay.id, "Orsay", 1863, 1899, 1877.0),
+  ]